@@ -13,6 +13,7 @@ from timeit import default_timer as timer
 from werkzeug.routing import NotFound, RequestRedirect, MethodNotAllowed
 from prometheus_client import (
     CONTENT_TYPE_LATEST,
+    Gauge,
     Counter,
     Histogram,
     CollectorRegistry,
@@ -46,6 +47,25 @@ webhook_requests = Counter(
     ('state_machine', 'state', 'status_code'),
 )
 
+gate_evaluations_skipped = Counter(
+    'gate_evaluations_skipped',
+    "Gate evaluations skipped as no watched metadata changed",
+    ('state_machine', 'state'),
+)
+
+cron_job_lateness = Histogram(
+    'cron_job_lateness_seconds',
+    "Delay between cron jobs being due and starting to run",
+    ('job',),
+)
+
+cron_sweep_backlog = Gauge(
+    'cron_sweep_backlog',
+    "Labels left by the last run of a cron job for later runs",
+    ('fn_name', 'state_machine', 'state'),
+    multiprocess_mode='max',
+)
+
 api_histogram = Histogram(
     'routemaster_api_request_duration_seconds',
     'Routemaster API request duration in seconds',
@@ -138,6 +158,27 @@ class PrometheusLogger(BaseLogger):
             status_code=response.status_code,
         ).inc()
 
+    def gate_evaluation_skipped(self, state_machine, state):
+        """Count skipped gate evaluations in Prometheus."""
+        gate_evaluations_skipped.labels(
+            state_machine=state_machine.name,
+            state=state.name,
+        ).inc()
+
+    def cron_job_lateness(self, job_name, lateness):
+        """Send cron job lateness to Prometheus."""
+        cron_job_lateness.labels(job=job_name).observe(
+            lateness.total_seconds(),
+        )
+
+    def cron_sweep_backlog(self, state_machine, state, fn_name, backlog):
+        """Send the backlog left by a cron job to Prometheus."""
+        cron_sweep_backlog.labels(
+            fn_name=fn_name,
+            state_machine=state_machine.name,
+            state=state.name,
+        ).set(backlog)
+
     def webhook_response(
         self,
         state_machine,
@@ -92,6 +92,29 @@ class StatsDLogger(BaseLogger):
             'status_code': str(response.status_code),
         })
 
+    def gate_evaluation_skipped(self, state_machine, state):
+        """Count skipped gate evaluations in Statsd."""
+        self.statsd.increment('gate_evaluations_skipped', tags={
+            'state_machine': state_machine.name,
+            'state': state.name,
+        })
+
+    def cron_job_lateness(self, job_name, lateness):
+        """Send cron job lateness to Statsd."""
+        self.statsd.timing(
+            'cron_job_lateness',
+            int(1000 * lateness.total_seconds()),
+            tags={'job': job_name},
+        )
+
+    def cron_sweep_backlog(self, state_machine, state, fn_name, backlog):
+        """Send the backlog left by a cron job to Statsd."""
+        self.statsd.gauge('cron_sweep_backlog', backlog, tags={
+            'fn_name': fn_name,
+            'state_machine': state_machine.name,
+            'state': state.name,
+        })
+
     def webhook_response(
         self,
         state_machine,
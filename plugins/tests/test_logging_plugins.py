@@ -1,5 +1,6 @@
 import os
 import pathlib
+import datetime
 from typing import Any, Dict, Type, Tuple, Iterable
 
 import pytest
@@ -129,6 +130,9 @@ def test_logger(app, klass, kwargs):
     response = requests.Response()
     logger.webhook_response(state_machine, state, response)
     logger.feed_response(state_machine, state, feed_url, response)
+    logger.gate_evaluation_skipped(state_machine, state)
+    logger.cron_job_lateness('machine:state:action', datetime.timedelta(0))
+    logger.cron_sweep_backlog(state_machine, state, 'process_gate', 0)
 
 
 def test_prometheus_logger_wipes_directory_on_startup(app):
@@ -1,7 +1,7 @@
 """Core App singleton that holds state for the application."""
 import threading
 import contextlib
-from typing import Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.engine import Engine
@@ -99,6 +99,69 @@ class App(threading.local):
             self._current_session = None
             self._needs_rollback = False
 
+    @contextlib.contextmanager
+    def ensure_session(self) -> Iterator[None]:
+        """Run in the current session if there is one, or else a new one."""
+        if self._current_session is not None:
+            yield
+            return
+
+        with self.new_session():
+            yield
+
+    @contextlib.contextmanager
+    def read_only_session(self) -> Iterator[Session]:
+        """
+        Run a read-only session on a dedicated connection in this scope.
+
+        Unlike `new_session` this does not become the current session, so
+        other sessions may be run while reading results from it, such as
+        those of a query streamed from a server-side cursor with `yield_per`.
+        Use `using_session` to query it through `.session`.
+        """
+        with self._db.connect() as connection:
+            session = self._sessionmaker(bind=connection)
+            try:
+                session.execute('SET TRANSACTION READ ONLY')
+                yield session
+            finally:
+                session.rollback()
+                session.close()
+
+    @contextlib.contextmanager
+    def using_session(self, session: Session) -> Iterator[None]:
+        """Use an existing session as the current session in this scope."""
+        if self._current_session is not None:
+            raise RuntimeError("There is already a session running.")
+
+        self._current_session = session
+        try:
+            yield
+        finally:
+            self._current_session = None
+
+    @contextlib.contextmanager
+    def listen(self, channel: str) -> Iterator[Any]:
+        """
+        Listen for notifications on `channel` using a dedicated connection.
+
+        Yields the DBAPI connection, whose `poll()` gathers any notifications
+        received into its `notifies` list.
+        """
+        with self._db.connect() as connection:
+            connection = connection.execution_options(
+                isolation_level='AUTOCOMMIT',
+            )
+            connection.execute(f'LISTEN {channel}')
+            dbapi_connection = connection.connection.connection
+            try:
+                yield dbapi_connection
+            finally:
+                connection.execute(f'UNLISTEN {channel}')
+                # The connection returns to the pool, so must not carry
+                # notifications over to its next listener.
+                dbapi_connection.notifies.clear()
+
     def get_webhook_runner(self, state_machine: StateMachine) -> WebhookRunner:
         """Get the webhook runner for a state machine."""
         return self._webhook_runners[state_machine.name]
@@ -4,12 +4,23 @@ import logging
 import click
 import layer_loader
 
+from routemaster.db import (
+    initialise_db,
+    metadata_indexes,
+    existing_metadata_indexes,
+)
 from routemaster.app import App
-from routemaster.cron import CronThread
+from routemaster.cron import (
+    CRON_WORKERS,
+    CronThread,
+    TransitionQueueThread,
+    MetadataTriggersListenerThread,
+)
 from routemaster.config import ConfigError, yaml_load, load_config
 from routemaster.server import server
 from routemaster.middleware import wrap_application
 from routemaster.validation import ValidationError, validate_config
+from routemaster.exit_conditions import load_compile_cache, save_compile_cache
 from routemaster.gunicorn_application import GunicornWSGIApplication
 
 logger = logging.getLogger(__name__)
@@ -25,10 +36,17 @@ logger = logging.getLogger(__name__)
     required=True,
     multiple=True,
 )
+@click.option(
+    '--exit-condition-cache',
+    help="Path to a file caching compiled exit conditions between runs.",
+    type=click.Path(dir_okay=False),
+    envvar='ROUTEMASTER_EXIT_CONDITION_CACHE',
+)
 @click.pass_context
-def main(ctx, config_files):
+def main(ctx, config_files, exit_condition_cache):
     """Shared entrypoint configuration."""
-    logging.getLogger('schedule').setLevel(logging.CRITICAL)
+    if exit_condition_cache:
+        load_compile_cache(exit_condition_cache)
 
     config_data = layer_loader.load_files(
         config_files,
@@ -44,6 +62,17 @@ def main(ctx, config_files):
     ctx.obj = App(config)
     _validate_config(ctx.obj)
 
+    if exit_condition_cache:
+        # As when loading it, the cache is only an optimisation.
+        try:
+            save_compile_cache(exit_condition_cache)
+        except OSError:
+            logger.warning(
+                "Could not save exit condition cache to %s",
+                exit_condition_cache,
+                exc_info=True,
+            )
+
 
 @main.command()
 @click.pass_context
@@ -57,6 +86,62 @@ def validate(ctx):
     pass
 
 
+@main.command('metadata-indexes')
+@click.option(
+    '--create',
+    help="Create any missing indexes.",
+    is_flag=True,
+)
+@click.option(
+    '--drop-unused',
+    help="Drop any indexes which are no longer needed.",
+    is_flag=True,
+)
+@click.pass_context
+def metadata_indexes_command(ctx, create, drop_unused):
+    """
+    Report on indexes of the label metadata paths queried by the config.
+
+    Indexes are created and dropped concurrently, so as not to block use of
+    the labels table. Exits with an error if any indexes are left missing or
+    unused.
+    """
+    app = ctx.obj
+    required = metadata_indexes(app.config)
+    engine = initialise_db(app.config.database)
+
+    with engine.connect() as connection:
+        connection = connection.execution_options(
+            isolation_level='AUTOCOMMIT',
+        )
+        existing = existing_metadata_indexes(connection)
+        required_names = [x.name for x in required]
+
+        problems = False
+        for index in required:
+            if index.name in existing:
+                click.echo(f"Present: {index.name}")
+            elif create:
+                connection.execute(index.definition)
+                click.echo(f"Created: {index.name}")
+            else:
+                click.echo(f"Missing: {index.definition}")
+                problems = True
+
+        for name in existing:
+            if name in required_names:
+                continue
+            if drop_unused:
+                connection.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                click.echo(f"Dropped: {name}")
+            else:
+                click.echo(f"Unused: {name}")
+                problems = True
+
+    if problems:
+        click.get_current_context().exit(1)
+
+
 @main.command()
 @click.option(
     '-b',
@@ -76,8 +161,27 @@ def validate(ctx):
     type=int,
     default=1,
 )
+@click.option(
+    '--queue-workers',
+    help="Number of threads processing queued transitions.",
+    type=int,
+    default=1,
+)
+@click.option(
+    '--cron-workers',
+    help="Number of threads running cron jobs.",
+    type=int,
+    default=CRON_WORKERS,
+)
 @click.pass_context
-def serve(ctx, bind, debug, workers):  # pragma: no cover
+def serve(
+    ctx,
+    bind,
+    debug,
+    workers,
+    queue_workers,
+    cron_workers,
+):  # pragma: no cover
     """Entrypoint for serving the Routemaster HTTP service."""
     app = ctx.obj
 
@@ -85,9 +189,21 @@ def serve(ctx, bind, debug, workers):  # pragma: no cover
     if debug:
         server.config['DEBUG'] = True
 
-    cron_thread = CronThread(app)
+    cron_thread = CronThread(app, workers=cron_workers)
     cron_thread.start()
 
+    listener_thread = MetadataTriggersListenerThread(app)
+    listener_thread.start()
+
+    queue_threads = []
+    if any(x.asynchronous for x in app.config.state_machines.values()):
+        queue_threads = [
+            TransitionQueueThread(app, name=f"transition-queue-{x}")
+            for x in range(queue_workers)
+        ]
+    for thread in queue_threads:
+        thread.start()
+
     wrapped_server = wrap_application(app, server)
 
     def post_fork():
@@ -104,6 +220,9 @@ def serve(ctx, bind, debug, workers):  # pragma: no cover
         )
         instance.run()
     finally:
+        for thread in queue_threads:
+            thread.stop()
+        listener_thread.stop()
         cron_thread.stop()
 
 
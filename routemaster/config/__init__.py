@@ -9,6 +9,7 @@ from routemaster.config.model import (
     Webhook,
     FeedConfig,
     NextStates,
+    SweepBudget,
     NoNextStates,
     StateMachine,
     DatabaseConfig,
@@ -43,6 +44,7 @@ __all__ = (
     'FeedConfig',
     'NextStates',
     'ConfigError',
+    'SweepBudget',
     'NoNextStates',
     'StateMachine',
     'DatabaseConfig',
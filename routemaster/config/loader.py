@@ -10,6 +10,7 @@ import jsonschema
 import pkg_resources
 import jsonschema.exceptions
 
+from routemaster.context import accessor_for
 from routemaster.timezones import get_known_timezones
 from routemaster.text_utils import join_comma_or
 from routemaster.config.model import (
@@ -21,6 +22,7 @@ from routemaster.config.model import (
     Webhook,
     FeedConfig,
     NextStates,
+    SweepBudget,
     NoNextStates,
     StateMachine,
     DatabaseConfig,
@@ -146,6 +148,31 @@ def _load_state_machine(
             _load_webhook(x)
             for x in yaml_state_machine.get('webhooks', [])
         ],
+        asynchronous=yaml_state_machine.get('asynchronous', False),
+        cron_weight=yaml_state_machine.get('cron_weight', 1),
+        cron_max_in_flight_labels=yaml_state_machine.get(
+            'cron_max_in_flight_labels',
+        ),
+        cron_labels_per_commit=yaml_state_machine.get(
+            'cron_labels_per_commit',
+            1,
+        ),
+        history_retention=(
+            _load_interval(
+                path + ['history_retention'],
+                yaml_state_machine['history_retention'],
+            )
+            if 'history_retention' in yaml_state_machine
+            else None
+        ),
+        archive_labels_after=(
+            _load_interval(
+                path + ['archive_labels_after'],
+                yaml_state_machine['archive_labels_after'],
+            )
+            if 'archive_labels_after' in yaml_state_machine
+            else None
+        ),
     )
 
 
@@ -184,7 +211,7 @@ def _validate_context_lookups(
     feed_names: List[str],
 ) -> None:
     # Changing this? Also change context lookups in
-    # `routemaster.context.Context`
+    # `routemaster.context.Accessor`
     VALID_TOP_LEVEL = ('feeds', 'history', 'metadata')
 
     for lookup in lookups:
@@ -253,6 +280,11 @@ def _load_gate(path: Path, yaml_state: Yaml, feed_names: List[str]) -> Gate:
             yaml_state.get('next'),
             feed_names,
         ),
+        debounce=(
+            _load_interval(path + ['debounce'], yaml_state['debounce'])
+            if 'debounce' in yaml_state
+            else None
+        ),
     )
 
 
@@ -303,15 +335,51 @@ def _load_time_trigger(
         timezone: str = yaml_trigger['timezone']
         if timezone.startswith('metadata.'):
             _validate_context_lookups(timezone_path, [timezone], [])
+            if _load_sweep_budget(path, yaml_trigger) != SweepBudget():
+                raise ConfigError(
+                    f"Time trigger at path {'.'.join(path)} cannot limit its "
+                    f"sweeps when using a metadata timezone.",
+                )
+            if 'spread' in yaml_trigger:
+                raise ConfigError(
+                    f"Time trigger at path {'.'.join(path)} cannot spread its "
+                    f"sweeps when using a metadata timezone.",
+                )
             return MetadataTimezoneAwareTrigger(
                 time=trigger,
                 timezone_metadata_path=timezone.split('.')[1:],
             )
         else:
             _validate_known_timezone(timezone_path, timezone)
-            return TimezoneAwareTrigger(time=trigger, timezone=timezone)
+            return TimezoneAwareTrigger(
+                time=trigger,
+                timezone=timezone,
+                budget=_load_sweep_budget(path, yaml_trigger),
+                spread=_load_spread(path, yaml_trigger),
+            )
 
-    return SystemTimeTrigger(time=trigger)
+    return SystemTimeTrigger(
+        time=trigger,
+        budget=_load_sweep_budget(path, yaml_trigger),
+        spread=_load_spread(path, yaml_trigger),
+    )
+
+
+def _load_spread(
+    path: Path,
+    yaml_trigger: Yaml,
+) -> Optional[datetime.timedelta]:
+    if 'spread' not in yaml_trigger:
+        return None
+
+    spread_path = path + ['spread']
+    spread = _load_interval(spread_path, yaml_trigger['spread'])
+    if not datetime.timedelta(minutes=1) <= spread <= datetime.timedelta(1):
+        raise ConfigError(
+            f"Spread '{yaml_trigger['spread']}' at path "
+            f"{'.'.join(spread_path)} must be between one minute and one day.",
+        )
+    return spread
 
 
 RE_INTERVAL = re.compile(
@@ -321,19 +389,39 @@ RE_INTERVAL = re.compile(
 
 
 def _load_interval_trigger(path: Path, yaml_trigger: Yaml) -> IntervalTrigger:
-    match = RE_INTERVAL.match(yaml_trigger['interval'])
+    return IntervalTrigger(
+        interval=_load_interval(path, yaml_trigger['interval']),
+        budget=_load_sweep_budget(path, yaml_trigger),
+    )
+
+
+def _load_sweep_budget(path: Path, yaml_trigger: Yaml) -> SweepBudget:
+    return SweepBudget(
+        max_labels=yaml_trigger.get('max_labels'),
+        max_duration=(
+            _load_interval(
+                path + ['max_duration'],
+                yaml_trigger['max_duration'],
+            )
+            if 'max_duration' in yaml_trigger
+            else None
+        ),
+    )
+
+
+def _load_interval(path: Path, yaml_interval: str) -> datetime.timedelta:
+    match = RE_INTERVAL.match(yaml_interval)
     if not match:  # pragma: no branch
         raise ConfigError(  # pragma: no cover
-            f"Interval trigger '{yaml_trigger['interval']}' at path "
-            f"{'.'.join(path)} does not meet expected format: 'XdYhZm'.",
+            f"Interval '{yaml_interval}' at path {'.'.join(path)} does not "
+            f"meet expected format: 'XdYhZm'.",
         )
 
     parts = match.groupdict()
-    interval = datetime.timedelta(**{
+    return datetime.timedelta(**{
         x: int(y) if y is not None else 0
         for x, y in parts.items()
     })
-    return IntervalTrigger(interval=interval)
 
 
 RE_PATH = re.compile(r'^[a-zA-Z0-9_]+(\.[a-zA-Z0-9_]+)*$')
@@ -386,6 +474,7 @@ def _load_context_next_states(
     context_path = yaml_next_states['path']
 
     _validate_context_lookups(path + ['path'], (context_path,), feed_names)
+    accessor_for(context_path)
 
     return ContextNextStates(
         path=context_path,
@@ -10,25 +10,41 @@ from typing import (
     Mapping,
     Pattern,
     Iterable,
+    Optional,
     Sequence,
     NamedTuple,
 )
 from dataclasses import dataclass
 
+from routemaster.context import accessor_for
 from routemaster.exit_conditions import ExitConditionProgram
 
 if TYPE_CHECKING:
     from routemaster.context import Context  # noqa
 
 
+class SweepBudget(NamedTuple):
+    """
+    Limits on the work done by each run of a trigger's sweep of a gate.
+
+    Labels are swept oldest first, and any left once the budget is spent are
+    swept by the trigger's next run.
+    """
+    max_labels: Optional[int] = None
+    max_duration: Optional[datetime.timedelta] = None
+
+
 class SystemTimeTrigger(NamedTuple):
     """
     System time based trigger for exit condition evaluation.
 
     This trigger runs at the given time according to the system on which
-    routemaster is running.
+    routemaster is running. If a `spread` is given, labels are instead
+    evaluated at stable times spread across that long after the given time.
     """
     time: datetime.time
+    budget: SweepBudget = SweepBudget()
+    spread: Optional[datetime.timedelta] = None
 
 
 class TimezoneAwareTrigger(NamedTuple):
@@ -36,10 +52,13 @@ class TimezoneAwareTrigger(NamedTuple):
     Fixed timezone aware trigger for exit condition evaluation.
 
     This trigger runs at the time according to the named timezone. The timezone
-    should be spelled using an IANA name, for example: 'Europe/London'.
+    should be spelled using an IANA name, for example: 'Europe/London'. Runs
+    may be spread as for the `SystemTimeTrigger`.
     """
     time: datetime.time
     timezone: str
+    budget: SweepBudget = SweepBudget()
+    spread: Optional[datetime.timedelta] = None
 
 
 class MetadataTimezoneAwareTrigger(NamedTuple):
@@ -57,6 +76,7 @@ class MetadataTimezoneAwareTrigger(NamedTuple):
 class IntervalTrigger(NamedTuple):
     """Time interval based trigger for exit condition evaluation."""
     interval: datetime.timedelta
+    budget: SweepBudget = SweepBudget()
 
 
 class MetadataTrigger(NamedTuple):
@@ -117,7 +137,7 @@ class ContextNextStates(NamedTuple):
 
     def next_state_for_label(self, label_context: 'Context') -> str:
         """Returns next state based on context value at `self.path`."""
-        val = label_context.lookup(self.path.split('.'))
+        val = accessor_for(self.path)(label_context)
         for destination in self.destinations:
             if destination.value == val:
                 return destination.state
@@ -157,6 +177,10 @@ class Gate(NamedTuple):
     exit_condition: ExitConditionProgram
     triggers: Iterable[Trigger]
 
+    # If set, metadata triggers are evaluated in the background once no
+    # updates have been made to the label for this long.
+    debounce: Optional[datetime.timedelta] = None
+
     @property
     def metadata_triggers(self) -> List[MetadataTrigger]:
         """Return a list of the metadata triggers for this state."""
@@ -205,6 +229,26 @@ class StateMachine(NamedTuple):
     feeds: List[FeedConfig]
     webhooks: List[Webhook]
 
+    # If set, API writes queue the processing of transitions for background
+    # workers rather than processing them in the request.
+    asynchronous: bool = False
+
+    # The share of cron work given to this state machine relative to others,
+    # and a limit on how many of its labels cron may process at once.
+    cron_weight: int = 1
+    cron_max_in_flight_labels: Optional[int] = None
+
+    # The number of labels cron sweeps process in each transaction.
+    cron_labels_per_commit: int = 1
+
+    # How long history is kept for, or None to keep it indefinitely. The
+    # latest history entry of each label is always kept.
+    history_retention: Optional[datetime.timedelta] = None
+
+    # How long labels are left once deleted or in a state with no next
+    # states before being archived, or None to never archive them.
+    archive_labels_after: Optional[datetime.timedelta] = None
+
     def get_state(self, state_name: str) -> State:
         """Get the state object for a given state name."""
         return [x for x in self.states if x.name == state_name][0]
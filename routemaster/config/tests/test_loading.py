@@ -15,6 +15,7 @@ from routemaster.config import (
     Webhook,
     FeedConfig,
     ConfigError,
+    SweepBudget,
     NoNextStates,
     StateMachine,
     DatabaseConfig,
@@ -301,6 +302,98 @@ def test_next_states_shorthand_results_in_constant_config():
         assert load_config(data) == expected
 
 
+def test_asynchronous_state_machine():
+    with reset_environment():
+        config = load_config(yaml_data('asynchronous'))
+
+    assert config.state_machines['example'].asynchronous is True
+
+
+def test_cron_fair_share():
+    with reset_environment():
+        config = load_config(yaml_data('cron_fair_share'))
+
+    state_machine = config.state_machines['example']
+    assert state_machine.cron_weight == 10
+    assert state_machine.cron_max_in_flight_labels == 500
+    assert state_machine.cron_labels_per_commit == 20
+
+
+def test_history_retention():
+    with reset_environment():
+        config = load_config(yaml_data('history_retention'))
+
+    state_machine = config.state_machines['example']
+    assert state_machine.history_retention == datetime.timedelta(days=90)
+
+
+def test_archive_labels_after():
+    with reset_environment():
+        config = load_config(yaml_data('archive_labels_after'))
+
+    state_machine = config.state_machines['example']
+    assert state_machine.archive_labels_after == datetime.timedelta(days=30)
+
+
+def test_raises_for_invalid_cron_weight():
+    with assert_config_error("Could not validate config file against schema."):
+        load_config(yaml_data('cron_weight_invalid'))
+
+
+def test_trigger_sweep_budget():
+    with reset_environment():
+        config = load_config(yaml_data('trigger_sweep_budget'))
+
+    start, end = config.state_machines['example'].states
+    time_trigger, interval_trigger = start.triggers
+    assert time_trigger.budget == SweepBudget(max_labels=1000)
+    assert interval_trigger.budget == SweepBudget(
+        max_labels=500,
+        max_duration=datetime.timedelta(minutes=5, seconds=30),
+    )
+
+
+def test_raises_for_sweep_budget_with_metadata_timezone():
+    with assert_config_error(
+        "Time trigger at path state_machines.example.states.0.triggers.0 "
+        "cannot limit its sweeps when using a metadata timezone.",
+    ):
+        load_config(yaml_data('trigger_sweep_budget_metadata_timezone'))
+
+
+def test_trigger_spread():
+    with reset_environment():
+        config = load_config(yaml_data('trigger_spread'))
+
+    system_time_trigger, timezone_trigger = \
+        config.state_machines['example'].states[0].triggers
+    assert system_time_trigger.spread == datetime.timedelta(minutes=90)
+    assert timezone_trigger.spread == datetime.timedelta(minutes=20)
+
+
+def test_raises_for_trigger_spread_too_short():
+    with assert_config_error(
+        "Spread '0m' at path "
+        "state_machines.example.states.0.triggers.0.spread must be between "
+        "one minute and one day.",
+    ):
+        load_config(yaml_data('trigger_spread_too_short'))
+
+
+def test_gate_debounce():
+    with reset_environment():
+        config = load_config(yaml_data('gate_debounce'))
+
+    start, end = config.state_machines['example'].states
+    assert start.debounce == datetime.timedelta(minutes=1, seconds=30)
+    assert end.debounce is None
+
+
+def test_raises_for_invalid_debounce_format():
+    with assert_config_error("Could not validate config file against schema."):
+        load_config(yaml_data('gate_debounce_format_invalid'))
+
+
 def test_environment_variables_override_config_file_for_database_config():
     data = yaml_data('realistic')
     expected = Config(
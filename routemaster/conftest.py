@@ -21,7 +21,14 @@ from werkzeug.test import Client
 from sqlalchemy.orm import sessionmaker
 
 from routemaster import state_machine
-from routemaster.db import Label, History, metadata
+from routemaster.db import (
+    Label,
+    History,
+    metadata,
+    history_default_bounds,
+    drop_history_default_bound,
+    existing_history_partitions,
+)
 from routemaster.app import App
 from routemaster.utils import dict_merge
 from routemaster.config import (
@@ -242,6 +249,7 @@ class TestApp(App):
         self._session = None
         self._needs_rollback = False
         self._current_session = None
+        self._db = TEST_ENGINE
         self._sessionmaker = sessionmaker(bind=TEST_ENGINE)
         self._webhook_runners = {
             x: webhook_runner_for_state_machine(y)
@@ -316,7 +324,11 @@ def database_creation(request):
 
 @pytest.fixture(autouse=True)
 def database_clear(app):
-    """Truncate all tables after each test."""
+    """
+    Truncate all tables, and drop history partitions, after each test.
+
+    Bounds of the default history partition are dropped along with them.
+    """
     yield
     if app.session_used:
         with app.new_session():
@@ -325,6 +337,10 @@ def database_clear(app):
                     f'truncate table {table} cascade',
                     {},
                 )
+            for partition in existing_history_partitions(app.session):
+                app.session.execute(f'drop table {partition.name}')
+            for bound in history_default_bounds(app.session):
+                drop_history_default_bound(app.session, bound)
 
 
 @pytest.fixture()
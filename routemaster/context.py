@@ -1,6 +1,7 @@
 """Context definition for exit condition programs."""
 import datetime
-from typing import Any, Dict, Iterable, Optional, Sequence
+import functools
+from typing import Any, Dict, Tuple, Union, Iterable, Optional, Sequence
 
 from routemaster.feeds import Feed
 from routemaster.utils import get_path
@@ -21,10 +22,7 @@ class Context(object):
         feed_logging_context,
     ) -> None:
         """Create an execution context."""
-        if now.tzinfo is None:
-            raise ValueError(
-                "Cannot evaluate exit conditions with naive datetimes",
-            )
+        check_timezone_aware(now)
 
         self.now = now
         self.metadata = metadata
@@ -35,48 +33,11 @@ class Context(object):
 
     def lookup(self, path: Sequence[str]) -> Any:
         """Look up a path in the execution context."""
-        location, *rest = path
-
-        try:
-            # Changing this mapping? Also change config validation in
-            # `routemaster.config.loader._validate_context_lookups`
-            return {
-                'metadata': self._lookup_metadata,
-                'feeds': self._lookup_feed_data,
-                'history': self._lookup_history,
-            }[location](rest)
-        except (KeyError, ValueError):
-            return None
-
-    def _lookup_metadata(self, path: Sequence[str]) -> Any:
-        return get_path(path, self.metadata)
-
-    def _lookup_feed_data(self, path: Sequence[str]) -> Any:
-        feed_name, *rest = path
-        return self.feeds[feed_name].lookup(rest)
-
-    def _lookup_history(self, path: Sequence[str]) -> Any:
-        if self.current_history_entry is None:
-            raise ValueError("Accessed uninitialised variable")
-
-        variable_name, = path
-        return {
-            'entered_state': self.current_history_entry.created,
-            'previous_state': self.current_history_entry.old_state,
-        }[variable_name]
+        return accessor_for(tuple(path))(self)
 
     def property_handler(self, property_name, value, **kwargs):
         """Handle a property in execution."""
-        if property_name == ('passed',):
-            epoch = kwargs['since']
-            return (self.now - epoch).total_seconds() >= value
-        if property_name == ('defined',):
-            return value is not None
-        if property_name == () and 'in' in kwargs:
-            return value in kwargs['in']
-        raise ValueError("Unknown property {name}".format(
-            name='.'.join(property_name)),
-        )
+        return handle_property(self.now, property_name, value, **kwargs)
 
     def _pre_warm_feeds(
         self,
@@ -97,3 +58,132 @@ class Context(object):
             if feed is not None:
                 with logging_context(feed.url) as log_response:
                     feed.prefetch(label, log_response)
+
+
+class Accessor(object):
+    """A lookup of a path in execution contexts, resolved in advance."""
+
+    _HISTORY_ATTRIBUTES = {
+        'entered_state': 'created',
+        'previous_state': 'old_state',
+    }
+
+    def __init__(self, path: Sequence[str]) -> None:
+        """Resolve the lookup of `path`."""
+        self.path = tuple(path)
+        location, *rest = self.path
+        self._rest = tuple(rest)
+
+        # Changing this mapping? Also change config validation in
+        # `routemaster.config.loader._validate_context_lookups`
+        self._lookup = {
+            'metadata': self._lookup_metadata,
+            'feeds': self._lookup_feed_data,
+            'history': self._lookup_history,
+        }.get(location, self._lookup_nothing)
+
+        self._history_attribute = None
+        if len(rest) == 1:
+            self._history_attribute = self._HISTORY_ATTRIBUTES.get(rest[0])
+
+    def __call__(self, context: Context) -> Any:
+        """Look up the path in `context`, or `None` if not found."""
+        return self._lookup(context)
+
+    def __repr__(self) -> str:
+        """Debug representation."""
+        return f'Accessor({self.path!r})'
+
+    def _lookup_metadata(self, context: Context) -> Any:
+        return get_path(self._rest, context.metadata)
+
+    def _lookup_feed_data(self, context: Context) -> Any:
+        if not self._rest:
+            return None
+        feed = context.feeds.get(self._rest[0])
+        if feed is None:
+            return None
+        try:
+            return feed.lookup(self._rest[1:])
+        except (KeyError, ValueError):
+            return None
+
+    def _lookup_history(self, context: Context) -> Any:
+        history_entry = context.current_history_entry
+        if history_entry is None or self._history_attribute is None:
+            return None
+        return getattr(history_entry, self._history_attribute)
+
+    def _lookup_nothing(self, context: Context) -> Any:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def accessor_for(path: Union[str, Tuple[str, ...]]) -> Accessor:
+    """
+    Get the accessor for a path, as a tuple of components or dotted string.
+
+    Accessors are shared, so paths are only resolved once per process.
+    """
+    if isinstance(path, str):
+        return Accessor(path.split('.'))
+    return Accessor(path)
+
+
+def check_timezone_aware(now: datetime.datetime) -> None:
+    """Reject naive datetimes as the time at which to evaluate programs."""
+    if now.tzinfo is None:
+        raise ValueError(
+            "Cannot evaluate exit conditions with naive datetimes",
+        )
+
+
+def lookup_history(path: Sequence[str], history_entry: Optional[Any]) -> Any:
+    """Look up a path in the history of a label, given its current entry."""
+    if history_entry is None:
+        raise ValueError("Accessed uninitialised variable")
+
+    variable_name, = path
+    return {
+        'entered_state': history_entry.created,
+        'previous_state': history_entry.old_state,
+    }[variable_name]
+
+
+def handle_property(now: datetime.datetime, property_name, value, **kwargs):
+    """Evaluate a property of `value` at the instant `now`."""
+    if property_name == ('passed',):
+        epoch = kwargs['since']
+        return (now - epoch).total_seconds() >= value
+    if property_name == ('defined',):
+        return value is not None
+    if property_name == () and 'in' in kwargs:
+        return value in kwargs['in']
+    raise ValueError("Unknown property {name}".format(
+        name='.'.join(property_name)),
+    )
+
+
+def lookup_label_variable(
+    path: Sequence[str],
+    metadata: Dict[str, Any],
+    history_entry: Optional[Any],
+) -> Any:
+    """
+    Look up a path which only depends on a label's own data.
+
+    This follows the semantics of `Context.lookup`, though without support for
+    feeds, so that variables can be resolved without constructing a `Context`.
+    """
+    location, *rest = path
+
+    try:
+        if location == 'metadata':
+            return get_path(rest, metadata)
+        elif location == 'history':
+            return lookup_history(rest, history_entry)
+        elif location == 'feeds':
+            raise RuntimeError("Cannot look up feed data outside a Context")
+        return None
+    except (KeyError, ValueError):
+        return None
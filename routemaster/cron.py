@@ -1,19 +1,31 @@
 """Periodic job running."""
 
 import time
+import select
+import datetime
 import functools
 import itertools
 import threading
-from typing import Callable, Iterable
+from typing import (
+    Any,
+    List,
+    Tuple,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    NamedTuple,
+)
 from typing_extensions import Protocol
-
-import schedule
+from concurrent.futures import ThreadPoolExecutor
 
 from routemaster.app import App
 from routemaster.config import (
     Gate,
     State,
     Action,
+    SweepBudget,
     StateMachine,
     IntervalTrigger,
     MetadataTrigger,
@@ -21,13 +33,25 @@ from routemaster.config import (
     TimezoneAwareTrigger,
     MetadataTimezoneAwareTrigger,
 )
+from routemaster.scheduler import Job, FairShare, Scheduler
 from routemaster.state_machine import (
+    METADATA_TRIGGERS_CHANNEL,
+    Sweep,
+    SpreadSlot,
+    LabelStream,
     LabelProvider,
     LabelStateProcessor,
-    process_cron,
+    start_sweep,
+    finish_sweep,
     process_gate,
+    archive_labels,
     process_action,
     labels_in_state,
+    maintain_history,
+    process_cron_chunks,
+    record_sweep_progress,
+    process_transition_queue,
+    process_metadata_triggers_notification,
     labels_needing_metadata_update_retry_in_gate,
 )
 from routemaster.cron_processors import (
@@ -37,6 +61,28 @@ from routemaster.cron_processors import (
 
 IsTerminating = Callable[[], bool]
 
+ONE_MINUTE = datetime.timedelta(minutes=1)
+
+# Default number of threads running cron jobs, so that a slow job does not
+# hold up others which are due.
+CRON_WORKERS = 4
+
+# Number of labels a cron job processes in each turn it takes.
+CRON_CHUNK_SIZE = 100
+
+# Seconds between checks of the transition queue once it has been drained.
+TRANSITION_QUEUE_POLL_INTERVAL = 1
+
+# Seconds between sweeps for labels with unprocessed metadata triggers.
+METADATA_RETRY_INTERVAL = 60
+
+# Interval between creating upcoming partitions of history, and dropping those
+# past retention.
+HISTORY_MAINTENANCE_INTERVAL = datetime.timedelta(hours=1)
+
+# Interval between archiving labels which will no longer change state.
+LABEL_ARCHIVE_INTERVAL = datetime.timedelta(hours=1)
+
 
 class CronProcessor(Protocol):
     """Type signature for the cron processor callable."""
@@ -49,6 +95,8 @@ class CronProcessor(Protocol):
         state_machine: StateMachine,
         fn: LabelStateProcessor,
         label_provider: LabelProvider,
+        checkpoint: Optional[str] = None,
+        budget: SweepBudget = SweepBudget(),
     ) -> None:
         """Type signature for the cron processor callable."""
         ...
@@ -62,11 +110,104 @@ class StateSpecificCronProcessor(Protocol):
         *,
         fn: LabelStateProcessor,
         label_provider: LabelProvider,
+        checkpoint: Optional[str] = None,
+        budget: SweepBudget = SweepBudget(),
     ) -> None:
         """Type signature for a state-specific cron processor callable."""
         ...
 
 
+def _iter_sweep(
+    *,
+    app: App,
+    state: State,
+    state_machine: StateMachine,
+    fn_name: str,
+    labels: Iterable[str],
+    fair_share: FairShare,
+    budget: SweepBudget,
+    sweep: Optional[Sweep],
+    is_terminating: IsTerminating,
+) -> Iterator[Iterator[str]]:
+    # Labels are processed in chunks, taking turns with the sweeps of other
+    # state machines in proportion to their weights. Each chunk must be
+    # processed before the next is read, which may wait for its turn. A run
+    # stops early when terminating, or once its budget is spent.
+    #
+    # Progress is recorded after each chunk, so that a later run of the job
+    # can resume the sweep from there. Labels are only processed once locked,
+    # so any processed again on resuming are harmless.
+    #
+    # Labels are read from `labels` a chunk at a time, so that they can be
+    # streamed from the database rather than all held in memory.
+    chunk_size = CRON_CHUNK_SIZE
+    if state_machine.cron_max_in_flight_labels is not None:
+        chunk_size = min(chunk_size, state_machine.cron_max_in_flight_labels)
+
+    deadline = None
+    if budget.max_duration is not None:
+        deadline = time.monotonic() + budget.max_duration.total_seconds()
+
+    processed = 0
+
+    def _stopping() -> bool:
+        return (
+            is_terminating() or
+            (
+                budget.max_labels is not None and
+                processed >= budget.max_labels
+            ) or
+            (deadline is not None and time.monotonic() >= deadline)
+        )
+
+    def _labels_until_stopping(chunk: List[str]) -> Iterator[str]:
+        nonlocal processed
+        for label in chunk:
+            if _stopping():
+                return
+            processed += 1
+            yield label
+
+    labels = iter(labels)
+    backlog = 0
+    exhausted = False
+
+    while not _stopping():
+        chunk = list(itertools.islice(labels, chunk_size))
+        if not chunk:
+            exhausted = True
+            break
+
+        with fair_share.turn(
+            state_machine.name,
+            len(chunk),
+            weight=state_machine.cron_weight,
+            max_in_flight=state_machine.cron_max_in_flight_labels,
+        ):
+            processed_before = processed
+            yield _labels_until_stopping(chunk)
+            backlog = len(chunk) - (processed - processed_before)
+
+        if sweep is not None and backlog < len(chunk):
+            record_sweep_progress(app, sweep, chunk[-backlog - 1])
+
+    if is_terminating():
+        # Rather than delay stopping, the backlog is left unreported.
+        return
+
+    if not exhausted:
+        # Labels streamed from the database are counted there rather than
+        # read, which would evaluate whether each could exit a gate.
+        if isinstance(labels, LabelStream):
+            backlog += labels.count_remaining()
+        else:
+            backlog += sum(1 for _ in labels)
+    app.logger.cron_sweep_backlog(state_machine, state, fn_name, backlog)
+
+    if sweep is not None and not backlog:
+        finish_sweep(app, sweep)
+
+
 # The cron configuration works by building up a partially applied function
 # `process_job`, at multiple levels. This allows us to hook an intermediate
 # stage for testing.
@@ -75,6 +216,7 @@ def process_job(
     *,
     # Bound at the cron thread level
     is_terminating: IsTerminating,
+    fair_share: FairShare,
     # Bound at the state scheduling level
     app: App,
     state: State,
@@ -82,23 +224,52 @@ def process_job(
     # Bound when scheduling a specific job for a state
     fn: LabelStateProcessor,
     label_provider: LabelProvider,
+    checkpoint: Optional[str] = None,
+    budget: SweepBudget = SweepBudget(),
 ):
-    """Process a single instance of a single cron job."""
+    """
+    Process a single instance of a single cron job.
+
+    If a `checkpoint` name is given, `label_provider` must accept an `after`
+    label name, and the job's sweep is resumed from where any previous run
+    stopped. Each run stops once it has spent its `budget`.
+    """
+    sweep: Optional[Sweep] = None
 
-    def _iter_labels_until_terminating(
+    def _iter_chunks_until_terminating(
         state_machine: StateMachine,
         state: State,
-    ) -> Iterable[str]:
-        return itertools.takewhile(
-            lambda _: not is_terminating(),
-            label_provider(app, state_machine, state),
+    ) -> Iterable[Iterable[str]]:
+        if sweep is None:
+            labels = label_provider(app, state_machine, state)
+        else:
+            labels = label_provider(
+                app,
+                state_machine,
+                state,
+                after=sweep.cursor,
+            )
+
+        return _iter_sweep(
+            app=app,
+            state=state,
+            state_machine=state_machine,
+            fn_name=fn.__name__,
+            labels=labels,
+            fair_share=fair_share,
+            budget=budget,
+            sweep=sweep,
+            is_terminating=is_terminating,
         )
 
     try:
+        if checkpoint is not None:
+            sweep = start_sweep(app, checkpoint)
+
         with app.logger.process_cron(state_machine, state, fn.__name__):
-            process_cron(
+            process_cron_chunks(
                 process=fn,
-                get_labels=_iter_labels_until_terminating,
+                get_chunks=_iter_chunks_until_terminating,
                 app=app,
                 state=state,
                 state_machine=state_machine,
@@ -107,61 +278,311 @@ def process_job(
         return
 
 
+def _metadata_retry_interval(gate: Gate) -> int:
+    # Labels left needing evaluation are notified to the
+    # `MetadataTriggersListenerThread`, so for most gates these retries are
+    # only a safety net. Debounced gates rely on them to be evaluated at all,
+    # so are retried at least as often as their debounce period.
+    if gate.debounce is None:
+        return METADATA_RETRY_INTERVAL
+    return max(1, min(60, int(gate.debounce.total_seconds())))
+
+
+def _spread_slots(
+    start_time: datetime.time,
+    spread: Optional[datetime.timedelta],
+    label_provider: LabelProvider,
+) -> Iterator[Tuple[str, datetime.time, LabelProvider]]:
+    # Spread triggers run a sweep each minute across their spread, each of
+    # which considers only the labels in that minute's slot.
+    if spread is None:
+        yield '', start_time, label_provider
+        return
+
+    start = datetime.datetime.combine(datetime.date.min, start_time)
+    slots = int(spread / ONE_MINUTE)
+    for slot in range(slots):
+        yield (
+            f':{slot}',
+            (start + slot * ONE_MINUTE).time(),
+            functools.partial(
+                label_provider,
+                slot=SpreadSlot(slot, slots),
+            ),
+        )
+
+
+class _Selection(NamedTuple):
+    """The labels of a gate to be swept for one of its triggers."""
+    label_provider: LabelProvider
+    checkpoint: Optional[str]
+    budget: SweepBudget = SweepBudget()
+    # Whether this selects every label which could exit the gate, and so the
+    # labels of any other selection too.
+    whole_gate: bool = False
+
+
+def _largest_limit(limits: Iterable[Optional[Any]]) -> Optional[Any]:
+    values = list(limits)
+    if any(x is None for x in values):
+        return None
+    return max(values)
+
+
+def _combined_budget(selections: Sequence[_Selection]) -> SweepBudget:
+    # A combined sweep may go as far as any of the sweeps it replaces.
+    return SweepBudget(
+        max_labels=_largest_limit(x.budget.max_labels for x in selections),
+        max_duration=_largest_limit(
+            x.budget.max_duration for x in selections
+        ),
+    )
+
+
+def _labels_in_any(
+    label_providers: Sequence[LabelProvider],
+    app: App,
+    state_machine: StateMachine,
+    state: State,
+) -> List[str]:
+    # Labels selected more than once are only swept once. The selections of
+    # these triggers are each a part of the gate, so are gathered in memory.
+    return list(dict.fromkeys(itertools.chain.from_iterable(
+        x(app, state_machine, state) for x in label_providers
+    )))
+
+
+class _GateSweeps:
+    """
+    The sweeps of a gate for all of its triggers, run as a single job.
+
+    Each trigger keeps its own schedule, but those due at once are swept
+    together, so that a label selected by several of them is evaluated once
+    rather than by overlapping sweeps.
+    """
+
+    def __init__(
+        self,
+        processor: StateSpecificCronProcessor,
+        name: str,
+    ) -> None:
+        self.processor = processor
+        self.name = name
+        self.triggers: List[Job] = []
+        self._due: List[_Selection] = []
+        # Sweeps of gates need only consider the labels which could exit.
+        self.gate_labels_in_state = functools.partial(
+            labels_in_state,
+            only_exitable=True,
+        )
+
+    def every(
+        self,
+        interval: datetime.timedelta,
+        selection: _Selection,
+        *,
+        name: str,
+    ) -> None:
+        """Sweep the selected labels every `interval`."""
+        self.triggers.append(Job.every(
+            interval,
+            functools.partial(self._select, selection),
+            name=name,
+        ))
+
+    def daily_at(
+        self,
+        time: datetime.time,
+        selection: _Selection,
+        *,
+        name: str,
+    ) -> None:
+        """Sweep the selected labels each day at the given local time."""
+        self.triggers.append(Job.daily_at(
+            time,
+            functools.partial(self._select, selection),
+            name=name,
+        ))
+
+    def in_timezone_at(
+        self,
+        trigger: TimezoneAwareTrigger,
+        selection: _Selection,
+        *,
+        name: str,
+    ) -> None:
+        """Sweep the selected labels each day at the trigger's time."""
+        self.triggers.append(Job.every(
+            ONE_MINUTE,
+            TimezoneAwareProcessor(
+                functools.partial(self._select, selection),
+                trigger,
+            ),
+            name=name,
+        ))
+
+    def in_metadata_timezone_at(
+        self,
+        trigger: MetadataTimezoneAwareTrigger,
+        *,
+        name: str,
+    ) -> None:
+        """Sweep labels each day at the trigger's time in their timezone."""
+        self.triggers.append(Job.every(
+            ONE_MINUTE,
+            MetadataTimezoneAwareProcessor(self._select_in_timezones, trigger),
+            name=name,
+        ))
+
+    def _select(self, selection: _Selection) -> None:
+        self._due.append(selection)
+
+    def _select_in_timezones(self, *, label_provider: LabelProvider) -> None:
+        # The labels whose timezones have reached the trigger time differ
+        # from run to run, so these sweeps cannot be resumed.
+        self._select(_Selection(label_provider, checkpoint=None))
+
+    def next_run_after(self, after: datetime.datetime) -> datetime.datetime:
+        """When the first of the triggers is next due after `after`."""
+        return min(x.first_run_after(after) for x in self.triggers)
+
+    def __call__(self) -> None:
+        """Sweep the gate for each of its triggers which are due."""
+        now = datetime.datetime.now()
+        for trigger in self.triggers:
+            if trigger.next_run <= now:
+                trigger.run()
+
+        due, self._due = self._due, []
+        if not due:
+            return
+
+        whole_gate = [x for x in due if x.whole_gate]
+        if whole_gate:
+            # Every other selection is included in the whole gate, so a
+            # single sweep covers them all.
+            self.processor(
+                fn=process_gate,
+                label_provider=self.gate_labels_in_state,
+                checkpoint=f'{self.name}:sweep',
+                budget=_combined_budget(whole_gate),
+            )
+        elif len(due) == 1:
+            selection, = due
+            self.processor(
+                fn=process_gate,
+                label_provider=selection.label_provider,
+                checkpoint=selection.checkpoint,
+                budget=selection.budget,
+            )
+        else:
+            self.processor(
+                fn=process_gate,
+                label_provider=functools.partial(
+                    _labels_in_any,
+                    [x.label_provider for x in due],
+                ),
+                budget=_combined_budget(due),
+            )
+
+
+def _configure_schedule_for_gate(
+    sweeps: _GateSweeps,
+    gate: Gate,
+    name: str,
+) -> None:
+    for trigger in gate.triggers:
+        if isinstance(trigger, SystemTimeTrigger):
+            for slot, slot_time, label_provider in _spread_slots(
+                trigger.time,
+                trigger.spread,
+                sweeps.gate_labels_in_state,
+            ):
+                sweeps.daily_at(
+                    slot_time,
+                    _Selection(
+                        label_provider,
+                        checkpoint=f'{name}:time{slot}',
+                        budget=trigger.budget,
+                        whole_gate=trigger.spread is None,
+                    ),
+                    name=f'{name}:time{slot}',
+                )
+        elif isinstance(trigger, TimezoneAwareTrigger):
+            for slot, slot_time, label_provider in _spread_slots(
+                trigger.time,
+                trigger.spread,
+                sweeps.gate_labels_in_state,
+            ):
+                sweeps.in_timezone_at(
+                    trigger._replace(time=slot_time),
+                    _Selection(
+                        label_provider,
+                        checkpoint=f'{name}:timezone{slot}',
+                        budget=trigger.budget,
+                        whole_gate=trigger.spread is None,
+                    ),
+                    name=f'{name}:timezone{slot}',
+                )
+        elif isinstance(trigger, MetadataTimezoneAwareTrigger):
+            sweeps.in_metadata_timezone_at(
+                trigger,
+                name=f'{name}:metadata_timezone',
+            )
+        elif isinstance(trigger, IntervalTrigger):
+            sweeps.every(
+                trigger.interval,
+                _Selection(
+                    sweeps.gate_labels_in_state,
+                    checkpoint=f'{name}:interval',
+                    budget=trigger.budget,
+                    whole_gate=True,
+                ),
+                name=f'{name}:interval',
+            )
+        elif isinstance(trigger, MetadataTrigger):  # pragma: no branch
+            sweeps.every(
+                datetime.timedelta(seconds=_metadata_retry_interval(gate)),
+                _Selection(
+                    functools.partial(
+                        labels_needing_metadata_update_retry_in_gate,
+                        only_exitable=True,
+                    ),
+                    checkpoint=f'{name}:metadata_retry',
+                ),
+                name=f'{name}:metadata_retry',
+            )
+        else:
+            # We only care about time based triggers and retries here.
+            pass  # pragma: no cover
+
+
 def _configure_schedule_for_state(
-    scheduler: schedule.Scheduler,
+    scheduler: Scheduler,
     processor: StateSpecificCronProcessor,
     state: State,
+    name: str,
 ) -> None:
     if isinstance(state, Action):
-        scheduler.every().minute.do(
-            processor,
-            fn=process_action,
-            label_provider=labels_in_state,
+        scheduler.every(
+            ONE_MINUTE,
+            functools.partial(
+                processor,
+                fn=process_action,
+                label_provider=labels_in_state,
+                checkpoint=f'{name}:action',
+            ),
+            name=f'{name}:action',
         )
     elif isinstance(state, Gate):
-        for trigger in state.triggers:
-            if isinstance(trigger, SystemTimeTrigger):
-                scheduler.every().day.at(
-                    f"{trigger.time.hour:02d}:{trigger.time.minute:02d}",
-                ).do(
-                    processor,
-                    fn=process_gate,
-                    label_provider=labels_in_state,
-                )
-            elif isinstance(trigger, TimezoneAwareTrigger):
-                func = functools.partial(
-                    processor,
-                    fn=process_gate,
-                    label_provider=labels_in_state,
-                )
-                scheduler.every().minute.do(
-                    TimezoneAwareProcessor(func, trigger),
-                )
-            elif isinstance(trigger, MetadataTimezoneAwareTrigger):
-                scheduler.every().minute.do(
-                    MetadataTimezoneAwareProcessor(
-                        functools.partial(processor, fn=process_gate),
-                        trigger,
-                    ),
-                )
-            elif isinstance(trigger, IntervalTrigger):
-                scheduler.every(
-                    trigger.interval.total_seconds(),
-                ).seconds.do(
-                    processor,
-                    fn=process_gate,
-                    label_provider=labels_in_state,
-                )
-            elif isinstance(trigger, MetadataTrigger):  # pragma: no branch
-                label_provider = labels_needing_metadata_update_retry_in_gate
-                scheduler.every().minute.do(
-                    processor,
-                    fn=process_gate,
-                    label_provider=label_provider,
-                )
-            else:
-                # We only care about time based triggers and retries here.
-                pass  # pragma: no cover
+        sweeps = _GateSweeps(processor, name)
+        _configure_schedule_for_gate(sweeps, state, name)
+        if sweeps.triggers:
+            scheduler.add(Job(
+                sweeps,
+                sweeps.next_run_after,
+                name=f'{name}:sweep',
+            ))
     else:
         raise RuntimeError(  # pragma: no cover
             f"Unsupported state type {state}",
@@ -170,7 +591,7 @@ def _configure_schedule_for_state(
 
 def configure_schedule(
     app: App,
-    scheduler: schedule.Scheduler,
+    scheduler: Scheduler,
     processor: CronProcessor,
 ) -> None:
     """Set up all scheduled tasks that need running."""
@@ -185,16 +606,51 @@ def configure_schedule(
                     state_machine=state_machine,
                 ),
                 state,
+                f'{state_machine.name}:{state.name}',
             )
 
 
+def configure_maintenance(
+    app: App,
+    scheduler: Scheduler,
+    is_terminating: IsTerminating,
+) -> None:
+    """Set up the periodic maintenance of history and labels."""
+    scheduler.every(
+        HISTORY_MAINTENANCE_INTERVAL,
+        functools.partial(maintain_history, app),
+        name='history_maintenance',
+    )
+    for state_machine in app.config.state_machines.values():
+        if state_machine.archive_labels_after is None:
+            continue
+        scheduler.every(
+            LABEL_ARCHIVE_INTERVAL,
+            functools.partial(
+                archive_labels,
+                app,
+                state_machine,
+                is_terminating,
+            ),
+            name=f'{state_machine.name}:archive',
+        )
+
+
 class CronThread(threading.Thread):  # pragma: no cover
-    """Background thread for running periodic jobs."""
+    """Background thread scheduling periodic jobs onto worker threads."""
 
-    def __init__(self, app: App) -> None:
+    def __init__(self, app: App, workers: int = CRON_WORKERS) -> None:
         self._terminating = False
         self.app = app
-        self.scheduler = schedule.Scheduler()
+        self.scheduler = Scheduler()
+        # Only half the workers may process labels at once, so that sweeps
+        # started on the others queue for the fair share rather than being
+        # served in the order they happened to start.
+        self.fair_share = FairShare(slots=max(1, workers // 2))
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="cron",
+        )
         super().__init__(name="cron")
 
     def run(self) -> None:
@@ -205,17 +661,102 @@ class CronThread(threading.Thread):  # pragma: no cover
             functools.partial(
                 process_job,
                 is_terminating=self.is_terminating,
+                fair_share=self.fair_share,
             ),
         )
+        configure_maintenance(self.app, self.scheduler, self.is_terminating)
         self.app.logger.info("Starting cron thread")
+        self.scheduler.run(
+            self.executor,
+            self.app.logger,
+            self.is_terminating,
+        )
+
+    def stop(self) -> None:
+        """Set the stopping flag and wait for thread and job ends."""
+        self._terminating = True
+        self.app.logger.info("Cron thread shutting down")
+        self.scheduler.wake()
+        self.join()
+        self.executor.shutdown()
+
+    def is_terminating(self) -> bool:
+        """Dynamically access whether we are terminating."""
+        return self._terminating
+
+
+class TransitionQueueThread(threading.Thread):  # pragma: no cover
+    """Background thread processing queued transitions."""
+
+    def __init__(self, app: App, name: str = "transition-queue") -> None:
+        self._terminating = False
+        self.app = app
+        super().__init__(name=name)
+
+    def run(self) -> None:
+        """Drain the transition queue until stopped."""
+        self.app.logger.info("Starting transition queue thread")
         while not self.is_terminating():
-            self.scheduler.run_pending()
-            time.sleep(1)
+            try:
+                process_transition_queue(self.app, self.is_terminating)
+            except Exception:  # noqa: B902
+                self.app.logger.exception(
+                    "Failed to process the transition queue",
+                )
+            time.sleep(TRANSITION_QUEUE_POLL_INTERVAL)
 
     def stop(self) -> None:
         """Set the stopping flag and wait for thread end."""
         self._terminating = True
-        self.app.logger.info("Cron thread shutting down")
+        self.app.logger.info("Transition queue thread shutting down")
+        self.join()
+
+    def is_terminating(self) -> bool:
+        """Dynamically access whether we are terminating."""
+        return self._terminating
+
+
+class MetadataTriggersListenerThread(threading.Thread):  # pragma: no cover
+    """Background thread evaluating gates as soon as labels are notified."""
+
+    def __init__(self, app: App) -> None:
+        self._terminating = False
+        self.app = app
+        super().__init__(name="metadata-triggers-listener")
+
+    def run(self) -> None:
+        """Listen for and process notifications until stopped."""
+        self.app.logger.info("Starting metadata triggers listener thread")
+        while not self.is_terminating():
+            try:
+                with self.app.listen(METADATA_TRIGGERS_CHANNEL) as connection:
+                    while not self.is_terminating():
+                        self._process_notifications(connection)
+            except Exception:  # noqa: B902
+                # Notifications missed while reconnecting are left to the
+                # periodic metadata retries.
+                self.app.logger.exception(
+                    "Failed to listen for metadata triggers",
+                )
+                time.sleep(1)
+
+    def _process_notifications(self, connection) -> None:
+        readable, _, _ = select.select([connection], [], [], 1)
+        if not readable:
+            return
+
+        connection.poll()
+        # Repeated notifications for a label need only be processed once.
+        payloads = dict.fromkeys(x.payload for x in connection.notifies)
+        connection.notifies.clear()
+
+        for payload in payloads:
+            process_metadata_triggers_notification(self.app, payload)
+
+    def stop(self) -> None:
+        """Set the stopping flag and wait for thread end."""
+        self._terminating = True
+        self.app.logger.info("Metadata triggers listener thread shutting down")
         self.join()
 
     def is_terminating(self) -> bool:
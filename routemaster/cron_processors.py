@@ -3,7 +3,7 @@
 import logging
 import datetime
 import functools
-from typing import Any, List, Type, Callable
+from typing import Any, Type, Callable
 from typing_extensions import Protocol
 
 import dateutil.tz
@@ -12,7 +12,7 @@ from routemaster.config import (
     TimezoneAwareTrigger,
     MetadataTimezoneAwareTrigger,
 )
-from routemaster.timezones import get_known_timezones
+from routemaster.timezones import LocalTimeSchedule
 from routemaster.time_utils import time_appears_in_range
 from routemaster.state_machine import (
     LabelProvider,
@@ -106,7 +106,7 @@ class MetadataTimezoneAwareProcessor:
 
     This expects to be called regularly, but is tolerant of delays. It will
     only actually do any processing if its trigger time (for any known
-    timezone) has pased since it was last called (or constructed). The
+    timezone) has passed since it was last called (or constructed). The
     processing it does is then filtered to labels whose timezone metadata is
     among the matched timezones.
 
@@ -122,6 +122,7 @@ class MetadataTimezoneAwareProcessor:
     ) -> None:
         self.processor = processor
         self.trigger = trigger
+        self._schedule = LocalTimeSchedule(trigger.time)
         self._last_call = datetime.datetime.now(dateutil.tz.tzutc())
         self._logger = _logger_for_type(type(self))
 
@@ -131,18 +132,10 @@ class MetadataTimezoneAwareProcessor:
         self._last_call = now = datetime.datetime.now(dateutil.tz.tzutc())
 
         try:
-            timezones: List[str] = []
-            for timezone in get_known_timezones():
-                trigger_time = self.trigger.time.replace(
-                    tzinfo=dateutil.tz.gettz(timezone),
-                )
-                matches = time_appears_in_range(
-                    when=trigger_time,
-                    start=last_call,
-                    end=now,
-                )
-                if matches:
-                    timezones.append(timezone)
+            timezones = sorted(self._schedule.timezones_between(
+                last_call,
+                now,
+            ))
         except ValueError:
             self._logger.exception(
                 "Failed to determine whether trigger time has passed",
@@ -160,6 +153,7 @@ class MetadataTimezoneAwareProcessor:
             labels_in_state_with_metadata,
             path=self.trigger.timezone_metadata_path,
             values=timezones,
+            only_exitable=True,
         )
 
         self._logger.info(
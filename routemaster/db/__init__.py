@@ -1,11 +1,59 @@
 """Public Database interface."""
 
-from routemaster.db.model import Label, History, metadata
+from routemaster.db.model import (
+    Label,
+    History,
+    ArchivedLabel,
+    CronCheckpoint,
+    ArchivedHistory,
+    QueuedTransition,
+    metadata,
+    jsonb_deep_merge,
+)
+from routemaster.db.indexes import (
+    MetadataIndex,
+    metadata_text,
+    metadata_indexes,
+    existing_metadata_indexes,
+)
+from routemaster.db.partitions import (
+    HISTORY_DEFAULT_PARTITION,
+    HistoryPartition,
+    history_partition_for,
+    drop_history_partition,
+    history_default_bounds,
+    history_partitions_from,
+    create_history_partition,
+    add_history_default_bound,
+    drop_history_default_bound,
+    existing_history_partitions,
+    validate_history_default_bound,
+)
 from routemaster.db.initialisation import initialise_db
 
 __all__ = (
     'Label',
     'History',
+    'ArchivedLabel',
+    'ArchivedHistory',
     'metadata',
+    'MetadataIndex',
     'initialise_db',
+    'metadata_text',
+    'metadata_indexes',
+    'CronCheckpoint',
+    'QueuedTransition',
+    'jsonb_deep_merge',
+    'HistoryPartition',
+    'history_partition_for',
+    'drop_history_partition',
+    'history_partitions_from',
+    'history_default_bounds',
+    'create_history_partition',
+    'HISTORY_DEFAULT_PARTITION',
+    'add_history_default_bound',
+    'drop_history_default_bound',
+    'existing_metadata_indexes',
+    'existing_history_partitions',
+    'validate_history_default_bound',
 )
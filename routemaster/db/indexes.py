@@ -0,0 +1,77 @@
+"""Indexes on label metadata paths queried by the loaded config."""
+
+import hashlib
+from typing import Any, List, Sequence, NamedTuple
+
+from sqlalchemy.engine import Connectable
+
+from routemaster.config import Gate, Config, MetadataTimezoneAwareTrigger
+from routemaster.db.model import Label
+
+# Indexes with this prefix are managed by `metadata_indexes`, and are reported
+# as unused if no longer needed by the config.
+METADATA_INDEX_PREFIX = 'ix_labels_metadata_'
+
+# Postgres truncates longer identifiers.
+_MAX_IDENTIFIER_LENGTH = 63
+
+
+class MetadataIndex(NamedTuple):
+    """An expression index on the text at a path in label metadata."""
+    name: str
+    path: Sequence[str]
+
+    @property
+    def definition(self) -> str:
+        """SQL creating this index, without locking out writes to labels."""
+        # Config paths are restricted to alphanumerics and underscores, so
+        # need no quoting.
+        return (
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON labels "
+            f"((metadata #>> '{{{','.join(self.path)}}}'))"
+        )
+
+
+def metadata_text(path: Sequence[str]) -> Any:
+    """
+    The text at `path` in label metadata, as a SQL expression.
+
+    Queries filtering on this expression can use `MetadataIndex`es.
+    """
+    return Label.metadata[tuple(path)].astext
+
+
+def _index_name(path: Sequence[str]) -> str:
+    name = METADATA_INDEX_PREFIX + '__'.join(path)
+    if len(name) <= _MAX_IDENTIFIER_LENGTH:
+        return name
+
+    digest = hashlib.sha256('.'.join(path).encode('utf-8')).hexdigest()
+    return name[:_MAX_IDENTIFIER_LENGTH - 9] + '_' + digest[:8]
+
+
+def metadata_indexes(config: Config) -> List[MetadataIndex]:
+    """The indexes needed for the metadata paths queried by `config`."""
+    paths = {
+        tuple(trigger.timezone_metadata_path)
+        for state_machine in config.state_machines.values()
+        for state in state_machine.states
+        if isinstance(state, Gate)
+        for trigger in state.triggers
+        if isinstance(trigger, MetadataTimezoneAwareTrigger)
+    }
+    return sorted(
+        (MetadataIndex(name=_index_name(x), path=x) for x in paths),
+        key=lambda x: x.name,
+    )
+
+
+def existing_metadata_indexes(bind: Connectable) -> List[str]:
+    """The names of the metadata indexes present in the database."""
+    return sorted(
+        name
+        for name, in bind.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'labels'",
+        )
+        if name.startswith(METADATA_INDEX_PREFIX)
+    )
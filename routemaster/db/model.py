@@ -4,7 +4,7 @@ import functools
 from typing import Any
 
 import dateutil.tz
-from sqlalchemy import DDL, Table
+from sqlalchemy import DDL, Index, Table
 from sqlalchemy import Column as NullableColumn
 from sqlalchemy import (
     String,
@@ -15,6 +15,7 @@ from sqlalchemy import (
     FetchedValue,
     ForeignKeyConstraint,
     func,
+    text,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -42,10 +43,84 @@ sync_label_updated_column = DDL(
     CREATE TRIGGER sync_label_updated_column
         BEFORE UPDATE ON labels
         FOR EACH ROW
+        WHEN (
+            OLD.metadata IS DISTINCT FROM NEW.metadata OR
+            OLD.deleted IS DISTINCT FROM NEW.deleted
+        )
         EXECUTE PROCEDURE sync_label_updated_column_fn();
     ''',
 )
 
+reset_label_next_evaluation = DDL(
+    '''
+    CREATE OR REPLACE FUNCTION reset_label_next_evaluation_fn()
+        RETURNS TRIGGER AS
+            $$
+                BEGIN
+                    IF NEW.metadata IS DISTINCT FROM OLD.metadata THEN
+                        NEW.next_evaluation_key = NULL;
+                    END IF;
+                    RETURN NEW;
+                END;
+            $$
+        LANGUAGE PLPGSQL;
+
+    CREATE TRIGGER reset_label_next_evaluation
+        BEFORE UPDATE ON labels
+        FOR EACH ROW
+        EXECUTE PROCEDURE reset_label_next_evaluation_fn();
+    ''',
+)
+
+# Follows the semantics of `routemaster.utils.dict_merge`: objects present
+# on both sides are merged recursively, anything else in `changes` replaces
+# the existing value.
+create_jsonb_deep_merge = DDL(
+    '''
+    CREATE OR REPLACE FUNCTION jsonb_deep_merge(existing JSONB, changes JSONB)
+        RETURNS JSONB AS
+            $$
+                DECLARE
+                    merged JSONB := existing;
+                    change_key TEXT;
+                    change_value JSONB;
+                BEGIN
+                    FOR change_key, change_value IN
+                        SELECT * FROM jsonb_each(changes)
+                    LOOP
+                        IF
+                            jsonb_typeof(merged -> change_key) = 'object' AND
+                            jsonb_typeof(change_value) = 'object'
+                        THEN
+                            change_value := jsonb_deep_merge(
+                                merged -> change_key,
+                                change_value
+                            );
+                        END IF;
+                        merged := merged ||
+                            jsonb_build_object(change_key, change_value);
+                    END LOOP;
+                    RETURN merged;
+                END;
+            $$
+        LANGUAGE PLPGSQL
+        IMMUTABLE;
+    ''',
+)
+
+
+# History is range partitioned by month of `created`, with partitions created
+# ahead of time by `routemaster.db.partitions`. Anything outside of those,
+# such as entries kept when older partitions are dropped, is held here.
+create_history_default_partition = DDL(
+    'CREATE TABLE history_default PARTITION OF history DEFAULT',
+)
+
+
+def jsonb_deep_merge(existing: Any, update: Any) -> Any:
+    """SQL expression merging JSONB `update` into `existing` recursively."""
+    return func.jsonb_deep_merge(existing, update, type_=JSONB)
+
 
 # ORM classes
 
@@ -69,8 +144,35 @@ class Label(Base):
             server_default=func.now(),
             server_onupdate=FetchedValue(),
         ),
+
+        # When the exit condition of the label's gate next needs evaluating.
+        # This only applies to the evaluation identified by
+        # `next_evaluation_key`, of the label's current history entry under
+        # its gate's current exit condition; any change to the metadata
+        # clears the key. Null indicates that only a change to the label can
+        # allow it to exit.
+        NullableColumn(
+            'next_evaluation_at',
+            DateTime(timezone=True),
+            index=True,
+        ),
+        NullableColumn(
+            'next_evaluation_key',
+            String,
+            server_onupdate=FetchedValue(),
+        ),
+
+        # Supports sweeps for labels needing their metadata triggers retried.
+        Index(
+            'ix_labels_pending_metadata_triggers',
+            'state_machine',
+            postgresql_where=text('NOT metadata_triggers_processed'),
+        ),
+
         listeners=[
             ('after_create', sync_label_updated_column),
+            ('after_create', reset_label_next_evaluation),
+            ('after_create', create_jsonb_deep_merge),
         ],
     )
 
@@ -98,9 +200,11 @@ class History(Base):
             ['labels.name', 'labels.state_machine'],
         ),
 
+        # Part of the primary key as Postgres requires of the partition key.
         Column(
             'created',
             DateTime(timezone=True),
+            primary_key=True,
             default=lambda: datetime.datetime.now(dateutil.tz.tzutc()),
         ),
 
@@ -113,6 +217,11 @@ class History(Base):
 
         # Null indicates being deleted from a state machine
         NullableColumn('new_state', String),
+
+        postgresql_partition_by='RANGE (created)',
+        listeners=[
+            ('after_create', create_history_default_partition),
+        ],
     )
 
     label = relationship(Label, backref='history')
@@ -124,3 +233,140 @@ class History(Base):
             f"label_state_machine={self.label_state_machine!r}, "
             f"label_name={self.label_name!r})"
         )
+
+
+class ArchivedLabel(Base):
+    """A label which has been archived, as it will no longer change state."""
+
+    # Note: type annotations for this class are provided by a stubs file
+
+    __table__ = Table(
+        'archived_labels',
+        metadata,
+        Column('name', String, primary_key=True),
+        Column('state_machine', String, primary_key=True),
+        Column('metadata', JSONB),
+        Column('deleted', Boolean),
+        Column('updated', DateTime(timezone=True)),
+        Column(
+            'archived',
+            DateTime(timezone=True),
+            server_default=func.now(),
+        ),
+    )
+
+    def __repr__(self):
+        """Return a useful debug representation."""
+        return (
+            f"ArchivedLabel(state_machine={self.state_machine!r}, "
+            f"name={self.name!r})"
+        )
+
+
+class ArchivedHistory(Base):
+    """A historical state transition of an archived label."""
+
+    # Note: type annotations for this class are provided by a stubs file
+
+    __table__ = Table(
+        'archived_history',
+        metadata,
+        # Kept from the label's history, so is not generated.
+        Column('id', Integer, primary_key=True, autoincrement=False),
+
+        Column('label_name', String),
+        Column('label_state_machine', String),
+        ForeignKeyConstraint(
+            ['label_name', 'label_state_machine'],
+            ['archived_labels.name', 'archived_labels.state_machine'],
+        ),
+
+        Column('created', DateTime(timezone=True)),
+        Column('forced', Boolean),
+        NullableColumn('old_state', String),
+        NullableColumn('new_state', String),
+
+        Index(
+            'ix_archived_history_label',
+            'label_state_machine',
+            'label_name',
+        ),
+    )
+
+    def __repr__(self):
+        """Return a useful debug representation."""
+        return (
+            f"ArchivedHistory(id={self.id!r}, "
+            f"label_state_machine={self.label_state_machine!r}, "
+            f"label_name={self.label_name!r})"
+        )
+
+
+class QueuedTransition(Base):
+    """A label awaiting processing by the transition queue workers."""
+
+    # Note: type annotations for this class are provided by a stubs file
+
+    __table__ = Table(
+        'transition_queue',
+        metadata,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+
+        Column('label_name', String),
+        Column('label_state_machine', String),
+        ForeignKeyConstraint(
+            ['label_name', 'label_state_machine'],
+            ['labels.name', 'labels.state_machine'],
+        ),
+
+        # The gate to evaluate following a metadata update. Null indicates
+        # that only the transitions on entering the current state are due.
+        NullableColumn('gate', String),
+
+        Column(
+            'created',
+            DateTime(timezone=True),
+            server_default=func.now(),
+        ),
+    )
+
+    label = relationship(Label)
+
+    def __repr__(self):
+        """Return a useful debug representation."""
+        return (
+            f"QueuedTransition(id={self.id!r}, "
+            f"label_state_machine={self.label_state_machine!r}, "
+            f"label_name={self.label_name!r})"
+        )
+
+
+class CronCheckpoint(Base):
+    """The progress of a cron job through its current sweep of labels."""
+
+    # Note: type annotations for this class are provided by a stubs file
+
+    __table__ = Table(
+        'cron_checkpoints',
+        metadata,
+        Column('job', String, primary_key=True),
+        # Identifies the sweep in progress, which may be resumed by a later
+        # run of the job, possibly on another node.
+        Column('run_id', String),
+        # The name of the last label processed. Labels are swept in name
+        # order, so a resumed sweep continues from after this label.
+        NullableColumn('cursor', String),
+        Column(
+            'updated',
+            DateTime(timezone=True),
+            server_default=func.now(),
+            onupdate=func.now(),
+        ),
+    )
+
+    def __repr__(self):
+        """Return a useful debug representation."""
+        return (
+            f"CronCheckpoint(job={self.job!r}, run_id={self.run_id!r}, "
+            f"cursor={self.cursor!r})"
+        )
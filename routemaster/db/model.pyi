@@ -10,6 +10,9 @@ _JSON = Union[str, int, float, bool, None, Dict[str, Any], List[Any]]
 metadata: MetaData
 
 
+def jsonb_deep_merge(existing: Any, update: Any) -> Any: ...
+
+
 class Label:
     name: str
     state_machine: str
@@ -17,6 +20,8 @@ class Label:
     metadata_triggers_processed: bool
     deleted: bool
     updated: datetime.datetime
+    next_evaluation_at: Optional[datetime.datetime]
+    next_evaluation_key: Optional[str]
 
     history: List['History']
 
@@ -29,6 +34,8 @@ class Label:
         metadata_triggers_processed: bool=...,
         deleted: bool=...,
         updated: datetime.datetime=...,
+        next_evaluation_at: Optional[datetime.datetime]=...,
+        next_evaluation_key: Optional[str]=...,
         history: List['History']=...,
     ) -> None: ...
 
@@ -58,3 +65,84 @@ class History:
         new_state: Optional[str]=...,
         label: Label=...,
     ) -> None: ...
+
+
+class ArchivedLabel:
+    name: str
+    state_machine: str
+    metadata: _JSON
+    deleted: bool
+    updated: datetime.datetime
+    archived: datetime.datetime
+
+    def __init__(
+        self,
+        *,
+        name: str=...,
+        state_machine: str=...,
+        metadata: _JSON=...,
+        deleted: bool=...,
+        updated: datetime.datetime=...,
+        archived: datetime.datetime=...,
+    ) -> None: ...
+
+
+class ArchivedHistory:
+    id: int
+
+    label_name: str
+    label_state_machine: str
+    created: datetime.datetime
+    forced: bool
+
+    old_state: Optional[str]
+    new_state: Optional[str]
+
+    def __init__(
+        self,
+        *,
+        id: int=...,
+        label_name: str=...,
+        label_state_machine: str=...,
+        created: datetime.datetime=...,
+        forced: bool=...,
+        old_state: Optional[str]=...,
+        new_state: Optional[str]=...,
+    ) -> None: ...
+
+
+class QueuedTransition:
+    id: int
+
+    label_name: str
+    label_state_machine: str
+    gate: Optional[str]
+    created: datetime.datetime
+
+    label: Label
+
+    def __init__(
+        self,
+        *,
+        id: int=...,
+        label_name: str=...,
+        label_state_machine: str=...,
+        gate: Optional[str]=...,
+        created: datetime.datetime=...,
+        label: Label=...,
+    ) -> None: ...
+
+class CronCheckpoint:
+    job: str
+    run_id: str
+    cursor: Optional[str]
+    updated: datetime.datetime
+
+    def __init__(
+        self,
+        *,
+        job: str=...,
+        run_id: str=...,
+        cursor: Optional[str]=...,
+        updated: datetime.datetime=...,
+    ) -> None: ...
@@ -0,0 +1,232 @@
+"""Monthly range partitions of the history table."""
+
+import re
+import datetime
+from typing import Dict, List, Iterator, NamedTuple
+
+import dateutil.tz
+from sqlalchemy.engine import Connectable
+
+# Holds entries outside of any monthly partition, including those kept when
+# the partition they were in is dropped.
+HISTORY_DEFAULT_PARTITION = 'history_default'
+
+_PARTITION_NAME = re.compile(r'^history_y(?P<year>\d{4})m(?P<month>\d{2})$')
+
+# Check constraints bounding the default partition to entries created before
+# a month, named for that month's partition.
+_DEFAULT_BOUND_NAME = re.compile(
+    r'^history_default_before_y(?P<year>\d{4})m(?P<month>\d{2})$',
+)
+
+
+class HistoryPartition(NamedTuple):
+    """The partition of history holding the entries created in a month."""
+    year: int
+    month: int
+
+    @property
+    def name(self) -> str:
+        """The name of the partition's table."""
+        return f'history_y{self.year:04}m{self.month:02}'
+
+    @property
+    def start(self) -> datetime.datetime:
+        """When the first entry in the partition may have been created."""
+        return datetime.datetime(
+            self.year,
+            self.month,
+            1,
+            tzinfo=dateutil.tz.tzutc(),
+        )
+
+    @property
+    def end(self) -> datetime.datetime:
+        """When entries are first created after the partition."""
+        return self.next().start
+
+    def next(self) -> 'HistoryPartition':
+        """The partition for the following month."""
+        if self.month == 12:
+            return HistoryPartition(self.year + 1, 1)
+        return HistoryPartition(self.year, self.month + 1)
+
+
+def history_partition_for(moment: datetime.datetime) -> HistoryPartition:
+    """The partition of history holding entries created at `moment`."""
+    moment = moment.astimezone(dateutil.tz.tzutc())
+    return HistoryPartition(moment.year, moment.month)
+
+
+def history_partitions_from(
+    moment: datetime.datetime,
+) -> Iterator[HistoryPartition]:
+    """The partitions of history from that holding `moment` onwards."""
+    partition = history_partition_for(moment)
+    while True:
+        yield partition
+        partition = partition.next()
+
+
+def existing_history_partitions(bind: Connectable) -> List[HistoryPartition]:
+    """The monthly partitions of history present in the database, in order."""
+    names = bind.execute(
+        "SELECT relname FROM pg_inherits JOIN pg_class "
+        "ON pg_class.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'history'::regclass",
+    )
+    return sorted(
+        HistoryPartition(int(match['year']), int(match['month']))
+        for match in (_PARTITION_NAME.match(name) for name, in names)
+        if match is not None
+    )
+
+
+def _default_bound_name(partition: HistoryPartition) -> str:
+    return (
+        f'{HISTORY_DEFAULT_PARTITION}_before_'
+        f'y{partition.year:04}m{partition.month:02}'
+    )
+
+
+def history_default_bounds(bind: Connectable) -> Dict[HistoryPartition, bool]:
+    """
+    The bounds of the default partition, and whether each has been validated.
+
+    A bound is the partition of the month before which all entries in the
+    default partition must have been created. Once validated, partitions from
+    that month on are attached without scanning the default partition.
+    """
+    constraints = bind.execute(
+        f"SELECT conname, convalidated FROM pg_constraint "
+        f"WHERE conrelid = '{HISTORY_DEFAULT_PARTITION}'::regclass "
+        f"AND contype = 'c'",
+    )
+    return {
+        HistoryPartition(int(match['year']), int(match['month'])): validated
+        for match, validated in (
+            (_DEFAULT_BOUND_NAME.match(name), validated)
+            for name, validated in constraints
+        )
+        if match is not None
+    }
+
+
+def add_history_default_bound(
+    bind: Connectable,
+    partition: HistoryPartition,
+) -> None:
+    """
+    Bound the default partition to entries created before `partition`.
+
+    The bound applies to entries added from now on, but existing entries are
+    only checked by `validate_history_default_bound`, which should be run in
+    a later transaction as adding the bound locks the default partition. Must
+    be run in a transaction.
+    """
+    bind.execute(
+        f"ALTER TABLE {HISTORY_DEFAULT_PARTITION} "
+        f"ADD CONSTRAINT {_default_bound_name(partition)} "
+        f"CHECK (created < '{partition.start.isoformat()}') NOT VALID",
+    )
+
+
+def validate_history_default_bound(
+    bind: Connectable,
+    partition: HistoryPartition,
+) -> None:
+    """
+    Validate a bound of the default partition, and drop any others.
+
+    The default partition is scanned without blocking changes to history.
+    Must be run in a transaction.
+    """
+    bind.execute(
+        f"ALTER TABLE {HISTORY_DEFAULT_PARTITION} "
+        f"VALIDATE CONSTRAINT {_default_bound_name(partition)}",
+    )
+    for other in history_default_bounds(bind):
+        if other != partition:
+            drop_history_default_bound(bind, other)
+
+
+def drop_history_default_bound(
+    bind: Connectable,
+    partition: HistoryPartition,
+) -> None:
+    """Drop a bound of the default partition. Must be run in a transaction."""
+    bind.execute(
+        f"ALTER TABLE {HISTORY_DEFAULT_PARTITION} "
+        f"DROP CONSTRAINT {_default_bound_name(partition)}",
+    )
+
+
+def create_history_partition(
+    bind: Connectable,
+    partition: HistoryPartition,
+) -> None:
+    """
+    Create a partition of history.
+
+    Any entries already created in the partition's month are moved into it
+    from the default partition, unless a validated bound of the default
+    partition shows there are none. Must be run in a transaction.
+    """
+    bind.execute(
+        f"CREATE TABLE {partition.name} (LIKE history INCLUDING DEFAULTS)",
+    )
+
+    is_bounded = any(
+        bound <= partition and validated
+        for bound, validated in history_default_bounds(bind).items()
+    )
+    if not is_bounded:
+        bind.execute(
+            f"WITH moved AS ("
+            f"DELETE FROM {HISTORY_DEFAULT_PARTITION} "
+            f"WHERE created >= '{partition.start.isoformat()}' "
+            f"AND created < '{partition.end.isoformat()}' "
+            f"RETURNING *"
+            f") INSERT INTO {partition.name} SELECT * FROM moved",
+        )
+
+    # Attaching the table adds the primary and foreign keys of history.
+    bind.execute(
+        f"ALTER TABLE history ATTACH PARTITION {partition.name} "
+        f"FOR VALUES FROM ('{partition.start.isoformat()}') "
+        f"TO ('{partition.end.isoformat()}')",
+    )
+
+
+def drop_history_partition(
+    bind: Connectable,
+    partition: HistoryPartition,
+) -> None:
+    """
+    Drop a partition of history, keeping the latest entry of each label.
+
+    The partition's entries which are the latest for their label are copied
+    aside before it is detached from history, so that history is only locked
+    to detach the partition, move those entries to the default partition and
+    drop it. Entries must not be added to or removed from the partition
+    meanwhile. Must be run in a transaction.
+    """
+    kept = f'{partition.name}_kept'
+
+    # Those copied can only be superseded by entries in later months before
+    # the partition is detached, which does no harm.
+    bind.execute(
+        f"CREATE TEMPORARY TABLE {kept} ON COMMIT DROP AS "
+        f"SELECT DISTINCT ON (label_name, label_state_machine) * "
+        f"FROM {partition.name} AS dropped "
+        f"WHERE NOT EXISTS ("
+        f"SELECT 1 FROM history "
+        f"WHERE history.label_name = dropped.label_name "
+        f"AND history.label_state_machine = dropped.label_state_machine "
+        f"AND history.id > dropped.id"
+        f") "
+        f"ORDER BY label_name, label_state_machine, id DESC",
+    )
+    bind.execute(f"ALTER TABLE history DETACH PARTITION {partition.name}")
+    bind.execute(f"INSERT INTO history SELECT * FROM {kept}")
+    bind.execute(f"DROP TABLE {partition.name}")
@@ -0,0 +1,108 @@
+import datetime
+
+import pytest
+import sqlalchemy
+
+from routemaster.db import (
+    Label,
+    MetadataIndex,
+    metadata_text,
+    metadata_indexes,
+    existing_metadata_indexes,
+)
+from routemaster.config import (
+    Gate,
+    Config,
+    NoNextStates,
+    StateMachine,
+    MetadataTimezoneAwareTrigger,
+)
+from routemaster.exit_conditions import ExitConditionProgram
+
+
+def _config(*paths):
+    return Config(
+        state_machines={
+            'example': StateMachine(
+                name='example',
+                feeds=[],
+                webhooks=[],
+                states=[
+                    Gate(
+                        name=f'gate_{index}',
+                        next_states=NoNextStates(),
+                        exit_condition=ExitConditionProgram('false'),
+                        triggers=[MetadataTimezoneAwareTrigger(
+                            datetime.time(12, 0),
+                            timezone_metadata_path=path,
+                        )],
+                    )
+                    for index, path in enumerate(paths)
+                ],
+            ),
+        },
+        database=None,
+        logging_plugins=[],
+    )
+
+
+def test_metadata_indexes_for_timezone_trigger_paths():
+    config = _config(['tz'], ['user', 'tz'], ['tz'])
+
+    assert metadata_indexes(config) == [
+        MetadataIndex(name='ix_labels_metadata_tz', path=('tz',)),
+        MetadataIndex(
+            name='ix_labels_metadata_user__tz',
+            path=('user', 'tz'),
+        ),
+    ]
+
+
+def test_metadata_index_names_are_valid_identifiers():
+    long_path = ['a' * 40, 'b' * 40]
+    other_path = ['a' * 40, 'c' * 40]
+
+    index, other_index = metadata_indexes(_config(long_path, other_path))
+
+    assert len(index.name) <= 63
+    assert index.name.startswith('ix_labels_metadata_')
+    assert index.name != other_index.name
+
+
+@pytest.fixture()
+def user_timezone_index(app):
+    index, = metadata_indexes(_config(['user', 'tz']))
+    with app.new_session():
+        connection = app.session.connection()
+        # Concurrent index creation cannot happen in a transaction
+        connection.execute(index.definition.replace(' CONCURRENTLY', ''))
+    yield index
+    with app.new_session():
+        app.session.execute(f'DROP INDEX {index.name}')
+
+
+def test_queries_on_metadata_text_use_index(app, user_timezone_index):
+    with app.new_session():
+        assert existing_metadata_indexes(app.session.connection()) == [
+            user_timezone_index.name,
+        ]
+
+        app.session.execute('SET LOCAL enable_seqscan = off')
+        query = sqlalchemy.select([Label.name]).where(
+            metadata_text(['user', 'tz']).in_(['Europe/London']),
+        )
+        # Explain the query as the driver would send it, with paths passed as
+        # arrays as by the JSONB path type.
+        compiled = query.compile(dialect=app.session.bind.dialect)
+        params = {
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in compiled.params.items()
+        }
+        plan = '\n'.join(
+            x for x, in app.session.connection().execute(
+                f'EXPLAIN {compiled}',
+                params,
+            )
+        )
+
+    assert user_timezone_index.name in plan
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import JSONB
+
+from routemaster.db import jsonb_deep_merge
+from routemaster.utils import dict_merge
+
+KEYS = ('a', 'b', 'c', 'd')
+
+
+def _random_value(rng, depth):
+    kind = rng.choice(('dict', 'dict', 'list', 'scalar', 'scalar'))
+    if kind == 'dict' and depth < 4:
+        return _random_document(rng, depth + 1)
+    if kind == 'list':
+        return [_random_value(rng, depth + 1) for _ in range(rng.randrange(3))]
+    return rng.choice((
+        None,
+        True,
+        False,
+        0,
+        rng.randrange(-1000, 1000),
+        rng.random(),
+        '',
+        rng.choice(KEYS),
+    ))
+
+
+def _random_document(rng, depth=0):
+    return {
+        key: _random_value(rng, depth)
+        for key in rng.sample(KEYS, rng.randrange(len(KEYS) + 1))
+    }
+
+
+def _merge(app, existing, changes):
+    with app.new_session():
+        return app.session.execute(sqlalchemy.select([jsonb_deep_merge(
+            sqlalchemy.literal(existing, JSONB),
+            sqlalchemy.literal(changes, JSONB),
+        )])).scalar()
+
+
+@pytest.mark.parametrize('existing, changes', [
+    ({}, {}),
+    ({'a': 1}, {}),
+    ({}, {'a': 1}),
+    ({'a': {'b': 1}}, {'a': {'c': 2}}),
+    ({'a': {'b': 1}}, {'a': None}),
+    ({'a': None}, {'a': {'b': 1}}),
+    ({'a': [1, 2]}, {'a': [3]}),
+    ({'a': {'b': {'c': 1}}}, {'a': {'b': {'c': {'d': 2}}}}),
+])
+def test_jsonb_deep_merge(app, existing, changes):
+    assert _merge(app, existing, changes) == dict_merge(existing, changes)
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_jsonb_deep_merge_parity_on_random_documents(app, seed):
+    rng = random.Random(seed)
+    existing = _random_document(rng)
+    changes = _random_document(rng)
+
+    assert _merge(app, existing, changes) == dict_merge(existing, changes)
@@ -0,0 +1,201 @@
+import io
+import pathlib
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+ALEMBIC_INI = pathlib.Path(__file__).parents[3] / 'alembic.ini'
+
+
+def _alembic_config(output_buffer=None):
+    config = Config(str(ALEMBIC_INI), output_buffer=output_buffer)
+    config.set_main_option(
+        'script_location',
+        str(ALEMBIC_INI.parent / 'routemaster' / 'migrations'),
+    )
+    return config
+
+
+def test_migrations_have_a_single_head():
+    script = ScriptDirectory.from_config(_alembic_config())
+    assert len(script.get_heads()) == 1
+
+
+def test_next_evaluation_migration():
+    output = io.StringIO()
+    command.upgrade(
+        _alembic_config(output),
+        '6fb8896f0729:c2a7f1d83e54',
+        sql=True,
+    )
+    sql = output.getvalue()
+
+    assert 'ADD COLUMN next_evaluation_at TIMESTAMP WITH TIME ZONE' in sql
+    assert 'ADD COLUMN next_evaluation_key VARCHAR' in sql
+    assert 'CREATE INDEX ix_labels_next_evaluation_at' in sql
+    assert 'CREATE TRIGGER reset_label_next_evaluation' in sql
+
+
+def test_next_evaluation_migration_downgrade():
+    output = io.StringIO()
+    command.downgrade(
+        _alembic_config(output),
+        'c2a7f1d83e54:6fb8896f0729',
+        sql=True,
+    )
+    sql = output.getvalue()
+
+    assert 'DROP TRIGGER reset_label_next_evaluation' in sql
+    assert 'DROP COLUMN next_evaluation_key' in sql
+    assert 'DROP COLUMN next_evaluation_at' in sql
+
+
+def test_jsonb_deep_merge_migration():
+    output = io.StringIO()
+    command.upgrade(
+        _alembic_config(output),
+        'c2a7f1d83e54:f3b9d5e0a217',
+        sql=True,
+    )
+    assert 'CREATE OR REPLACE FUNCTION jsonb_deep_merge' in output.getvalue()
+
+    output = io.StringIO()
+    command.downgrade(
+        _alembic_config(output),
+        'f3b9d5e0a217:c2a7f1d83e54',
+        sql=True,
+    )
+    assert 'DROP FUNCTION jsonb_deep_merge' in output.getvalue()
+
+
+def test_transition_queue_migration():
+    output = io.StringIO()
+    command.upgrade(
+        _alembic_config(output),
+        'f3b9d5e0a217:a41c7e93d5b8',
+        sql=True,
+    )
+    assert 'CREATE TABLE transition_queue' in output.getvalue()
+
+    output = io.StringIO()
+    command.downgrade(
+        _alembic_config(output),
+        'a41c7e93d5b8:f3b9d5e0a217',
+        sql=True,
+    )
+    assert 'DROP TABLE transition_queue' in output.getvalue()
+
+
+def test_pending_metadata_triggers_index_migration():
+    output = io.StringIO()
+    command.upgrade(
+        _alembic_config(output),
+        'a41c7e93d5b8:5d8e2c91b0f4',
+        sql=True,
+    )
+    assert (
+        'CREATE INDEX ix_labels_pending_metadata_triggers ON labels '
+        '(state_machine) WHERE NOT metadata_triggers_processed'
+    ) in output.getvalue()
+
+    output = io.StringIO()
+    command.downgrade(
+        _alembic_config(output),
+        '5d8e2c91b0f4:a41c7e93d5b8',
+        sql=True,
+    )
+    assert 'DROP INDEX ix_labels_pending_metadata_triggers' in output.getvalue()
+
+
+def test_cron_checkpoints_migration():
+    output = io.StringIO()
+    command.upgrade(
+        _alembic_config(output),
+        '5d8e2c91b0f4:b7e40d2c6a19',
+        sql=True,
+    )
+    assert 'CREATE TABLE cron_checkpoints' in output.getvalue()
+
+    output = io.StringIO()
+    command.downgrade(
+        _alembic_config(output),
+        'b7e40d2c6a19:5d8e2c91b0f4',
+        sql=True,
+    )
+    assert 'DROP TABLE cron_checkpoints' in output.getvalue()
+
+
+def test_partition_history_migration():
+    output = io.StringIO()
+    command.upgrade(
+        _alembic_config(output),
+        'b7e40d2c6a19:d4c9a0e7f215',
+        sql=True,
+    )
+    sql = output.getvalue()
+
+    assert 'ALTER TABLE history RENAME TO history_unpartitioned' in sql
+    assert 'PARTITION BY RANGE (created)' in sql
+    assert 'CREATE TABLE history_default PARTITION OF history DEFAULT' in sql
+    assert 'DROP TABLE history_unpartitioned' in sql
+
+    output = io.StringIO()
+    command.downgrade(
+        _alembic_config(output),
+        'd4c9a0e7f215:b7e40d2c6a19',
+        sql=True,
+    )
+    sql = output.getvalue()
+
+    assert 'PARTITION BY' not in sql
+    assert 'DROP TABLE history_partitioned' in sql
+
+
+def test_label_archive_migration():
+    output = io.StringIO()
+    command.upgrade(
+        _alembic_config(output),
+        'd4c9a0e7f215:8b3f6c2d1a47',
+        sql=True,
+    )
+    sql = output.getvalue()
+
+    assert 'CREATE TABLE archived_labels' in sql
+    assert 'CREATE TABLE archived_history' in sql
+    assert 'CREATE INDEX ix_archived_history_label' in sql
+
+    output = io.StringIO()
+    command.downgrade(
+        _alembic_config(output),
+        '8b3f6c2d1a47:d4c9a0e7f215',
+        sql=True,
+    )
+    sql = output.getvalue()
+
+    assert 'DROP TABLE archived_history' in sql
+    assert 'DROP TABLE archived_labels' in sql
+
+
+def test_sync_updated_on_label_changes_migration():
+    output = io.StringIO()
+    command.upgrade(
+        _alembic_config(output),
+        '8b3f6c2d1a47:e5a1c9d7b3f2',
+        sql=True,
+    )
+    sql = output.getvalue()
+
+    assert 'DROP TRIGGER sync_label_updated_column ON labels' in sql
+    assert 'OLD.metadata IS DISTINCT FROM NEW.metadata' in sql
+
+    output = io.StringIO()
+    command.downgrade(
+        _alembic_config(output),
+        'e5a1c9d7b3f2:8b3f6c2d1a47',
+        sql=True,
+    )
+    sql = output.getvalue()
+
+    assert 'CREATE TRIGGER sync_label_updated_column' in sql
+    assert 'WHEN' not in sql
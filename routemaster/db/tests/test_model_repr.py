@@ -1,6 +1,6 @@
 import pytest
 
-from routemaster.db import Label, History
+from routemaster.db import Label, History, CronCheckpoint, QueuedTransition
 
 INSTANCES = [
     (
@@ -14,6 +14,18 @@ INSTANCES = [
         ),
         "History(id=None, label_state_machine='foo', label_name='bar')",
     ),
+    (
+        QueuedTransition(
+            label_state_machine='foo',
+            label_name='bar',
+        ),
+        "QueuedTransition(id=None, label_state_machine='foo', "
+        "label_name='bar')",
+    ),
+    (
+        CronCheckpoint(job='foo:bar:action', run_id='baz', cursor='qux'),
+        "CronCheckpoint(job='foo:bar:action', run_id='baz', cursor='qux')",
+    ),
 ]
 
 
@@ -0,0 +1,162 @@
+import datetime
+
+import pytest
+import dateutil.tz
+from sqlalchemy.exc import IntegrityError
+
+from routemaster.db import (
+    History,
+    HistoryPartition,
+    history_partition_for,
+    drop_history_partition,
+    history_default_bounds,
+    history_partitions_from,
+    create_history_partition,
+    add_history_default_bound,
+    existing_history_partitions,
+    validate_history_default_bound,
+)
+
+UTC = dateutil.tz.tzutc()
+
+
+def _add_history(app, label, created, new_state):
+    with app.new_session():
+        app.session.add(History(
+            label_name=label.name,
+            label_state_machine=label.state_machine,
+            created=created,
+            old_state=None,
+            new_state=new_state,
+        ))
+
+
+def _history_partitions(app):
+    with app.new_session():
+        return [
+            tuple(x)
+            for x in app.session.execute(
+                'SELECT label_name, new_state, tableoid::regclass::text '
+                'FROM history ORDER BY id',
+            )
+        ]
+
+
+def test_history_partition_bounds():
+    partition = HistoryPartition(2018, 12)
+
+    assert partition.name == 'history_y2018m12'
+    assert partition.start == datetime.datetime(2018, 12, 1, tzinfo=UTC)
+    assert partition.end == datetime.datetime(2019, 1, 1, tzinfo=UTC)
+
+
+def test_history_partitions_are_by_utc_month():
+    moment = datetime.datetime(
+        2018,
+        12,
+        31,
+        22,
+        tzinfo=dateutil.tz.gettz('America/New_York'),
+    )
+
+    assert history_partition_for(moment) == HistoryPartition(2019, 1)
+    partitions = history_partitions_from(moment)
+    assert [next(partitions) for _ in range(2)] == [
+        HistoryPartition(2019, 1),
+        HistoryPartition(2019, 2),
+    ]
+
+
+def test_creates_history_partition(app):
+    with app.new_session():
+        create_history_partition(app.session, HistoryPartition(2018, 2))
+        create_history_partition(app.session, HistoryPartition(2018, 1))
+
+    with app.new_session():
+        assert existing_history_partitions(app.session) == [
+            HistoryPartition(2018, 1),
+            HistoryPartition(2018, 2),
+        ]
+
+
+def test_moves_history_into_created_partition(app, create_label):
+    label = create_label('foo', 'test_machine', {})
+    _add_history(app, label, datetime.datetime(2018, 1, 5, tzinfo=UTC), 'a')
+    _add_history(app, label, datetime.datetime(2018, 2, 5, tzinfo=UTC), 'b')
+
+    with app.new_session():
+        create_history_partition(app.session, HistoryPartition(2018, 1))
+
+    assert _history_partitions(app) == [
+        ('foo', 'start', 'history_default'),
+        ('foo', 'a', 'history_y2018m01'),
+        ('foo', 'b', 'history_default'),
+    ]
+
+
+def test_drops_history_partition_keeping_latest_entries(app, create_label):
+    foo = create_label('foo', 'test_machine', {})
+    bar = create_label('bar', 'test_machine', {})
+    with app.new_session():
+        app.session.query(History).delete()
+        create_history_partition(app.session, HistoryPartition(2018, 1))
+
+    for label in (foo, bar):
+        for day in (5, 6):
+            _add_history(
+                app,
+                label,
+                datetime.datetime(2018, 1, day, tzinfo=UTC),
+                f'{label.name}_{day}',
+            )
+    # Only `foo` has been updated since.
+    _add_history(app, foo, datetime.datetime(2018, 2, 1, tzinfo=UTC), 'later')
+
+    with app.new_session():
+        drop_history_partition(app.session, HistoryPartition(2018, 1))
+
+    with app.new_session():
+        assert existing_history_partitions(app.session) == []
+    assert _history_partitions(app) == [
+        ('bar', 'bar_6', 'history_default'),
+        ('foo', 'later', 'history_default'),
+    ]
+
+
+def test_bounds_default_history_partition(app, create_label):
+    label = create_label('foo', 'test_machine', {})
+    with app.new_session():
+        add_history_default_bound(app.session, HistoryPartition(2100, 1))
+        add_history_default_bound(app.session, HistoryPartition(2100, 2))
+        assert history_default_bounds(app.session) == {
+            HistoryPartition(2100, 1): False,
+            HistoryPartition(2100, 2): False,
+        }
+
+    with app.new_session():
+        validate_history_default_bound(app.session, HistoryPartition(2100, 2))
+        assert history_default_bounds(app.session) == {
+            HistoryPartition(2100, 2): True,
+        }
+
+    _add_history(app, label, datetime.datetime(2100, 1, 5, tzinfo=UTC), 'a')
+    with pytest.raises(IntegrityError):
+        _add_history(
+            app,
+            label,
+            datetime.datetime(2100, 2, 5, tzinfo=UTC),
+            'b',
+        )
+
+
+def test_creates_history_partition_past_default_bound(app, create_label):
+    label = create_label('foo', 'test_machine', {})
+    with app.new_session():
+        add_history_default_bound(app.session, HistoryPartition(2100, 1))
+    with app.new_session():
+        validate_history_default_bound(app.session, HistoryPartition(2100, 1))
+        create_history_partition(app.session, HistoryPartition(2100, 1))
+
+    _add_history(app, label, datetime.datetime(2100, 1, 5, tzinfo=UTC), 'a')
+
+    assert _history_partitions(app)[-1] == ('foo', 'a', 'history_y2100m01')
@@ -1,7 +1,13 @@
 """Parsing and evaluation of exit condition programs."""
 
+from routemaster.exit_conditions.cache import (
+    load_compile_cache,
+    save_compile_cache,
+)
 from routemaster.exit_conditions.program import ExitConditionProgram
 
 __all__ = (
+    'load_compile_cache',
+    'save_compile_cache',
     'ExitConditionProgram',
 )
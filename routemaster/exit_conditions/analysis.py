@@ -9,3 +9,62 @@ def find_accessed_keys(instructions):
     for instruction, *args in instructions:
         if instruction == Operation.LOOKUP:
             yield args[0]
+
+
+_ARITIES = {
+    Operation.TO_BOOL: 1,
+    Operation.NOT: 1,
+    Operation.AND: 2,
+    Operation.OR: 2,
+    Operation.LITERAL: 0,
+    Operation.LOOKUP: 0,
+    Operation.RECALL: 0,
+    Operation.EQ: 2,
+    Operation.LT: 2,
+    Operation.GT: 2,
+}
+
+
+def _arity(instruction, args):
+    if instruction == Operation.PROPERTY:
+        _, prepositions = args
+        return 1 + len(prepositions)
+    return _ARITIES[instruction]
+
+
+def find_time_dependencies(instructions):
+    """
+    Yield the operands of each use of time in the program.
+
+    The only dependence of a program on the current time is through the
+    `passed since` property. For each use of it, this yields a pair of the
+    instruction sequences which compute its duration and its epoch. These
+    stand alone, so any recalled values in them are looked up again.
+    """
+    instructions = [
+        (Operation.LOOKUP, *args)
+        if instruction == Operation.RECALL
+        else (instruction, *args)
+        for instruction, *args in instructions
+    ]
+
+    # The index of the first instruction contributing to each stack value
+    starts = []
+
+    for index, (instruction, *args) in enumerate(instructions):
+        arity = _arity(instruction, args)
+        operands = starts[len(starts) - arity:] if arity else []
+        del starts[len(starts) - arity:]
+
+        if (
+            instruction == Operation.PROPERTY and
+            tuple(args[0]) == ('passed',) and
+            [x.value for x in args[1]] == ['since']
+        ):
+            duration_start, epoch_start = operands
+            yield (
+                instructions[duration_start:epoch_start],
+                instructions[epoch_start:index],
+            )
+
+        starts.append(operands[0] if operands else index)
@@ -0,0 +1,147 @@
+"""Columnar evaluation of exit condition programs over many labels."""
+
+from typing import Any, Dict, List, Callable, Iterable, Optional, Sequence
+
+from routemaster.context import lookup_label_variable
+from routemaster.exit_conditions.operations import Operation
+
+
+class _Failed(object):
+    """Marker for a row whose evaluation raised an exception."""
+
+    def __repr__(self) -> str:
+        return 'FAILED'
+
+
+FAILED = _Failed()
+
+Column = List[Any]
+
+
+def _elementwise(fn: Callable[..., Any], *columns: Column) -> Column:
+    result = []
+    for row in zip(*columns):
+        if any(x is FAILED for x in row):
+            result.append(FAILED)
+            continue
+
+        try:
+            result.append(fn(*row))
+        except Exception:  # noqa: B902
+            result.append(FAILED)
+    return result
+
+
+def _binary(fn: Callable[[Any, Any], Any]):
+    def _evaluate(stack, columns, size, property_handler):
+        rhs = stack.pop()
+        lhs = stack.pop()
+        stack.append(_elementwise(fn, lhs, rhs))
+    return _evaluate
+
+
+def _evaluate_to_bool(stack, columns, size, property_handler):
+    stack.append(_elementwise(bool, stack.pop()))
+
+
+def _evaluate_not(stack, columns, size, property_handler):
+    stack.append(_elementwise(lambda x: not x, stack.pop()))
+
+
+def _evaluate_literal(stack, columns, size, property_handler, value):
+    stack.append([value] * size)
+
+
+def _evaluate_lookup(stack, columns, size, property_handler, key):
+    stack.append(list(columns['.'.join(key)]))
+
+
+def _evaluate_property(
+    stack,
+    columns,
+    size,
+    property_handler,
+    property_name,
+    prepositions,
+):
+    preposition_names = []
+    preposition_columns = []
+    for preposition in reversed(prepositions):
+        preposition_names.append(preposition.value)
+        preposition_columns.append(stack.pop())
+    subject = stack.pop()
+
+    def _handle(subject, *arguments):
+        return property_handler(
+            property_name,
+            subject,
+            **dict(zip(preposition_names, arguments)),
+        )
+
+    stack.append(_elementwise(_handle, subject, *preposition_columns))
+
+
+EVALUATORS = {
+    Operation.TO_BOOL: _evaluate_to_bool,
+    Operation.AND: _binary(lambda lhs, rhs: lhs and rhs),
+    Operation.OR: _binary(lambda lhs, rhs: lhs or rhs),
+    Operation.NOT: _evaluate_not,
+    Operation.PROPERTY: _evaluate_property,
+    Operation.GT: _binary(lambda lhs, rhs: lhs > rhs),
+    Operation.LT: _binary(lambda lhs, rhs: lhs < rhs),
+    Operation.EQ: _binary(lambda lhs, rhs: lhs == rhs),
+    Operation.LITERAL: _evaluate_literal,
+    Operation.LOOKUP: _evaluate_lookup,
+    Operation.RECALL: _evaluate_lookup,
+}
+
+
+def evaluate_batch(
+    instructions,
+    columns: Dict[str, Sequence[Any]],
+    size: int,
+    property_handler,
+) -> List[bool]:
+    """
+    Run the instructions given in `instructions` over columns of inputs.
+
+    `columns` maps each accessed variable (as a dotted path) to a sequence of
+    `size` values, one per row. The instruction stream is dispatched once for
+    the whole batch, with each operation applied to entire columns.
+
+    Returns a mask with one boolean per row. Rows whose evaluation raised an
+    exception are reported as `True`, so that they are still passed through to
+    the normal evaluation (and its error reporting).
+    """
+    stack: List[Column] = []
+    for instruction, *args in instructions:
+        EVALUATORS[instruction](stack, columns, size, property_handler, *args)
+    return [x is FAILED or bool(x) for x in stack.pop()]
+
+
+def lookup_columns(
+    accessed_variables: Iterable[str],
+    metadata: Sequence[Dict[str, Any]],
+    history_entries: Sequence[Optional[Any]],
+) -> Dict[str, Column]:
+    """
+    Build the columnar inputs for `evaluate_batch`.
+
+    Each accessed variable is resolved against each label's metadata and
+    current history entry. Lookups which fail for reasons other than the value
+    being absent are marked as `FAILED`.
+    """
+    def _lookup(path, label_metadata, history_entry):
+        try:
+            return lookup_label_variable(path, label_metadata, history_entry)
+        except Exception:  # noqa: B902
+            return FAILED
+
+    columns = {}
+    for accessed_variable in accessed_variables:
+        path = accessed_variable.split('.')
+        columns[accessed_variable] = [
+            _lookup(path, label_metadata, history_entry)
+            for label_metadata, history_entry in zip(metadata, history_entries)
+        ]
+    return columns
@@ -0,0 +1,134 @@
+"""Process-wide cache of compiled exit condition programs."""
+
+import os
+import json
+import hashlib
+import logging
+import pathlib
+import tempfile
+from typing import Any, Dict, List, Tuple, Callable
+
+from routemaster.exit_conditions.operations import Operation
+from routemaster.exit_conditions.prepositions import Preposition
+
+logger = logging.getLogger(__name__)
+
+Instructions = Tuple[Any, ...]
+
+# The modules whose code determines the compiled form of a program.
+_COMPILER_MODULES = (
+    'tokenizer.py',
+    'parser.py',
+    'peephole.py',
+    'operations.py',
+    'prepositions.py',
+)
+
+_compiled: Dict[str, Instructions] = {}
+
+
+def source_key(source: str) -> str:
+    """Digest of a program's source, keying its compiled form."""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def compile_cached(
+    source: str,
+    compile_source: Callable[[str], Instructions],
+) -> Instructions:
+    """
+    Compile `source` with `compile_source`, unless already compiled.
+
+    Errors from `compile_source` are not cached.
+    """
+    key = source_key(source)
+    try:
+        return _compiled[key]
+    except KeyError:
+        instructions = _compiled[key] = compile_source(source)
+        return instructions
+
+
+def clear_compile_cache() -> None:
+    """Forget all compiled programs."""
+    _compiled.clear()
+
+
+def _compiler_version() -> str:
+    digest = hashlib.sha256()
+    root = pathlib.Path(__file__).parent
+    for module in _COMPILER_MODULES:
+        digest.update((root / module).read_bytes())
+    return digest.hexdigest()
+
+
+def _encode(instruction: Tuple[Any, ...]) -> List[Any]:
+    operation, *args = instruction
+    if operation == Operation.PROPERTY:
+        property_name, prepositions = args
+        args = [property_name, [x.value for x in prepositions]]
+    return [operation.value, *args]
+
+
+def _decode(encoded: List[Any]) -> Tuple[Any, ...]:
+    operation, *args = encoded
+    operation = Operation(operation)
+    if operation == Operation.PROPERTY:
+        property_name, prepositions = args
+        args = [
+            tuple(property_name),
+            tuple(Preposition(x) for x in prepositions),
+        ]
+    elif operation in (Operation.LOOKUP, Operation.RECALL):
+        args = [tuple(args[0])]
+    return (operation, *args)
+
+
+def load_compile_cache(path: str) -> None:
+    """
+    Load compiled programs persisted to `path` by `save_compile_cache`.
+
+    Missing or unreadable files, and those written by a different version of
+    the compiler, are ignored.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data['compiler'] != _compiler_version():
+            return
+        programs = {
+            key: tuple(_decode(x) for x in instructions)
+            for key, instructions in data['programs'].items()
+        }
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError, KeyError, TypeError):
+        logger.warning(
+            "Ignoring unreadable exit condition cache at %s",
+            path,
+            exc_info=True,
+        )
+        return
+
+    _compiled.update(programs)
+
+
+def save_compile_cache(path: str) -> None:
+    """Persist all compiled programs to `path`, replacing it atomically."""
+    data = {
+        'compiler': _compiler_version(),
+        'programs': {
+            key: [_encode(x) for x in instructions]
+            for key, instructions in _compiled.items()
+        },
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
@@ -88,6 +88,15 @@ def evaluate(instructions, lookup, property_handler):
     Returns the single result.
     """
     stack = []
+    looked_up = {}
+
+    def _lookup(key):
+        value = looked_up[key] = lookup(key)
+        return value
+
     for instruction, *args in instructions:
-        EVALUATORS[instruction](stack, lookup, property_handler, *args)
+        if instruction == Operation.RECALL:
+            stack.append(looked_up[args[0]])
+        else:
+            EVALUATORS[instruction](stack, _lookup, property_handler, *args)
     return stack.pop()
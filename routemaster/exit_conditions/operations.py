@@ -29,6 +29,9 @@ class Operation(enum.Enum):
     # Look up symbol `argument` and push it to the stack, or None if not found.
     LOOKUP = 'lookup'
 
+    # Push the value last looked up for symbol `argument` to the stack.
+    RECALL = 'recall'
+
     # Pop boolean `rhs` and `lhs` from the stack, compare equality, and push
     # `true` if equal and `false` if not.
     EQ = 'eq'
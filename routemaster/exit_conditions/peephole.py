@@ -1,111 +1,169 @@
 """Peephole evaluator optimiser."""
 
+import operator
+from typing import Any, List, Optional, NamedTuple
+
 from routemaster.exit_conditions.operations import Operation
 
-MATCHERS = [
-    (
-        [
-            (Operation.NOT,),
-            (Operation.NOT,),
-        ],
-        [
-        ],
-    ),
-    (
-        [
-            (Operation.TO_BOOL,),
-            (Operation.TO_BOOL,),
-        ],
-        [
-            (Operation.TO_BOOL,),
-        ],
-    ),
-    (
-        [
-            (Operation.NOT,),
-            (Operation.TO_BOOL,),
-        ],
-        [
-            (Operation.NOT,),
-        ],
-    ),
-    (
-        [
-            (Operation.AND,),
-            (Operation.TO_BOOL,),
-        ],
-        [
-            (Operation.AND,),
-        ],
-    ),
-    (
-        [
-            (Operation.OR,),
-            (Operation.TO_BOOL,),
-        ],
-        [
-            (Operation.OR,),
-        ],
-    ),
-    (
-        [
-            (Operation.EQ,),
-            (Operation.TO_BOOL,),
-        ],
-        [
-            (Operation.EQ,),
-        ],
-    ),
-    (
-        [
-            (Operation.LT,),
-            (Operation.TO_BOOL,),
-        ],
-        [
-            (Operation.LT,),
-        ],
-    ),
-    (
-        [
-            (Operation.GT,),
-            (Operation.TO_BOOL,),
-        ],
-        [
-            (Operation.GT,),
-        ],
-    ),
-]
+# Marker for values which are not known when optimising.
+_UNKNOWN = object()
+
+
+class _Operand(NamedTuple):
+    """A value on the stack, and where its instructions start."""
+    start: int
+    boolean: bool
+    constant: Any = _UNKNOWN
+    # The operand of the final `NOT` computing this value, if any.
+    negated: Optional['_Operand'] = None
+
+
+_FOLDERS = {
+    Operation.TO_BOOL: bool,
+    Operation.NOT: operator.not_,
+    Operation.AND: lambda lhs, rhs: lhs and rhs,
+    Operation.OR: lambda lhs, rhs: lhs or rhs,
+    Operation.EQ: operator.eq,
+    Operation.LT: operator.lt,
+    Operation.GT: operator.gt,
+}
+
+
+def _fold(output, operation, operands):
+    if any(x.constant is _UNKNOWN for x in operands):
+        return None
+
+    try:
+        value = _FOLDERS[operation](*(x.constant for x in operands))
+    except TypeError:
+        # Left for the error to be raised on evaluation.
+        return None
+
+    start = operands[0].start
+    del output[start:]
+    output.append((Operation.LITERAL, value))
+    return _Operand(start, isinstance(value, bool), value)
+
+
+def _drop(output, operand, end):
+    for index in range(operand.start, end):
+        output[index] = None
+
+
+def _to_bool(output, value):
+    if value.boolean:
+        return value
+
+    folded = _fold(output, Operation.TO_BOOL, [value])
+    if folded is not None:
+        return folded
+
+    output.append((Operation.TO_BOOL,))
+    return _Operand(value.start, True)
+
+
+def _not(output, value):
+    folded = _fold(output, Operation.NOT, [value])
+    if folded is not None:
+        return folded
+
+    if value.negated is not None:
+        # `not not x` is `x` interpreted as a boolean.
+        output.pop()
+        return _to_bool(output, value.negated)
+
+    output.append((Operation.NOT,))
+    return _Operand(value.start, True, negated=value)
+
+
+def _and_or(output, operation, lhs, rhs):
+    folded = _fold(output, operation, [lhs, rhs])
+    if folded is not None:
+        return folded
+
+    # The constant which leaves the other operand unchanged.
+    identity = operation == Operation.AND
+
+    # `x and y` is `y` when `x` is true, as is `x or y` when `x` is false.
+    if lhs.constant is not _UNKNOWN and bool(lhs.constant) == identity:
+        _drop(output, lhs, rhs.start)
+        return rhs._replace(start=lhs.start)
+
+    # `x and true` and `x or false` are `x`, when `x` is a boolean.
+    if lhs.boolean and rhs.constant is identity:
+        del output[rhs.start:]
+        return lhs
+
+    output.append((operation,))
+    return _Operand(lhs.start, lhs.boolean and rhs.boolean)
+
+
+def _compare(output, operation, lhs, rhs):
+    folded = _fold(output, operation, [lhs, rhs])
+    if folded is not None:
+        return folded
+
+    output.append((operation,))
+    return _Operand(lhs.start, True)
+
+
+def _deduplicate_lookups(instructions):
+    looked_up = set()
+    for instruction in instructions:
+        if instruction[0] == Operation.LOOKUP:
+            key = instruction[1]
+            if key in looked_up:
+                instruction = (Operation.RECALL, key)
+            looked_up.add(key)
+        yield instruction
 
 
 def peephole_optimise(instructions):
-    """Run peephole optimisations over a given instruction sequence."""
-    instructions = list(instructions)
-
-    any_changes = True
-
-    while any_changes:
-        any_changes = False
-
-        for match_pattern, replace_pattern in MATCHERS:
-            match_pattern_length = len(match_pattern)
-            for index in range(len(instructions) + 1 - match_pattern_length):
-                if (
-                    instructions[index:index + match_pattern_length] ==
-                    match_pattern
-                ):
-                    instructions[index:index + match_pattern_length] = \
-                        replace_pattern
-                    any_changes = True
-                    break
-
-        # TO_BOOL after property elimination
-        for index in range(len(instructions) - 1):
-            if (
-                instructions[index][0] == Operation.PROPERTY and
-                instructions[index + 1][0] == Operation.TO_BOOL
-            ):
-                del instructions[index + 1]
-                any_changes = True
-                break
-
-    return instructions
+    """
+    Run peephole optimisations over a given instruction sequence.
+
+    This is a single pass, tracking where the instructions computing each
+    value on the stack begin so that subexpressions can be folded or dropped
+    in place. Operations on constants are folded, `and` and `or` with
+    constants are simplified, redundant boolean conversions are removed and
+    repeated lookups of the same key recall the value first looked up.
+    """
+    output: List[Any] = []
+    stack: List[_Operand] = []
+
+    for instruction in instructions:
+        operation, *args = instruction
+        start = len(output)
+
+        if operation == Operation.LITERAL:
+            output.append(instruction)
+            value = args[0]
+            stack.append(_Operand(start, isinstance(value, bool), value))
+
+        elif operation == Operation.LOOKUP:
+            output.append(instruction)
+            stack.append(_Operand(start, False))
+
+        elif operation == Operation.PROPERTY:
+            _, prepositions = args
+            arity = 1 + len(prepositions)
+            subject = stack[-arity]
+            del stack[-arity:]
+            output.append(instruction)
+            stack.append(_Operand(subject.start, True))
+
+        elif operation == Operation.TO_BOOL:
+            stack.append(_to_bool(output, stack.pop()))
+
+        elif operation == Operation.NOT:
+            stack.append(_not(output, stack.pop()))
+
+        else:
+            rhs = stack.pop()
+            lhs = stack.pop()
+            if operation in (Operation.AND, Operation.OR):
+                stack.append(_and_or(output, operation, lhs, rhs))
+            else:
+                stack.append(_compare(output, operation, lhs, rhs))
+
+    return list(_deduplicate_lookups(x for x in output if x is not None))
@@ -1,9 +1,31 @@
 """Top-level utility for exit condition programs."""
 
-from typing import TYPE_CHECKING, Any, Iterable
+import datetime
+import functools
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Iterable,
+    Optional,
+    Sequence,
+)
 
+from routemaster.context import (
+    accessor_for,
+    handle_property,
+    check_timezone_aware,
+)
+from routemaster.exit_conditions.sql import translate, label_resolver
+from routemaster.exit_conditions.batch import evaluate_batch, lookup_columns
+from routemaster.exit_conditions.cache import source_key, compile_cached
 from routemaster.exit_conditions.parser import parse
-from routemaster.exit_conditions.analysis import find_accessed_keys
+from routemaster.exit_conditions.analysis import (
+    find_accessed_keys,
+    find_time_dependencies,
+)
 from routemaster.exit_conditions.peephole import peephole_optimise
 from routemaster.exit_conditions.evaluator import evaluate
 from routemaster.exit_conditions.exceptions import ParseError
@@ -15,6 +37,10 @@ if TYPE_CHECKING:
     from routemaster.context import Context  # noqa
 
 
+def _compile(source: str) -> Tuple[Any, ...]:
+    return tuple(peephole_optimise(parse(source)))
+
+
 class ExitConditionProgram(object):
     """Compiled exit condition program."""
 
@@ -25,17 +51,22 @@ class ExitConditionProgram(object):
         This will eagerly compile and report any errors.
         """
         try:
-            self._instructions = tuple(parse(source))
+            self._instructions = compile_cached(source, _compile)
         except ParseError as exc:
             raise ValueError(format_parse_error_message(
                 source=source,
                 error=exc,
             )) from None
 
-        self._instructions = tuple(peephole_optimise(self._instructions))
-
         self.source = source
 
+        # Resolve the lookups of accessed paths ahead of evaluation
+        for accessed_key in find_accessed_keys(self._instructions):
+            accessor_for(accessed_key)
+
+        # Digest identifying this program, for use in stored state.
+        self.fingerprint = source_key(source)
+
     def accessed_variables(self) -> Iterable[str]:
         """Iterable of names of variables accessed in this program."""
         for accessed_key in find_accessed_keys(self._instructions):
@@ -49,6 +80,105 @@ class ExitConditionProgram(object):
             context.property_handler,
         )
 
+    def next_evaluation_time(
+        self,
+        context: 'Context',
+    ) -> Optional[datetime.datetime]:
+        """
+        Earliest time after that of `context` at which the result may change.
+
+        Only the passage of time is considered: the label's own data is
+        assumed not to change. Returns `None` if the result cannot change
+        with time alone. Programs which access feeds may change at any time,
+        so this is only meaningful for those which `can_run_batch`.
+        """
+        thresholds = []
+        for duration, epoch in find_time_dependencies(self._instructions):
+            try:
+                thresholds.append(
+                    evaluate(epoch, context.lookup, context.property_handler) +
+                    datetime.timedelta(seconds=evaluate(
+                        duration,
+                        context.lookup,
+                        context.property_handler,
+                    )),
+                )
+            except Exception:  # noqa: B902
+                # The program itself fails to evaluate for this label.
+                continue
+
+        return min(
+            (x for x in thresholds if x > context.now),
+            default=None,
+        )
+
+    def can_run_batch(self) -> bool:
+        """
+        Whether this program can be evaluated with `run_batch`.
+
+        Programs which access feeds need a `Context` per label in order to
+        fetch the feed data, so cannot be evaluated in bulk.
+        """
+        return not any(
+            x.split('.')[0] == 'feeds'
+            for x in self.accessed_variables()
+        )
+
+    def run_batch(
+        self,
+        metadata: Sequence[Dict[str, Any]],
+        history_entries: Sequence[Optional[Any]],
+        now: datetime.datetime,
+    ) -> List[bool]:
+        """
+        Evaluate this program over many labels at once.
+
+        `metadata` and `history_entries` must be aligned, each holding one
+        element per label. Returns a mask of the labels for which the program
+        might evaluate to true; labels whose evaluation raises an error are
+        included so that the error surfaces when they are evaluated
+        individually.
+        """
+        check_timezone_aware(now)
+
+        return evaluate_batch(
+            self._instructions,
+            lookup_columns(
+                self.accessed_variables(),
+                metadata,
+                history_entries,
+            ),
+            len(metadata),
+            functools.partial(handle_property, now),
+        )
+
+    def sql_filter(
+        self,
+        *,
+        metadata: Any,
+        entered_state: Any,
+        previous_state: Any,
+        now: datetime.datetime,
+    ) -> Optional[Any]:
+        """
+        Translate this program into a SQL filter over labels.
+
+        The arguments are the SQL expressions for a label's metadata, and for
+        the creation time and old state of its current history entry. The
+        filter matches the labels for which the program would evaluate to true
+        at `now`.
+
+        Returns `None` if the program cannot be translated, for instance
+        because it accesses feeds.
+        """
+        check_timezone_aware(now)
+
+        return translate(
+            self._instructions,
+            label_resolver(metadata, entered_state, previous_state),
+            now,
+        )
+
     def __eq__(self, other_program: Any) -> bool:
         """
         Equality test.
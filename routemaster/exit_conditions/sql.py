@@ -0,0 +1,419 @@
+"""Translation of exit condition programs into SQL filters."""
+
+import enum
+import json
+import datetime
+import operator
+from typing import Any, List, Union, Callable, Optional, Sequence, NamedTuple
+
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+from routemaster.exit_conditions.operations import Operation
+
+
+@enum.unique
+class SQLKind(enum.Enum):
+    """Kinds of SQL expression which lookups may resolve to."""
+
+    # A JSONB value, for which both SQL NULL and JSON `null` represent `None`.
+    JSON = 'json'
+
+    # A (non-null) timestamp with time zone.
+    TIMESTAMP = 'timestamp'
+
+    # A nullable text value.
+    TEXT = 'text'
+
+
+class SQLValue(NamedTuple):
+    """A value looked up in SQL."""
+    expression: Any
+    kind: SQLKind
+
+
+# Resolve a path looked up by a program to its SQL equivalent, or `None` if
+# the path cannot be resolved in SQL.
+Resolver = Callable[[Sequence[str]], Optional[SQLValue]]
+
+
+class _Constant(NamedTuple):
+    """A value known when translating."""
+    value: Any
+
+
+class _Predicate(NamedTuple):
+    """A boolean SQL expression, which is never NULL."""
+    expression: Any
+
+
+_Value = Union[_Constant, _Predicate, SQLValue]
+
+
+class Untranslatable(Exception):
+    """Raised for programs which cannot be exactly translated into SQL."""
+
+
+_NUMBER_TYPES = (bool, int, float)
+
+_FALSY_JSON: Sequence[Any] = (False, 0, '', [], {})
+
+
+def _json_literal(value: Any) -> Any:
+    return sqlalchemy.cast(sqlalchemy.literal(json.dumps(value)), JSONB)
+
+
+def _json(value: SQLValue) -> Any:
+    # Normalise JSON `null` to SQL NULL, so that both behave as `None`.
+    return sqlalchemy.func.nullif(value.expression, _json_literal(None))
+
+
+def _json_text(expression: Any) -> Any:
+    # Extract the scalar at the root of a JSONB value as text.
+    return expression.op('#>>', return_type=sqlalchemy.Text)(
+        sqlalchemy.cast(
+            sqlalchemy.literal([], type_=ARRAY(sqlalchemy.Text)),
+            ARRAY(sqlalchemy.Text),
+        ),
+    )
+
+
+def _coalesce(expression: Any) -> Any:
+    return sqlalchemy.func.coalesce(expression, sqlalchemy.false())
+
+
+def _to_predicate(value: _Value) -> Union[_Constant, _Predicate]:
+    if isinstance(value, (_Constant, _Predicate)):
+        if isinstance(value, _Constant):
+            return _Constant(bool(value.value))
+        return value
+
+    if value.kind == SQLKind.JSON:
+        return _Predicate(_coalesce(~_json(value).in_([
+            _json_literal(x) for x in _FALSY_JSON
+        ])))
+    elif value.kind == SQLKind.TIMESTAMP:
+        return _Predicate(value.expression.isnot(None))
+    elif value.kind == SQLKind.TEXT:  # pragma: no branch
+        return _Predicate(_coalesce(value.expression != ''))
+
+    raise Untranslatable()  # pragma: no cover
+
+
+def _as_expression(value: Union[_Constant, _Predicate]) -> Any:
+    if isinstance(value, _Constant):
+        return sqlalchemy.true() if value.value else sqlalchemy.false()
+    return value.expression
+
+
+def _negate(
+    value: Union[_Constant, _Predicate],
+) -> Union[_Constant, _Predicate]:
+    if isinstance(value, _Constant):
+        return _Constant(not value.value)
+    return _Predicate(sqlalchemy.not_(value.expression))
+
+
+def _select(
+    predicate: _Predicate,
+    if_true: bool,
+    if_false: bool,
+) -> Union[_Constant, _Predicate]:
+    """Map a predicate's two possible values onto known results."""
+    if if_true == if_false:
+        return _Constant(if_true)
+    if if_true:
+        return predicate
+    return _negate(predicate)
+
+
+def _equals(lhs: _Value, rhs: _Value) -> Union[_Constant, _Predicate]:
+    if isinstance(lhs, _Constant) and not isinstance(rhs, _Constant):
+        lhs, rhs = rhs, lhs
+
+    if isinstance(lhs, _Constant) and isinstance(rhs, _Constant):
+        return _Constant(lhs.value == rhs.value)
+
+    if isinstance(lhs, _Predicate):
+        if isinstance(rhs, _Predicate):
+            return _Predicate(lhs.expression == rhs.expression)
+        if isinstance(rhs, _Constant):
+            return _select(
+                lhs,
+                operator.eq(True, rhs.value),
+                operator.eq(False, rhs.value),
+            )
+        raise Untranslatable()
+
+    if not isinstance(rhs, _Constant):
+        raise Untranslatable()
+
+    constant = rhs.value
+
+    if constant is None:
+        if lhs.kind == SQLKind.JSON:
+            return _Predicate(_json(lhs).is_(None))
+        return _Predicate(lhs.expression.is_(None))
+
+    if lhs.kind == SQLKind.JSON:
+        if isinstance(constant, _NUMBER_TYPES):
+            # Python treats `True == 1` and `False == 0`, which JSONB does not.
+            candidates = [constant]
+            if constant == 1 or constant == 0:
+                candidates.extend([bool(constant), int(constant)])
+            return _Predicate(_coalesce(_json(lhs).in_([
+                _json_literal(x) for x in candidates
+            ])))
+        raise Untranslatable()
+
+    # Timestamps and text are never equal to numbers or booleans, the only
+    # other constants in programs.
+    return _Constant(False)
+
+
+def _compare_json_to_number(
+    value: SQLValue,
+    constant: Any,
+    compare: Callable[[Any, Any], Any],
+) -> _Predicate:
+    expression = _json(value)
+    return _Predicate(sqlalchemy.case(
+        [
+            (
+                sqlalchemy.func.jsonb_typeof(expression) == 'number',
+                compare(
+                    sqlalchemy.cast(
+                        _json_text(expression),
+                        sqlalchemy.Numeric,
+                    ),
+                    constant,
+                ),
+            ),
+            (
+                sqlalchemy.func.jsonb_typeof(expression) == 'boolean',
+                compare(
+                    sqlalchemy.case(
+                        [(expression == _json_literal(True), 1)],
+                        else_=0,
+                    ),
+                    constant,
+                ),
+            ),
+        ],
+        # Python raises errors comparing numbers to other types, which we
+        # let through so that they are reported on evaluation.
+        else_=sqlalchemy.true(),
+    ))
+
+
+def _compare(
+    lhs: _Value,
+    rhs: _Value,
+    compare: Callable[[Any, Any], Any],
+) -> Union[_Constant, _Predicate]:
+    if isinstance(lhs, _Constant) and isinstance(rhs, _Constant):
+        try:
+            return _Constant(compare(lhs.value, rhs.value))
+        except TypeError:
+            # An error on evaluation for all labels.
+            return _Constant(True)
+
+    if isinstance(rhs, _Constant):
+        value, constant = lhs, rhs.value
+        ordered = compare
+    elif isinstance(lhs, _Constant):
+        value, constant = rhs, lhs.value
+        ordered = lambda x, y: compare(y, x)  # noqa: E731
+    else:
+        raise Untranslatable()
+
+    if constant is None:
+        # Comparisons with `None` are an error on evaluation.
+        return _Constant(True)
+
+    if isinstance(value, _Predicate):
+        if not isinstance(constant, _NUMBER_TYPES):
+            raise Untranslatable()
+        return _select(
+            value,
+            ordered(True, constant),
+            ordered(False, constant),
+        )
+
+    if value.kind == SQLKind.JSON:
+        if isinstance(constant, _NUMBER_TYPES):
+            if isinstance(constant, bool):
+                constant = int(constant)
+            return _compare_json_to_number(value, constant, ordered)
+
+    raise Untranslatable()
+
+
+def _property(
+    property_name: Sequence[str],
+    subject: _Value,
+    arguments: List[_Value],
+    prepositions: Sequence[Any],
+    now: datetime.datetime,
+) -> Union[_Constant, _Predicate]:
+    kwargs = {
+        preposition.value: argument
+        for preposition, argument in zip(prepositions, arguments)
+    }
+
+    if tuple(property_name) == ('passed',) and 'since' in kwargs:
+        epoch = kwargs['since']
+        if not isinstance(subject, _Constant):
+            raise Untranslatable()
+
+        if not (
+            isinstance(epoch, SQLValue) and
+            epoch.kind == SQLKind.TIMESTAMP and
+            isinstance(subject.value, _NUMBER_TYPES)
+        ):
+            # Anything but a timestamp and a duration is an error on
+            # evaluation.
+            return _Constant(True)
+
+        threshold = now - datetime.timedelta(seconds=subject.value)
+        return _Predicate(epoch.expression <= threshold)
+
+    if tuple(property_name) == ('defined',):
+        if isinstance(subject, _Constant):
+            return _Constant(subject.value is not None)
+        if isinstance(subject, _Predicate):
+            return _Constant(True)
+        if subject.kind == SQLKind.JSON:
+            return _Predicate(_json(subject).isnot(None))
+        return _Predicate(subject.expression.isnot(None))
+
+    raise Untranslatable()
+
+
+def translate(
+    instructions,
+    resolve: Resolver,
+    now: datetime.datetime,
+) -> Optional[Any]:
+    """
+    Translate the instructions given in `instructions` into a SQL filter.
+
+    The filter matches exactly the rows for which the program would evaluate
+    to true at `now`. Rows for which evaluating the program would raise an
+    error may or may not be matched. Lookups are translated with `resolve`.
+
+    Returns `None` for programs which cannot be translated.
+    """
+    stack: List[_Value] = []
+
+    try:
+        for instruction, *args in instructions:
+            if instruction == Operation.LITERAL:
+                stack.append(_Constant(args[0]))
+
+            elif instruction in (Operation.LOOKUP, Operation.RECALL):
+                value = resolve(args[0])
+                if value is None:
+                    raise Untranslatable()
+                stack.append(value)
+
+            elif instruction == Operation.TO_BOOL:
+                stack.append(_to_predicate(stack.pop()))
+
+            elif instruction == Operation.NOT:
+                stack.append(_negate(_to_predicate(stack.pop())))
+
+            elif instruction in (Operation.AND, Operation.OR):
+                rhs = stack.pop()
+                lhs = stack.pop()
+                if not all(
+                    isinstance(x, _Predicate) or
+                    (isinstance(x, _Constant) and isinstance(x.value, bool))
+                    for x in (lhs, rhs)
+                ):
+                    # The result of `and` and `or` is only a boolean when
+                    # their arguments are.
+                    raise Untranslatable()
+
+                combine = (
+                    sqlalchemy.and_
+                    if instruction == Operation.AND
+                    else sqlalchemy.or_
+                )
+                stack.append(_Predicate(combine(
+                    _as_expression(lhs),  # type: ignore
+                    _as_expression(rhs),  # type: ignore
+                )))
+
+            elif instruction == Operation.EQ:
+                rhs = stack.pop()
+                lhs = stack.pop()
+                stack.append(_equals(lhs, rhs))
+
+            elif instruction in (Operation.LT, Operation.GT):
+                rhs = stack.pop()
+                lhs = stack.pop()
+                stack.append(_compare(
+                    lhs,
+                    rhs,
+                    (
+                        operator.lt
+                        if instruction == Operation.LT
+                        else operator.gt
+                    ),
+                ))
+
+            elif instruction == Operation.PROPERTY:  # pragma: no branch
+                property_name, prepositions = args
+                arguments = [stack.pop() for _ in prepositions][::-1]
+                subject = stack.pop()
+                stack.append(_property(
+                    property_name,
+                    subject,
+                    arguments,
+                    prepositions,
+                    now,
+                ))
+
+            else:
+                raise Untranslatable()  # pragma: no cover
+
+        result = _to_predicate(stack.pop())
+    except Untranslatable:
+        return None
+
+    return _as_expression(result)
+
+
+def label_resolver(
+    metadata: Any,
+    entered_state: Any,
+    previous_state: Any,
+) -> Resolver:
+    """
+    Build a resolver for the variables of a label.
+
+    This follows the semantics of `lookup_label_variable`, given the SQL
+    expressions for the label's metadata and the creation time and old state
+    of its current history entry. Feeds cannot be resolved.
+    """
+    def _resolve(path: Sequence[str]) -> Optional[SQLValue]:
+        location, *rest = path
+
+        if location == 'metadata':
+            if not rest:
+                return SQLValue(metadata, SQLKind.JSON)
+            return SQLValue(metadata[tuple(rest)], SQLKind.JSON)
+
+        elif location == 'history':
+            if rest == ['entered_state']:
+                return SQLValue(entered_state, SQLKind.TIMESTAMP)
+            elif rest == ['previous_state']:
+                return SQLValue(previous_state, SQLKind.TEXT)
+
+        elif location == 'feeds':
+            return None
+
+        return SQLValue(sqlalchemy.null(), SQLKind.JSON)
+
+    return _resolve
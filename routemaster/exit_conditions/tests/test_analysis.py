@@ -0,0 +1,61 @@
+from routemaster.exit_conditions.parser import parse
+from routemaster.exit_conditions.analysis import find_time_dependencies
+from routemaster.exit_conditions.peephole import peephole_optimise
+from routemaster.exit_conditions.operations import Operation
+
+
+def test_finds_no_time_dependencies():
+    assert list(find_time_dependencies(parse(
+        'metadata.foo = 4 and metadata.bar is defined',
+    ))) == []
+
+
+def test_finds_time_dependencies():
+    dependencies = list(find_time_dependencies(parse(
+        '(metadata.foo = 4 and 3h has passed since history.entered_state) or '
+        'not metadata.delay has passed since metadata.time',
+    )))
+
+    assert dependencies == [
+        (
+            [(Operation.LITERAL, 3 * 60 * 60)],
+            [(Operation.LOOKUP, ('history', 'entered_state'))],
+        ),
+        (
+            [(Operation.LOOKUP, ('metadata', 'delay'))],
+            [(Operation.LOOKUP, ('metadata', 'time'))],
+        ),
+    ]
+
+
+def test_finds_time_dependencies_with_compound_operands():
+    dependencies = list(find_time_dependencies(parse(
+        '(1 = 1) has passed since (metadata.a or metadata.b)',
+    )))
+
+    assert len(dependencies) == 1
+    duration, epoch = dependencies[0]
+    assert [x[0] for x in duration] == [
+        Operation.LITERAL,
+        Operation.LITERAL,
+        Operation.EQ,
+    ]
+    assert [x[0] for x in epoch] == [
+        Operation.LOOKUP,
+        Operation.TO_BOOL,
+        Operation.LOOKUP,
+        Operation.TO_BOOL,
+        Operation.OR,
+    ]
+
+
+def test_finds_time_dependencies_of_recalled_values():
+    dependencies = list(find_time_dependencies(peephole_optimise(parse(
+        '1h has passed since metadata.time and '
+        'not 2h has passed since metadata.time',
+    ))))
+
+    assert [epoch for _, epoch in dependencies] == [
+        [(Operation.LOOKUP, ('metadata', 'time'))],
+        [(Operation.LOOKUP, ('metadata', 'time'))],
+    ]
@@ -0,0 +1,87 @@
+import json
+from unittest import mock
+
+import pytest
+
+from routemaster.exit_conditions import (
+    ExitConditionProgram,
+    load_compile_cache,
+    save_compile_cache,
+)
+from routemaster.exit_conditions.cache import (
+    compile_cached,
+    clear_compile_cache,
+)
+
+SOURCE = (
+    "metadata.foo = 3 or metadata.foo > 5 and "
+    "not 1d12h has passed since history.entered_state and "
+    "3 is in metadata.objects"
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_compile_cache()
+    yield
+    clear_compile_cache()
+
+
+def test_compiles_each_source_once():
+    compile_source = mock.Mock(return_value=((),))
+
+    first = compile_cached('true', compile_source)
+    second = compile_cached('true', compile_source)
+
+    assert first is second
+    compile_source.assert_called_once_with('true')
+
+
+def test_does_not_cache_errors():
+    compile_source = mock.Mock(side_effect=[ValueError(), ((),)])
+
+    with pytest.raises(ValueError):
+        compile_cached('true', compile_source)
+
+    assert compile_cached('true', compile_source) == ((),)
+
+
+def test_persists_compiled_programs(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    program = ExitConditionProgram(SOURCE)
+    save_compile_cache(path)
+    clear_compile_cache()
+
+    load_compile_cache(path)
+
+    fail = mock.Mock(side_effect=AssertionError("Program was recompiled"))
+    assert compile_cached(SOURCE, fail) == program._instructions
+
+
+def test_ignores_caches_from_other_compilers(tmp_path):
+    path = tmp_path / 'cache.json'
+    ExitConditionProgram(SOURCE)
+    save_compile_cache(str(path))
+    clear_compile_cache()
+
+    data = json.loads(path.read_text())
+    data['compiler'] = 'other'
+    path.write_text(json.dumps(data))
+    load_compile_cache(str(path))
+
+    compile_source = mock.Mock(return_value=((),))
+    compile_cached(SOURCE, compile_source)
+    compile_source.assert_called_once_with(SOURCE)
+
+
+@pytest.mark.parametrize('contents', [None, '', '[]', '{"compiler": 1'])
+def test_ignores_missing_or_unreadable_caches(tmp_path, contents):
+    path = tmp_path / 'cache.json'
+    if contents is not None:
+        path.write_text(contents)
+
+    load_compile_cache(str(path))
+
+    compile_source = mock.Mock(return_value=((),))
+    compile_cached('true', compile_source)
+    compile_source.assert_called_once_with('true')
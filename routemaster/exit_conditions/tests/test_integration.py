@@ -3,7 +3,9 @@ import textwrap
 from typing import Optional, NamedTuple
 
 import pytest
+import sqlalchemy
 import dateutil.tz
+from sqlalchemy.dialects.postgresql import JSONB
 
 from routemaster.exit_conditions import ExitConditionProgram
 
@@ -44,6 +46,9 @@ PROGRAMS = [
         False,
         ('history.previous_state', 'incorrect_state'),
     ),
+    ("metadata.foo = 3 or metadata.foo = 4", True, ('metadata.foo',)),
+    ("metadata.foo = 4 and true", True, ('metadata.foo',)),
+    ("false or metadata.foo > 5", False, ('metadata.foo',)),
 ]
 
 
@@ -79,6 +84,112 @@ def test_evaluate(program, expected, variables, make_context):
     assert program.run(context) == expected
 
 
+@pytest.mark.parametrize('program, expected, variables', PROGRAMS)
+def test_evaluate_batch(program, expected, variables):
+    program = ExitConditionProgram(program)
+    assert program.run_batch(
+        [VARIABLES, VARIABLES, VARIABLES],
+        [HISTORY_ENTRY, HISTORY_ENTRY, HISTORY_ENTRY],
+        NOW,
+    ) == [expected] * 3
+
+
+def test_evaluate_batch_varies_by_label():
+    program = ExitConditionProgram(
+        'metadata.foo = 4 and 12h has passed since history.entered_state',
+    )
+    recent_entry = HISTORY_ENTRY._replace(
+        created=NOW - datetime.timedelta(hours=1),
+    )
+    assert program.run_batch(
+        [VARIABLES, {'foo': 5}, VARIABLES, VARIABLES],
+        [HISTORY_ENTRY, HISTORY_ENTRY, recent_entry, None],
+        NOW,
+    ) == [True, False, False, True]
+
+
+def test_evaluate_batch_includes_labels_which_fail_evaluation():
+    program = ExitConditionProgram('metadata.foo > 3')
+    assert program.run_batch(
+        [{'foo': 2}, {'foo': 'bar'}, {'foo': 4}],
+        [HISTORY_ENTRY, HISTORY_ENTRY, HISTORY_ENTRY],
+        NOW,
+    ) == [False, True, True]
+
+
+def test_evaluate_batch_rejects_naive_datetimes():
+    program = ExitConditionProgram('true')
+    with pytest.raises(ValueError):
+        program.run_batch([{}], [None], datetime.datetime(2017, 1, 1))
+
+
+def test_programs_accessing_feeds_cannot_run_batch():
+    assert ExitConditionProgram('metadata.foo = 4').can_run_batch()
+    assert not ExitConditionProgram('feeds.foo.bar = 4').can_run_batch()
+
+
+def test_sql_filter_rejects_naive_datetimes():
+    program = ExitConditionProgram('true')
+    with pytest.raises(ValueError):
+        program.sql_filter(
+            metadata=None,
+            entered_state=None,
+            previous_state=None,
+            now=datetime.datetime(2017, 1, 1),
+        )
+
+
+@pytest.mark.parametrize('program', [
+    'feeds.foo.bar = 4',
+    'metadata.foo is in metadata.bar',
+    'metadata.foo = metadata.bar',
+    'metadata.delay has passed since history.entered_state',
+])
+def test_untranslatable_programs_have_no_sql_filter(program):
+    program = ExitConditionProgram(program)
+    assert program.sql_filter(
+        metadata=sqlalchemy.column('metadata', JSONB),
+        entered_state=sqlalchemy.column('created'),
+        previous_state=sqlalchemy.column('old_state'),
+        now=NOW,
+    ) is None
+
+
+@pytest.mark.parametrize('program, expected', [
+    ("metadata.foo = 4", None),
+    ("12h has passed since history.entered_state", None),
+    (
+        "1d12h has passed since history.entered_state",
+        HISTORY_ENTRY.created + datetime.timedelta(hours=36),
+    ),
+    (
+        "1d12h has not passed since history.entered_state",
+        HISTORY_ENTRY.created + datetime.timedelta(hours=36),
+    ),
+    (
+        "5h has passed since metadata.old_time and "
+        "1d has passed since history.entered_state",
+        VARIABLES['old_time'] + datetime.timedelta(hours=5),
+    ),
+    (
+        "metadata.foo = 5 or 1d has passed since history.entered_state",
+        HISTORY_ENTRY.created + datetime.timedelta(days=1),
+    ),
+    ("metadata.foo has passed since metadata.old_time", None),
+    ("1h has passed since metadata.missing", None),
+])
+def test_next_evaluation_time(program, expected, make_context):
+    program = ExitConditionProgram(program)
+    context = make_context(
+        label='label1',
+        metadata=VARIABLES,
+        now=NOW,
+        current_history_entry=HISTORY_ENTRY,
+        accessed_variables=program.accessed_variables(),
+    )
+    assert program.next_evaluation_time(context) == expected
+
+
 @pytest.mark.parametrize('program, expected, variables', PROGRAMS)
 def test_accessed_variables(program, expected, variables):
     program = ExitConditionProgram(program)
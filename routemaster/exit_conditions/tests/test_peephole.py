@@ -0,0 +1,92 @@
+import pytest
+
+from routemaster.exit_conditions.parser import parse
+from routemaster.exit_conditions.peephole import peephole_optimise
+from routemaster.exit_conditions.operations import Operation
+
+FOO = (Operation.LOOKUP, ('metadata', 'foo'))
+BAR = (Operation.LOOKUP, ('metadata', 'bar'))
+
+
+def _optimise(source):
+    return peephole_optimise(parse(source))
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('3 < 6', [(Operation.LITERAL, True)]),
+    ('1 = 1 and 2 > 3', [(Operation.LITERAL, False)]),
+    ('not (4 > 6)', [(Operation.LITERAL, True)]),
+    ('null is defined', [
+        (Operation.LITERAL, None),
+        (Operation.PROPERTY, ('defined',), ()),
+    ]),
+    # Errors are left to be raised on evaluation
+    ('3 < null', [
+        (Operation.LITERAL, 3),
+        (Operation.LITERAL, None),
+        (Operation.LT,),
+    ]),
+])
+def test_folds_constants(source, expected):
+    assert _optimise(source) == expected
+
+
+@pytest.mark.parametrize('source', [
+    'true and metadata.foo = 1',
+    'metadata.foo = 1 and true',
+    'false or metadata.foo = 1',
+    'metadata.foo = 1 or false',
+    '1 < 2 and metadata.foo = 1',
+    'metadata.foo = 1 and (2 = 3 or true)',
+])
+def test_simplifies_identities(source):
+    assert _optimise(source) == [
+        FOO,
+        (Operation.LITERAL, 1),
+        (Operation.EQ,),
+    ]
+
+
+def test_keeps_identities_with_non_boolean_operands():
+    # `x and true` is `x` only when `x` is a boolean.
+    instructions = [FOO, (Operation.LITERAL, True), (Operation.AND,)]
+    assert peephole_optimise(instructions) == instructions
+
+
+def test_removes_boolean_conversions():
+    assert _optimise('metadata.foo and metadata.bar') == [
+        FOO,
+        (Operation.TO_BOOL,),
+        BAR,
+        (Operation.TO_BOOL,),
+        (Operation.AND,),
+    ]
+
+
+def test_removes_double_negation():
+    instructions = [FOO, (Operation.NOT,), (Operation.NOT,)]
+    assert peephole_optimise(instructions) == [FOO, (Operation.TO_BOOL,)]
+
+
+def test_recalls_repeated_lookups():
+    assert _optimise('metadata.foo = 1 or metadata.foo > 3') == [
+        FOO,
+        (Operation.LITERAL, 1),
+        (Operation.EQ,),
+        (Operation.RECALL, ('metadata', 'foo')),
+        (Operation.LITERAL, 3),
+        (Operation.GT,),
+        (Operation.OR,),
+    ]
+
+
+def test_optimises_long_programs():
+    source = ' or '.join(
+        '(metadata.foo = {0} and true)'.format(x)
+        for x in range(2000)
+    )
+
+    instructions = _optimise(source)
+
+    assert instructions[:3] == [FOO, (Operation.LITERAL, 0), (Operation.EQ,)]
+    assert len(instructions) == 2000 * 4 - 1
@@ -14,3 +14,14 @@ def test_program_hash():
 
 def test_program_repr():
     assert repr(ExitConditionProgram('true')) == "ExitConditionProgram('true')"
+
+
+def test_program_fingerprint():
+    assert (
+        ExitConditionProgram('true').fingerprint ==
+        ExitConditionProgram('true').fingerprint
+    )
+    assert (
+        ExitConditionProgram('true').fingerprint !=
+        ExitConditionProgram('false').fingerprint
+    )
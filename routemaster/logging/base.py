@@ -66,6 +66,18 @@ class BaseLogger:
         """Logs the receipt of a response from a feed."""
         pass
 
+    def gate_evaluation_skipped(self, state_machine, state):
+        """Logs skipping a gate evaluation as no watched metadata changed."""
+        pass
+
+    def cron_job_lateness(self, job_name, lateness):
+        """Logs how long after it was due a cron job started running."""
+        pass
+
+    def cron_sweep_backlog(self, state_machine, state, fn_name, backlog):
+        """Logs how many labels a cron job's run left for later runs."""
+        pass
+
     def __getattr__(self, name):
         """Implement the Python logger API."""
         if name in (
@@ -27,6 +27,9 @@ class SplitLogger(BaseLogger):
 
             'webhook_response',
             'feed_response',
+            'gate_evaluation_skipped',
+            'cron_job_lateness',
+            'cron_sweep_backlog',
             'process_request_started',
             'process_request_finished',
         ):
@@ -1,3 +1,4 @@
+import datetime
 from typing import Any, Dict, Type, Tuple, Iterable
 
 import pytest
@@ -82,3 +83,6 @@ def test_logger(app, klass, kwargs):
     response = requests.Response()
     logger.webhook_response(state_machine, state, response)
     logger.feed_response(state_machine, state, feed_url, response)
+    logger.gate_evaluation_skipped(state_machine, state)
+    logger.cron_job_lateness('machine:state:action', datetime.timedelta(0))
+    logger.cron_sweep_backlog(state_machine, state, 'process_gate', 0)
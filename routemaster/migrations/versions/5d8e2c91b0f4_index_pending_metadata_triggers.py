@@ -0,0 +1,28 @@
+"""
+index pending metadata triggers
+
+Revision ID: 5d8e2c91b0f4
+Revises: a41c7e93d5b8
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5d8e2c91b0f4'
+down_revision = 'a41c7e93d5b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_labels_pending_metadata_triggers',
+        'labels',
+        ['state_machine'],
+        postgresql_where=sa.text('NOT metadata_triggers_processed'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_labels_pending_metadata_triggers', 'labels')
@@ -0,0 +1,64 @@
+"""
+add label archive
+
+Revision ID: 8b3f6c2d1a47
+Revises: d4c9a0e7f215
+"""
+import sqlalchemy as sa
+
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8b3f6c2d1a47'
+down_revision = 'd4c9a0e7f215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'archived_labels',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('state_machine', sa.String(), nullable=False),
+        sa.Column(
+            'metadata',
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=False,
+        ),
+        sa.Column('deleted', sa.Boolean(), nullable=False),
+        sa.Column('updated', sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            'archived',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('name', 'state_machine'),
+    )
+    op.create_table(
+        'archived_history',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('label_name', sa.String(), nullable=False),
+        sa.Column('label_state_machine', sa.String(), nullable=False),
+        sa.Column('created', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('forced', sa.Boolean(), nullable=False),
+        sa.Column('old_state', sa.String(), nullable=True),
+        sa.Column('new_state', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['label_name', 'label_state_machine'],
+            ['archived_labels.name', 'archived_labels.state_machine'],
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_archived_history_label',
+        'archived_history',
+        ['label_state_machine', 'label_name'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_archived_history_label', table_name='archived_history')
+    op.drop_table('archived_history')
+    op.drop_table('archived_labels')
@@ -0,0 +1,40 @@
+"""
+add transition queue
+
+Revision ID: a41c7e93d5b8
+Revises: f3b9d5e0a217
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a41c7e93d5b8'
+down_revision = 'f3b9d5e0a217'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'transition_queue',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('label_name', sa.String(), nullable=False),
+        sa.Column('label_state_machine', sa.String(), nullable=False),
+        sa.Column('gate', sa.String(), nullable=True),
+        sa.Column(
+            'created',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ['label_name', 'label_state_machine'],
+            ['labels.name', 'labels.state_machine'],
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('transition_queue')
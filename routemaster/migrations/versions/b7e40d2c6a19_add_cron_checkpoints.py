@@ -0,0 +1,35 @@
+"""
+add cron checkpoints
+
+Revision ID: b7e40d2c6a19
+Revises: 5d8e2c91b0f4
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b7e40d2c6a19'
+down_revision = '5d8e2c91b0f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'cron_checkpoints',
+        sa.Column('job', sa.String(), nullable=False),
+        sa.Column('run_id', sa.String(), nullable=False),
+        sa.Column('cursor', sa.String(), nullable=True),
+        sa.Column(
+            'updated',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('job'),
+    )
+
+
+def downgrade():
+    op.drop_table('cron_checkpoints')
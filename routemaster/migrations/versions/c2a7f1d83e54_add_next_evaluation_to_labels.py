@@ -0,0 +1,68 @@
+"""
+add next evaluation to labels
+
+Revision ID: c2a7f1d83e54
+Revises: 6fb8896f0729
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c2a7f1d83e54'
+down_revision = '6fb8896f0729'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'labels',
+        sa.Column(
+            'next_evaluation_at',
+            sa.DateTime(timezone=True),
+            nullable=True,
+        ),
+    )
+    op.add_column(
+        'labels',
+        sa.Column('next_evaluation_key', sa.String(), nullable=True),
+    )
+    op.create_index(
+        'ix_labels_next_evaluation_at',
+        'labels',
+        ['next_evaluation_at'],
+    )
+
+    op.execute(
+        '''
+        CREATE OR REPLACE FUNCTION reset_label_next_evaluation_fn()
+            RETURNS TRIGGER AS
+                $$
+                    BEGIN
+                        IF NEW.metadata IS DISTINCT FROM OLD.metadata THEN
+                            NEW.next_evaluation_key = NULL;
+                        END IF;
+                        RETURN NEW;
+                    END;
+                $$
+            LANGUAGE PLPGSQL;
+
+        CREATE TRIGGER reset_label_next_evaluation
+            BEFORE UPDATE ON labels
+            FOR EACH ROW
+            EXECUTE PROCEDURE reset_label_next_evaluation_fn();
+        ''',
+    )
+
+
+def downgrade():
+    op.execute(
+        '''
+        DROP TRIGGER reset_label_next_evaluation ON labels;
+        DROP FUNCTION reset_label_next_evaluation_fn();
+        ''',
+    )
+    op.drop_index('ix_labels_next_evaluation_at', 'labels')
+    op.drop_column('labels', 'next_evaluation_key')
+    op.drop_column('labels', 'next_evaluation_at')
@@ -0,0 +1,116 @@
+"""
+partition history by month
+
+Revision ID: d4c9a0e7f215
+Revises: b7e40d2c6a19
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd4c9a0e7f215'
+down_revision = 'b7e40d2c6a19'
+branch_labels = None
+depends_on = None
+
+
+def _create_history(partition_by):
+    op.execute(f'''
+        CREATE TABLE history (
+            id SERIAL NOT NULL,
+            label_name VARCHAR NOT NULL,
+            label_state_machine VARCHAR NOT NULL,
+            created TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            forced BOOLEAN NOT NULL DEFAULT false,
+            old_state VARCHAR,
+            new_state VARCHAR,
+            PRIMARY KEY ({'id, created' if partition_by else 'id'}),
+            FOREIGN KEY (label_name, label_state_machine)
+                REFERENCES labels (name, state_machine)
+        ) {partition_by}
+    ''')
+
+
+def _copy_history_from(table):
+    op.execute(f'''
+        INSERT INTO history (
+            id,
+            label_name,
+            label_state_machine,
+            created,
+            forced,
+            old_state,
+            new_state
+        )
+        SELECT
+            id,
+            label_name,
+            label_state_machine,
+            created,
+            forced,
+            old_state,
+            new_state
+        FROM {table}
+    ''')
+    op.execute('''
+        SELECT setval(
+            pg_get_serial_sequence('history', 'id'),
+            COALESCE((SELECT max(id) FROM history), 0) + 1,
+            false
+        )
+    ''')
+
+
+def upgrade():
+    op.execute('ALTER TABLE history RENAME TO history_unpartitioned')
+
+    _create_history('PARTITION BY RANGE (created)')
+    op.execute('CREATE TABLE history_default PARTITION OF history DEFAULT')
+
+    # Partitions for each month with existing history, up to the next, which
+    # is from when the server maintains them.
+    op.execute('''
+        DO $$
+            DECLARE
+                partition_start TIMESTAMP;
+            BEGIN
+                FOR partition_start IN
+                    SELECT generate_series(
+                        date_trunc(
+                            'month',
+                            COALESCE(
+                                (SELECT min(created) FROM history_unpartitioned),
+                                now()
+                            ) AT TIME ZONE 'UTC'
+                        ),
+                        date_trunc('month', now() AT TIME ZONE 'UTC') +
+                            INTERVAL '1 month',
+                        INTERVAL '1 month'
+                    )
+                LOOP
+                    EXECUTE
+                        'CREATE TABLE ' ||
+                        to_char(partition_start, '"history_y"YYYY"m"MM') ||
+                        ' PARTITION OF history FOR VALUES FROM (' ||
+                        quote_literal(partition_start AT TIME ZONE 'UTC') ||
+                        ') TO (' ||
+                        quote_literal(
+                            (partition_start + INTERVAL '1 month')
+                                AT TIME ZONE 'UTC'
+                        ) ||
+                        ')';
+                END LOOP;
+            END;
+        $$
+    ''')
+
+    _copy_history_from('history_unpartitioned')
+    op.execute('DROP TABLE history_unpartitioned')
+
+
+def downgrade():
+    op.execute('ALTER TABLE history RENAME TO history_partitioned')
+
+    _create_history('')
+
+    _copy_history_from('history_partitioned')
+    op.execute('DROP TABLE history_partitioned')
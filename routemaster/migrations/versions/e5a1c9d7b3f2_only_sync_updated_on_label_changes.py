@@ -0,0 +1,45 @@
+"""
+only sync updated on label changes
+
+Revision ID: e5a1c9d7b3f2
+Revises: 8b3f6c2d1a47
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c9d7b3f2'
+down_revision = '8b3f6c2d1a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Bookkeeping written by routemaster, such as when a label is next due to
+    # be evaluated, no longer counts as the label being updated.
+    op.execute(
+        '''
+        DROP TRIGGER sync_label_updated_column ON labels;
+
+        CREATE TRIGGER sync_label_updated_column
+            BEFORE UPDATE ON labels
+            FOR EACH ROW
+            WHEN (
+                OLD.metadata IS DISTINCT FROM NEW.metadata OR
+                OLD.deleted IS DISTINCT FROM NEW.deleted
+            )
+            EXECUTE PROCEDURE sync_label_updated_column_fn();
+        ''',
+    )
+
+
+def downgrade():
+    op.execute(
+        '''
+        DROP TRIGGER sync_label_updated_column ON labels;
+
+        CREATE TRIGGER sync_label_updated_column
+            BEFORE UPDATE ON labels
+            FOR EACH ROW
+            EXECUTE PROCEDURE sync_label_updated_column_fn();
+        ''',
+    )
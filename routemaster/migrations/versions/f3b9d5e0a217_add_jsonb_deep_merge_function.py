@@ -0,0 +1,55 @@
+"""
+add jsonb deep merge function
+
+Revision ID: f3b9d5e0a217
+Revises: c2a7f1d83e54
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d5e0a217'
+down_revision = 'c2a7f1d83e54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        '''
+        CREATE OR REPLACE FUNCTION jsonb_deep_merge(
+            existing JSONB,
+            changes JSONB
+        )
+            RETURNS JSONB AS
+                $$
+                    DECLARE
+                        merged JSONB := existing;
+                        change_key TEXT;
+                        change_value JSONB;
+                    BEGIN
+                        FOR change_key, change_value IN
+                            SELECT * FROM jsonb_each(changes)
+                        LOOP
+                            IF
+                                jsonb_typeof(merged -> change_key) = 'object'
+                                AND jsonb_typeof(change_value) = 'object'
+                            THEN
+                                change_value := jsonb_deep_merge(
+                                    merged -> change_key,
+                                    change_value
+                                );
+                            END IF;
+                            merged := merged ||
+                                jsonb_build_object(change_key, change_value);
+                        END LOOP;
+                        RETURN merged;
+                    END;
+                $$
+            LANGUAGE PLPGSQL
+            IMMUTABLE;
+        ''',
+    )
+
+
+def downgrade():
+    op.execute('DROP FUNCTION jsonb_deep_merge(JSONB, JSONB);')
@@ -0,0 +1,289 @@
+"""Scheduling of periodic jobs, and of the work they do."""
+
+import heapq
+import datetime
+import itertools
+import threading
+import contextlib
+from typing import Dict, List, Tuple, Callable, Iterator, Optional, NamedTuple
+from concurrent.futures import Executor
+
+# Upper bound on how long to sleep between checks for due jobs, so that
+# changes to the system clock are noticed.
+MAX_SLEEP = 60
+
+NextRunAfter = Callable[[datetime.datetime], datetime.datetime]
+
+
+def _now() -> datetime.datetime:
+    # Jobs are scheduled in naive local time, as with the system crontab.
+    return datetime.datetime.now()
+
+
+def _next_daily_run(
+    time: datetime.time,
+    after: datetime.datetime,
+) -> datetime.datetime:
+    next_run = datetime.datetime.combine(after.date(), time)
+    if next_run <= after:
+        next_run += datetime.timedelta(days=1)
+    return next_run
+
+
+class Job:
+    """A periodic job, and when it should next run."""
+
+    def __init__(
+        self,
+        fn: Callable[[], None],
+        next_run_after: NextRunAfter,
+        *,
+        name: str,
+    ) -> None:
+        self.fn = fn
+        self.name = name
+        self.running = False
+        self._next_run_after = next_run_after
+        self.next_run = next_run_after(_now())
+
+    @classmethod
+    def every(
+        cls,
+        interval: datetime.timedelta,
+        fn: Callable[[], None],
+        *,
+        name: str,
+    ) -> 'Job':
+        """A job to run `fn` every `interval`."""
+        return cls(fn, lambda x: x + interval, name=name)
+
+    @classmethod
+    def daily_at(
+        cls,
+        time: datetime.time,
+        fn: Callable[[], None],
+        *,
+        name: str,
+    ) -> 'Job':
+        """A job to run `fn` each day at the given local time."""
+        return cls(fn, lambda x: _next_daily_run(time, x), name=name)
+
+    def first_run_after(self, after: datetime.datetime) -> datetime.datetime:
+        """When the job is first due after `after`, without scheduling it."""
+        next_run = self.next_run
+        while next_run <= after:
+            next_run = self._next_run_after(next_run)
+        return next_run
+
+    def schedule_next_run(self, now: datetime.datetime) -> None:
+        """
+        Advance to the first run due after `now`.
+
+        Runs are scheduled from when the previous run was due rather than when
+        it happened, so they do not drift. Runs missed entirely are skipped.
+        """
+        self.next_run = self.first_run_after(max(now, self.next_run))
+
+    def run(self) -> None:
+        """Run the job immediately, and schedule its next run."""
+        try:
+            self.fn()
+        finally:
+            self.schedule_next_run(_now())
+
+    def __repr__(self) -> str:
+        """Return a useful debug representation."""
+        return f"<Job {self.name!r} next_run={self.next_run}>"
+
+
+class Scheduler:
+    """
+    Runs periodic jobs on an executor as they become due.
+
+    Due jobs are kept in a heap so that the scheduler can sleep until exactly
+    when the next one is due, rather than polling.
+    """
+
+    def __init__(self) -> None:
+        self.jobs: List[Job] = []
+        self._queue: List[Tuple[datetime.datetime, int, Job]] = []
+        self._counter = itertools.count()
+        self._wakeup = threading.Condition()
+
+    def add(self, job: Job) -> Job:
+        """Schedule a job."""
+        self.jobs.append(job)
+        self._push(job)
+        return job
+
+    def every(
+        self,
+        interval: datetime.timedelta,
+        fn: Callable[[], None],
+        *,
+        name: str,
+    ) -> Job:
+        """Schedule `fn` to run every `interval`."""
+        return self.add(Job.every(interval, fn, name=name))
+
+    def daily_at(
+        self,
+        time: datetime.time,
+        fn: Callable[[], None],
+        *,
+        name: str,
+    ) -> Job:
+        """Schedule `fn` to run each day at the given local time."""
+        return self.add(Job.daily_at(time, fn, name=name))
+
+    def _push(self, job: Job) -> None:
+        # The counter breaks ties between jobs due at the same time.
+        heapq.heappush(self._queue, (job.next_run, next(self._counter), job))
+
+    def run_pending(self, executor: Executor, logger) -> float:
+        """
+        Dispatch all due jobs to `executor`.
+
+        A job is skipped if its previous run has not yet finished. Returns the
+        number of seconds until the next job is due.
+        """
+        now = _now()
+        while self._queue and self._queue[0][0] <= now:
+            _, _, job = heapq.heappop(self._queue)
+            due = job.next_run
+            job.schedule_next_run(now)
+            self._push(job)
+
+            with self._wakeup:
+                if job.running:
+                    logger.warning(
+                        "Skipping cron job %s as its previous run is still "
+                        "in progress",
+                        job.name,
+                    )
+                    continue
+                job.running = True
+
+            executor.submit(self._run_job, job, due, logger)
+
+        if not self._queue:
+            return MAX_SLEEP
+        return max(0, (self._queue[0][0] - _now()).total_seconds())
+
+    def _run_job(self, job: Job, due: datetime.datetime, logger) -> None:
+        try:
+            logger.cron_job_lateness(
+                job.name,
+                max(datetime.timedelta(0), _now() - due),
+            )
+            job.fn()
+        except Exception:  # noqa: B902
+            logger.exception("Error running cron job %s", job.name)
+        finally:
+            with self._wakeup:
+                job.running = False
+
+    def run(
+        self,
+        executor: Executor,
+        logger,
+        is_terminating: Callable[[], bool],
+    ) -> None:
+        """Run due jobs on `executor` until terminating."""
+        while not is_terminating():
+            delay = self.run_pending(executor, logger)
+            with self._wakeup:
+                if not is_terminating():
+                    self._wakeup.wait(min(delay, MAX_SLEEP))
+
+    def wake(self) -> None:
+        """Wake the scheduler, such as to notice that it is terminating."""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+
+class _Request(NamedTuple):
+    key: str
+    size: int
+    max_in_flight: Optional[int]
+
+
+class FairShare:
+    """
+    Interleaves chunks of work from several sources in proportion to weight.
+
+    Each chunk is charged to its source as its size divided by the source's
+    weight. When a slot frees up, it goes to the waiting source which has been
+    charged least, so large sources cannot starve small ones. A source may
+    also limit how much of its work is in flight at once.
+    """
+
+    def __init__(self, slots: int) -> None:
+        self._slots = slots
+        self._running = 0
+        self._condition = threading.Condition()
+        self._waiting: List[_Request] = []
+        self._charged: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        # The charge of the most recently started chunk. Sources starting
+        # after being idle are charged from here, rather than spending credit
+        # they built up while idle.
+        self._virtual_time = 0.0
+
+    @contextlib.contextmanager
+    def turn(
+        self,
+        key: str,
+        size: int,
+        *,
+        weight: int = 1,
+        max_in_flight: Optional[int] = None,
+    ) -> Iterator[None]:
+        """Wait for, then hold, a slot for a chunk of `size` items."""
+        request = _Request(key, size, max_in_flight)
+
+        with self._condition:
+            if not self._in_flight.get(key) and not any(
+                x.key == key for x in self._waiting
+            ):
+                self._charged[key] = max(
+                    self._charged.get(key, 0.0),
+                    self._virtual_time,
+                )
+
+            self._waiting.append(request)
+            self._condition.wait_for(lambda: self._next() is request)
+            # Requests are equal by value, so are removed by identity.
+            self._waiting = [x for x in self._waiting if x is not request]
+
+            self._running += 1
+            self._in_flight[key] = self._in_flight.get(key, 0) + size
+            self._virtual_time = self._charged[key]
+            self._charged[key] += size / weight
+            # Further slots may be free for other waiting sources.
+            self._condition.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._in_flight[key] -= size
+                self._condition.notify_all()
+
+    def _is_startable(self, request: _Request) -> bool:
+        in_flight = self._in_flight.get(request.key, 0)
+        return (
+            request.max_in_flight is None or
+            in_flight == 0 or
+            in_flight + request.size <= request.max_in_flight
+        )
+
+    def _next(self) -> Optional[_Request]:
+        if self._running >= self._slots:
+            return None
+        startable = [x for x in self._waiting if self._is_startable(x)]
+        if not startable:
+            return None
+        # `min` keeps the earliest of equally charged requests.
+        return min(startable, key=lambda x: self._charged[x.key])
@@ -139,6 +139,8 @@ def create_label(state_machine_name, label_name):
 
     Returns:
     - 201 Created: if the label is successfully created and started.
+    - 202 Accepted: if the label is successfully created, and its state
+                    machine processes transitions asynchronously.
     - 409 Conflict: if the label already exists in the state machine.
     - 404 Not Found: if the state machine does not exist.
     - 400 Bad Request: if the request body is not a valid metadata.
@@ -155,10 +157,13 @@ def create_label(state_machine_name, label_name):
         abort(400, "No metadata given")
 
     try:
-        initial_state_name = \
-            app.config.state_machines[state_machine_name].states[0].name
+        state_machine_instance = app.config.state_machines[state_machine_name]
+        initial_state_name = state_machine_instance.states[0].name
         metadata = state_machine.create_label(app, label, initial_metadata)
-        return jsonify(metadata=metadata, state=initial_state_name), 201
+        return (
+            jsonify(metadata=metadata, state=initial_state_name),
+            202 if state_machine_instance.asynchronous else 201,
+        )
     except LookupError:
         msg = f"State machine '{state_machine_name}' does not exist"
         abort(404, msg)
@@ -180,6 +185,8 @@ def update_label(state_machine_name, label_name):
 
     Returns:
     - 200 Ok: if the label is successfully updated.
+    - 202 Accepted: if the label is successfully updated, and its state
+                    machine processes transitions asynchronously.
     - 400 Bad Request: if the request body is not a valid metadata.
     - 404 Not Found: if the state machine or label does not exist.
     - 410 Gone: if the label once existed but has since been deleted.
@@ -201,7 +208,11 @@ def update_label(state_machine_name, label_name):
             patch_metadata,
         )
         state = state_machine.get_label_state(app, label)
-        return jsonify(metadata=new_metadata, state=state.name)
+        state_machine_instance = app.config.state_machines[state_machine_name]
+        return (
+            jsonify(metadata=new_metadata, state=state.name),
+            202 if state_machine_instance.asynchronous else 200,
+        )
     except UnknownStateMachine:
         msg = f"State machine '{state_machine_name}' does not exist"
         abort(404, msg)
@@ -240,6 +251,47 @@ def delete_label(state_machine_name, label_name):
     return '', 204
 
 
+@server.route(
+    '/state-machines/<state_machine_name>/labels',
+    methods=['DELETE'],
+)
+def delete_labels(state_machine_name):
+    """
+    Delete many labels in a state machine at once.
+
+    The labels to delete are given as a list of names in the `labels` field of
+    the request body. They are deleted in a single transaction, as for
+    deleting a single label.
+
+    Returns:
+    - 204 No content: if the labels are successfully deleted (or did not
+                      exist).
+    - 400 Bad Request: if the request body is not a list of label names.
+    - 404 Not Found: if the state machine does not exist.
+    """
+    app = server.config.app
+
+    try:
+        label_names = request.get_json()['labels']
+    except (KeyError, TypeError):
+        abort(400, "No labels given")
+
+    if (
+        not isinstance(label_names, list) or
+        not all(isinstance(x, str) for x in label_names)
+    ):
+        abort(400, "Labels must be a list of label names")
+
+    try:
+        state_machine_instance = app.config.state_machines[state_machine_name]
+    except KeyError:
+        msg = f"State machine '{state_machine_name}' does not exist"
+        abort(404, msg)
+
+    state_machine.delete_labels(app, state_machine_instance, label_names)
+    return '', 204
+
+
 @server.route('/check-loggers', methods=['GET'])
 def check_loggers():
     """
@@ -1,7 +1,9 @@
 import json
+import datetime
 from unittest import mock
 
 from routemaster.db import Label, History
+from routemaster.state_machine import archive_labels
 
 
 def test_root(client, version):
@@ -177,6 +179,29 @@ def test_get_label_has_state(client, create_label):
     assert response.json['state'] == 'start'
 
 
+def test_get_archived_label(client, app, create_label):
+    create_label('foo', 'test_machine', {'bar': 'baz'})
+    with app.new_session():
+        app.session.add(History(
+            label_name='foo',
+            label_state_machine='test_machine',
+            old_state='start',
+            new_state='end',
+        ))
+
+    test_machine = app.config.state_machines['test_machine']._replace(
+        archive_labels_after=datetime.timedelta(0),
+    )
+    assert archive_labels(app, test_machine) == 1
+
+    response = client.get('/state-machines/test_machine/labels/foo')
+    assert response.status_code == 200
+    assert response.json == {'metadata': {'bar': 'baz'}, 'state': 'end'}
+
+    response = client.get('/state-machines/test_machine/labels')
+    assert response.json['labels'] == [{'name': 'foo'}]
+
+
 def test_get_label_404_for_not_found_label(client, create_label):
     response = client.get('/state-machines/test_machine/labels/foo')
     assert response.status_code == 404
@@ -240,6 +265,50 @@ def test_update_label_moves_label(client, create_label, app, mock_webhook, mock_
     assert current_state(label) == 'end'
 
 
+def test_create_label_accepted_for_asynchronous_state_machine(client, app, mock_webhook):
+    test_machine = app.config.state_machines['test_machine']
+
+    with mock.patch.dict(
+        app.config.state_machines,
+        {'test_machine': test_machine._replace(asynchronous=True)},
+    ), mock_webhook() as webhook:
+        response = client.post(
+            '/state-machines/test_machine/labels/foo',
+            data=json.dumps({'metadata': {'should_progress': True}}),
+            content_type='application/json',
+        )
+        webhook.assert_not_called()
+
+    assert response.status_code == 202
+    assert response.json['state'] == 'start'
+
+    with app.new_session():
+        history = app.session.query(History).one()
+        assert history.new_state == 'start'
+
+
+def test_update_label_accepted_for_asynchronous_state_machine(client, app, create_label, mock_webhook):
+    create_label('foo', 'test_machine', {})
+    test_machine = app.config.state_machines['test_machine']
+
+    with mock.patch.dict(
+        app.config.state_machines,
+        {'test_machine': test_machine._replace(asynchronous=True)},
+    ), mock_webhook() as webhook:
+        response = client.patch(
+            '/state-machines/test_machine/labels/foo',
+            data=json.dumps({'metadata': {'should_progress': True}}),
+            content_type='application/json',
+        )
+        webhook.assert_not_called()
+
+    assert response.status_code == 202
+    assert response.json == {
+        'metadata': {'should_progress': True},
+        'state': 'start',
+    }
+
+
 def test_delete_existing_label(client, app, create_label):
     label_name = 'foo'
     state_machine = app.config.state_machines['test_machine']
@@ -291,6 +360,52 @@ def test_delete_label_404_for_not_found_state_machine(client):
     assert response.status_code == 404
 
 
+def test_delete_labels(client, app, create_label):
+    create_label('foo', 'test_machine', {})
+    create_label('bar', 'test_machine', {})
+    create_label('quox', 'test_machine', {})
+
+    response = client.delete(
+        '/state-machines/test_machine/labels',
+        data=json.dumps({'labels': ['foo', 'bar', 'unknown']}),
+        content_type='application/json',
+    )
+
+    assert response.status_code == 204
+
+    with app.new_session():
+        assert {
+            x.name: x.deleted for x in app.session.query(Label)
+        } == {'foo': True, 'bar': True, 'quox': False}
+
+
+def test_delete_labels_404_for_not_found_state_machine(client):
+    response = client.delete(
+        '/state-machines/nonexistent_machine/labels',
+        data=json.dumps({'labels': ['foo']}),
+        content_type='application/json',
+    )
+    assert response.status_code == 404
+
+
+def test_delete_labels_400_for_no_labels(client):
+    response = client.delete(
+        '/state-machines/test_machine/labels',
+        data=json.dumps({}),
+        content_type='application/json',
+    )
+    assert response.status_code == 400
+
+
+def test_delete_labels_400_for_invalid_labels(client):
+    response = client.delete(
+        '/state-machines/test_machine/labels',
+        data=json.dumps({'labels': 'foo'}),
+        content_type='application/json',
+    )
+    assert response.status_code == 400
+
+
 def test_list_labels_excludes_deleted_labels(
     client,
     create_label,
@@ -1,6 +1,7 @@
 """Public API for state machines."""
 
 from routemaster.state_machine.api import (
+    METADATA_TRIGGERS_CHANNEL,
     LabelRef,
     LabelProvider,
     LabelStateProcessor,
@@ -8,17 +9,31 @@ from routemaster.state_machine.api import (
     create_label,
     delete_label,
     process_cron,
+    delete_labels,
     get_label_state,
     get_label_metadata,
+    process_cron_chunks,
+    process_transition_queue,
     update_metadata_for_label,
+    process_metadata_triggers_notification,
 )
 from routemaster.state_machine.gates import process_gate
+from routemaster.state_machine.types import Sweep, SpreadSlot
 from routemaster.state_machine.utils import (
+    LabelStream,
+    spread_slot,
     labels_in_state,
     labels_in_state_with_metadata,
     labels_needing_metadata_update_retry_in_gate,
 )
+from routemaster.state_machine.sweeps import (
+    start_sweep,
+    finish_sweep,
+    record_sweep_progress,
+)
 from routemaster.state_machine.actions import process_action
+from routemaster.state_machine.archive import archive_labels
+from routemaster.state_machine.history import maintain_history
 from routemaster.state_machine.exceptions import (
     DeletedLabel,
     UnknownLabel,
@@ -27,23 +42,37 @@ from routemaster.state_machine.exceptions import (
 )
 
 __all__ = (
+    'Sweep',
     'LabelRef',
+    'SpreadSlot',
+    'LabelStream',
+    'spread_slot',
     'list_labels',
+    'start_sweep',
     'create_label',
     'delete_label',
     'process_cron',
     'process_gate',
+    'finish_sweep',
+    'delete_labels',
     'DeletedLabel',
     'UnknownLabel',
     'LabelProvider',
     'process_action',
+    'archive_labels',
+    'maintain_history',
     'get_label_state',
     'labels_in_state',
     'get_label_metadata',
     'LabelAlreadyExists',
+    'process_cron_chunks',
     'LabelStateProcessor',
     'UnknownStateMachine',
+    'record_sweep_progress',
+    'process_transition_queue',
+    'METADATA_TRIGGERS_CHANNEL',
     'update_metadata_for_label',
     'labels_in_state_with_metadata',
+    'process_metadata_triggers_notification',
     'labels_needing_metadata_update_retry_in_gate',
 )
@@ -1,16 +1,29 @@
 """The core of the state machine logic."""
 
-from typing import List, Callable, Iterable, Optional
+import json
+import itertools
+from typing import Any, List, Tuple, Callable, Iterable, Optional, Collection
 from typing_extensions import Protocol
 
-from routemaster.db import Label, History
+import sqlalchemy
+from sqlalchemy import or_, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from routemaster.db import (
+    Label,
+    History,
+    ArchivedLabel,
+    QueuedTransition,
+    jsonb_deep_merge,
+)
 from routemaster.app import App
-from routemaster.utils import dict_merge, suppress_exceptions
+from routemaster.utils import suppress_exceptions
 from routemaster.config import Gate, State, StateMachine
 from routemaster.state_machine.gates import process_gate
 from routemaster.state_machine.types import LabelRef, Metadata
 from routemaster.state_machine.utils import (
     lock_label,
+    expire_label,
     get_current_state,
     get_state_machine,
 )
@@ -20,45 +33,70 @@ from routemaster.state_machine.utils import (
 from routemaster.state_machine.utils import (
     needs_gate_evaluation_for_metadata_change,
 )
+from routemaster.state_machine.archive import (
+    get_archived_state,
+    restore_archived_labels,
+    get_archived_label_metadata,
+)
 from routemaster.state_machine.exceptions import (
     DeletedLabel,
     UnknownLabel,
     LabelAlreadyExists,
+    UnknownStateMachine,
 )
 from routemaster.state_machine.transitions import process_transitions
 
+# Channel notified when a label is left with metadata triggers to process.
+METADATA_TRIGGERS_CHANNEL = 'routemaster_metadata_triggers'
+
 # Signature of a function to gather the labels to be operated upon when
-# processing a cron task. This will be called in a different transaction to
-# where we iterate over the results, so to prevent confusion or the possible
-# introduction of errors, we require all the data up-front.
-LabelProvider = Callable[[App, StateMachine, State], List[str]]
+# processing a cron task. This is called in a read-only session of its own,
+# and must run its queries before returning, but the names it returns may be
+# streamed from them as they are iterated over, in between the transactions
+# which process each label.
+LabelProvider = Callable[[App, StateMachine, State], Iterable[str]]
 
 
 def list_labels(app: App, state_machine: StateMachine) -> Iterable[LabelRef]:
     """
     Returns a sorted iterable of labels associated with a state machine.
 
-    Labels are returned ordered alphabetically by name.
+    Labels are returned ordered alphabetically by name. Archived labels are
+    included.
     """
-    for (name,) in app.session.query(Label.name).filter_by(
+    names = app.session.query(Label.name).filter_by(
         state_machine=state_machine.name,
         deleted=False,
-    ):
+    ).union_all(app.session.query(ArchivedLabel.name).filter_by(
+        state_machine=state_machine.name,
+        deleted=False,
+    )).order_by(Label.name)
+    for (name,) in names:
         yield LabelRef(name=name, state_machine=state_machine.name)
 
 
 def get_label_state(app: App, label: LabelRef) -> Optional[State]:
-    """Finds the current state of a label."""
+    """Finds the current state of a label, including archived labels."""
     state_machine = get_state_machine(app, label)
-    return get_current_state(app, label, state_machine)
+    try:
+        return get_current_state(app, label, state_machine)
+    except UnknownLabel:
+        return get_archived_state(app, label, state_machine)
 
 
 def get_label_metadata(app: App, label: LabelRef) -> Metadata:
-    """Returns the metadata associated with a label."""
+    """
+    Returns the metadata associated with a label.
+
+    Archived labels are included.
+    """
     state_machine = get_state_machine(app, label)
 
     row = get_label_metadata_internal(app, label, state_machine)
 
+    if row is None:
+        row = get_archived_label_metadata(app, label)
+
     if row is None:
         raise UnknownLabel(label)
 
@@ -78,6 +116,10 @@ def create_label(app: App, label: LabelRef, metadata: Metadata) -> Metadata:
         app.session.query(Label).filter_by(
             name=label.name,
             state_machine=label.state_machine,
+        ).exists() |
+        app.session.query(ArchivedLabel).filter_by(
+            name=label.name,
+            state_machine=label.state_machine,
         ).exists(),
     ).scalar():
         raise LabelAlreadyExists(label)
@@ -96,7 +138,10 @@ def create_label(app: App, label: LabelRef, metadata: Metadata) -> Metadata:
         ),
     )
 
-    process_transitions(app, label)
+    if state_machine.asynchronous:
+        _enqueue_transitions(app, label)
+    else:
+        process_transitions(app, label)
 
     return metadata
 
@@ -112,11 +157,23 @@ def update_metadata_for_label(
     Moves the label through the state machine as appropriate.
     """
     state_machine = get_state_machine(app, label)
-    needs_gate_evaluation = False
-
-    row = lock_label(app, label)
 
-    existing_metadata, deleted = row.metadata, row.deleted
+    # Lock the label, without loading its metadata.
+    lock = app.session.query(Label.deleted).filter_by(
+        name=label.name,
+        state_machine=label.state_machine,
+    ).with_for_update()
+    deleted = lock.scalar()
+
+    if deleted is None:
+        if restore_archived_labels(app, state_machine, [label.name]):
+            deleted = lock.scalar()
+        elif get_archived_label_metadata(app, label) is not None:
+            # Only deleted labels are left in the archive.
+            raise DeletedLabel(label)
+
+    if deleted is None:
+        raise UnknownLabel(label)
     if deleted:
         raise DeletedLabel(label)
 
@@ -128,10 +185,60 @@ def update_metadata_for_label(
             update,
         )
 
-    new_metadata = dict_merge(existing_metadata, update)
+    # Merge in the database, so that only the update and the result are
+    # transferred rather than the existing metadata too.
+    labels = Label.__table__
+    new_metadata_expression = jsonb_deep_merge(
+        labels.c.metadata,
+        sqlalchemy.literal(update, JSONB),
+    )
 
-    row.metadata = new_metadata
-    row.metadata_triggers_processed = not needs_gate_evaluation
+    triggers_processed: Any = not needs_gate_evaluation
+    triggered_paths = (
+        _triggered_paths(current_state, update)
+        if needs_gate_evaluation
+        else []
+    )
+    if triggered_paths:
+        # Clients often re-send unchanged metadata, so only evaluate the gate
+        # if a watched value has changed. Pending evaluations are kept.
+        triggers_processed = labels.c.metadata_triggers_processed & ~or_(*(
+            labels.c.metadata[path].is_distinct_from(
+                new_metadata_expression[path],
+            )
+            for path in triggered_paths
+        ))
+
+    new_metadata, metadata_triggers_processed = app.session.execute(
+        labels.update().where(
+            (labels.c.name == label.name) &
+            (labels.c.state_machine == label.state_machine),
+        ).values(
+            metadata=new_metadata_expression,
+            metadata_triggers_processed=triggers_processed,
+        ).returning(
+            labels.c.metadata,
+            labels.c.metadata_triggers_processed,
+        ),
+    ).first()
+    expire_label(app, label)
+
+    if needs_gate_evaluation and metadata_triggers_processed:
+        app.logger.gate_evaluation_skipped(state_machine, current_state)
+        needs_gate_evaluation = False
+
+    # Gates with a debounce are left for the cron to evaluate once updates to
+    # the label have settled, keeping gate evaluation out of the request.
+    if (
+        needs_gate_evaluation and
+        isinstance(current_state, Gate) and
+        current_state.debounce is not None
+    ):
+        needs_gate_evaluation = False
+
+    if needs_gate_evaluation and state_machine.asynchronous:
+        _enqueue_transitions(app, label, pending_gate=current_state)
+        needs_gate_evaluation = False
 
     # Try to move the label forward, but this is not a hard requirement as
     # the cron will come back around to progress the label later.
@@ -150,10 +257,88 @@ def update_metadata_for_label(
             app.logger.exception(
                 f"Failed to progress label {label!r} after metadata update.",
             )
+            with suppress_exceptions(app.logger):
+                _notify_metadata_triggers_pending(
+                    app,
+                    label,
+                    current_state.name,
+                )
 
     return new_metadata
 
 
+def _notify_metadata_triggers_pending(
+    app: App,
+    label: LabelRef,
+    gate_name: str,
+) -> None:
+    # Delivered to listeners once the transaction commits.
+    app.session.execute(sqlalchemy.select([func.pg_notify(
+        METADATA_TRIGGERS_CHANNEL,
+        json.dumps({
+            'state_machine': label.state_machine,
+            'label': label.name,
+            'gate': gate_name,
+        }),
+    )]))
+
+
+def process_metadata_triggers_notification(app: App, payload: str) -> None:
+    """
+    Evaluate the gate for a label whose metadata triggers are pending.
+
+    `payload` is that of a notification on `METADATA_TRIGGERS_CHANNEL`. Labels
+    which have since been processed, or have left the gate, are ignored.
+    """
+    try:
+        data = json.loads(payload)
+        label = LabelRef(
+            name=data['label'],
+            state_machine=data['state_machine'],
+        )
+        state_machine = get_state_machine(app, label)
+        gate = state_machine.get_state(data['gate'])
+    except (
+        ValueError,
+        KeyError,
+        TypeError,
+        IndexError,
+        UnknownStateMachine,
+    ):
+        app.logger.warning(
+            f"Ignoring invalid metadata triggers notification {payload!r}",
+        )
+        return
+
+    def get_labels(state_machine: StateMachine, state: State) -> List[str]:
+        return [
+            x for x, in app.session.query(Label.name).filter_by(
+                name=label.name,
+                state_machine=label.state_machine,
+                metadata_triggers_processed=False,
+            )
+        ]
+
+    process_cron(
+        process=process_gate,
+        get_labels=get_labels,
+        app=app,
+        state_machine=state_machine,
+        state=gate,
+    )
+
+
+def _triggered_paths(state: State, update: Metadata) -> List[Tuple[str, ...]]:
+    if not isinstance(state, Gate):  # pragma: no cover
+        # Only gates have metadata triggers.
+        return []
+    return [
+        tuple(trigger.metadata_path.split('.'))
+        for trigger in state.metadata_triggers
+        if trigger.should_trigger_for_update(update)
+    ]
+
+
 def _process_transitions_for_metadata_update(
     app: App,
     label: LabelRef,
@@ -183,25 +368,111 @@ def _process_transitions_for_metadata_update(
             state=current_state,
             state_machine=state_machine,
             label=label,
+            record_next_evaluation=False,
         )
 
     if could_progress:
         process_transitions(app, label)
 
 
+def _enqueue_transitions(
+    app: App,
+    label: LabelRef,
+    *,
+    pending_gate: Optional[State] = None,
+) -> None:
+    app.session.add(QueuedTransition(
+        label_name=label.name,
+        label_state_machine=label.state_machine,
+        gate=pending_gate.name if pending_gate is not None else None,
+    ))
+
+
+def process_transition_queue(
+    app: App,
+    is_terminating: Callable[[], bool] = lambda: False,
+) -> int:
+    """
+    Process labels queued by writes to asynchronous state machines.
+
+    Entries are claimed with `SKIP LOCKED`, so any number of workers may drain
+    the queue concurrently. Each entry is removed once processed, even if
+    processing fails; labels left pending a gate evaluation are notified and
+    retried as for synchronous state machines.
+
+    Returns the number of entries processed before the queue was empty.
+    """
+    processed = 0
+
+    while not is_terminating():
+        with app.new_session():
+            entry = app.session.query(QueuedTransition).order_by(
+                QueuedTransition.id,
+            ).with_for_update(skip_locked=True).first()
+
+            if entry is None:
+                break
+
+            app.session.delete(entry)
+            label = LabelRef(
+                name=entry.label_name,
+                state_machine=entry.label_state_machine,
+            )
+
+            try:
+                with app.session.begin_nested():
+                    _process_queued_transitions(app, label, entry.gate)
+            except Exception:  # noqa: B902
+                app.logger.exception(
+                    f"Failed to process queued transitions for {label!r}.",
+                )
+                if entry.gate is not None:
+                    with suppress_exceptions(app.logger):
+                        _notify_metadata_triggers_pending(
+                            app,
+                            label,
+                            entry.gate,
+                        )
+
+        processed += 1
+
+    return processed
+
+
+def _process_queued_transitions(
+    app: App,
+    label: LabelRef,
+    gate_name: Optional[str],
+) -> None:
+    if gate_name is None:
+        process_transitions(app, label)
+        return
+
+    state_machine = get_state_machine(app, label)
+    _process_transitions_for_metadata_update(
+        app,
+        label,
+        state_machine,
+        state_machine.get_state(gate_name),
+    )
+
+
 def delete_label(app: App, label: LabelRef) -> None:
     """
     Deletes the metadata for a label and marks the label as deleted.
 
     The history for the label is not changed (in order to allow post-hoc
-    analysis of the path the label took through the state machine).
+    analysis of the path the label took through the state machine). Archived
+    labels are restored in order to be deleted.
     """
     state_machine = get_state_machine(app, label)  # Raises UnknownStateMachine
 
     try:
         row = lock_label(app, label)
     except UnknownLabel:
-        return
+        if not restore_archived_labels(app, state_machine, [label.name]):
+            return
+        row = lock_label(app, label)
 
     if row is None or row.deleted:
         return
@@ -216,12 +487,81 @@ def delete_label(app: App, label: LabelRef) -> None:
     if current_state is None:
         raise AssertionError(f"Active label {label} has no current state!")
 
-    row.history.append(History(
+    # Added directly rather than to `row.history`, which would load the
+    # label's whole history.
+    app.session.add(History(
+        label_name=label.name,
+        label_state_machine=label.state_machine,
         old_state=current_state.name,
         new_state=None,
     ))
 
 
+def delete_labels(
+    app: App,
+    state_machine: StateMachine,
+    label_names: Collection[str],
+) -> None:
+    """
+    Deletes many labels in a state machine at once, as for `delete_label`.
+
+    Labels which do not exist, or are already deleted, are ignored. However
+    many labels there are, they are deleted with the same few statements.
+    """
+    if not label_names:
+        return
+
+    restore_archived_labels(app, state_machine, label_names)
+
+    # Labels are locked in a consistent order, so that concurrent deletions
+    # of overlapping labels cannot deadlock.
+    names = [
+        x for x, in app.session.query(Label.name).filter(
+            Label.state_machine == state_machine.name,
+            Label.name.in_(label_names),
+            ~Label.deleted,
+        ).order_by(Label.name).with_for_update()
+    ]
+    if not names:
+        return
+
+    history = History.__table__
+    current_states = sqlalchemy.select([
+        history.c.label_name,
+        history.c.label_state_machine,
+        history.c.new_state,
+    ]).where(sqlalchemy.and_(
+        history.c.label_state_machine == state_machine.name,
+        history.c.label_name.in_(names),
+    )).distinct(
+        history.c.label_name,
+    ).order_by(
+        history.c.label_name,
+        history.c.id.desc(),
+    ).alias('current_states')
+
+    app.session.execute(history.insert().from_select(
+        ['label_name', 'label_state_machine', 'old_state', 'new_state'],
+        sqlalchemy.select([
+            current_states.c.label_name,
+            current_states.c.label_state_machine,
+            current_states.c.new_state,
+            sqlalchemy.null(),
+        ]),
+    ))
+
+    app.session.query(Label).filter(
+        Label.state_machine == state_machine.name,
+        Label.name.in_(names),
+    ).update({
+        'metadata': {},
+        'deleted': True,
+    }, synchronize_session=False)
+
+    for name in names:
+        expire_label(app, LabelRef(name, state_machine.name))
+
+
 class LabelStateProcessor(Protocol):
     """Type signature for the label state processor callable."""
     def __call__(
@@ -250,28 +590,88 @@ def process_cron(
     """
     Cron event entrypoint.
     """
-    with app.new_session():
-        relevant_labels = get_labels(state_machine, state)
-
-    for label_name in relevant_labels:
-        with suppress_exceptions(app.logger):
-            label = LabelRef(name=label_name, state_machine=state_machine.name)
-            could_progress = False
-
-            with app.new_session():
-                lock_label(app, label)
-                current_state = get_current_state(app, label, state_machine)
-
-                if current_state != state:
-                    continue
-
-                could_progress = process(
-                    app=app,
-                    state=state,
-                    state_machine=state_machine,
-                    label=label,
-                )
+    process_cron_chunks(
+        process,
+        lambda x, y: [get_labels(x, y)],
+        app,
+        state_machine,
+        state,
+    )
+
+
+def process_cron_chunks(
+    process: LabelStateProcessor,
+    get_chunks: Callable[[StateMachine, State], Iterable[Iterable[str]]],
+    app: App,
+    state_machine: StateMachine,
+    state: State,
+):
+    """
+    Cron event entrypoint, for labels read in chunks.
+
+    Each chunk is processed before the next is read, and no transaction spans
+    more than one chunk, so reading a chunk may wait on other work without
+    holding the locks of labels already processed.
+    """
+    # Labels are streamed from the read-only session while they are processed
+    # in sessions of their own, each of up to the state machine's
+    # `cron_labels_per_commit` labels.
+    with app.read_only_session() as session:
+        with app.using_session(session):
+            chunks = iter(get_chunks(state_machine, state))
+
+        for chunk in chunks:
+            relevant_labels = iter(chunk)
+            for label_name in relevant_labels:
+                with app.new_session():
+                    _process_cron_label(
+                        process,
+                        label_name,
+                        app,
+                        state_machine,
+                        state,
+                    )
+                    for label_name in itertools.islice(
+                        relevant_labels,
+                        state_machine.cron_labels_per_commit - 1,
+                    ):
+                        _process_cron_label(
+                            process,
+                            label_name,
+                            app,
+                            state_machine,
+                            state,
+                        )
+
+
+def _process_cron_label(
+    process: LabelStateProcessor,
+    label_name: str,
+    app: App,
+    state_machine: StateMachine,
+    state: State,
+) -> None:
+    # Each label is processed within savepoints, so that a failure does not
+    # affect the other labels processed in the same transaction. As when they
+    # were committed separately, a failure to transition the label does not
+    # undo the processing of its current state.
+    label = LabelRef(name=label_name, state_machine=state_machine.name)
+
+    with suppress_exceptions(app.logger):
+        with app.session.begin_nested():
+            lock_label(app, label)
+            current_state = get_current_state(app, label, state_machine)
+
+            if current_state != state:
+                return
+
+            could_progress = process(
+                app=app,
+                state=state,
+                state_machine=state_machine,
+                label=label,
+            )
 
-            with app.new_session():
-                if could_progress:
-                    process_transitions(app, label)
+        if could_progress:
+            with app.session.begin_nested():
+                process_transitions(app, label)
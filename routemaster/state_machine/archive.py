@@ -0,0 +1,221 @@
+"""Archival of labels which will no longer change state."""
+
+from typing import List, Tuple, Callable, Optional, Collection
+
+from sqlalchemy import Table, and_, func, select
+
+from routemaster.db import (
+    Label,
+    History,
+    ArchivedLabel,
+    ArchivedHistory,
+    QueuedTransition,
+)
+from routemaster.app import App
+from routemaster.config import State, NoNextStates, StateMachine
+from routemaster.state_machine.types import LabelRef, Metadata
+from routemaster.state_machine.history import lock_history_partitions
+from routemaster.state_machine.exceptions import UnknownLabel
+
+# Number of labels archived in each transaction.
+ARCHIVE_BATCH_SIZE = 1000
+
+# Columns moved between the label and history tables and their archives.
+_LABEL_COLUMNS = ('name', 'state_machine', 'metadata', 'deleted', 'updated')
+_HISTORY_COLUMNS = (
+    'id',
+    'label_name',
+    'label_state_machine',
+    'created',
+    'forced',
+    'old_state',
+    'new_state',
+)
+
+
+def _move_labels(
+    app: App,
+    state_machine: StateMachine,
+    names: Collection[str],
+    *,
+    from_tables: Tuple[Table, Table],
+    to_tables: Tuple[Table, Table],
+) -> None:
+    from_labels, from_history = from_tables
+    to_labels, to_history = to_tables
+
+    is_label = and_(
+        from_labels.c.state_machine == state_machine.name,
+        from_labels.c.name.in_(names),
+    )
+    is_label_history = and_(
+        from_history.c.label_state_machine == state_machine.name,
+        from_history.c.label_name.in_(names),
+    )
+
+    app.session.execute(to_labels.insert().from_select(
+        _LABEL_COLUMNS,
+        select([from_labels.c[x] for x in _LABEL_COLUMNS]).where(is_label),
+    ))
+    app.session.execute(to_history.insert().from_select(
+        _HISTORY_COLUMNS,
+        select([from_history.c[x] for x in _HISTORY_COLUMNS]).where(
+            is_label_history,
+        ),
+    ))
+    app.session.execute(from_history.delete().where(is_label_history))
+    app.session.execute(from_labels.delete().where(is_label))
+
+
+def _labels_to_archive(app: App, state_machine: StateMachine) -> List[str]:
+    if state_machine.archive_labels_after is None:
+        return []
+
+    terminal_states = [
+        x.name
+        for x in state_machine.states
+        if isinstance(x.next_states, NoNextStates)
+    ]
+
+    states_by_rank = app.session.query(
+        History.label_name,
+        History.new_state,
+        History.created,
+        func.row_number().over(
+            order_by=History.id.desc(),  # type: ignore
+            partition_by=History.label_name,
+        ).label('rank'),
+    ).filter_by(
+        label_state_machine=state_machine.name,
+    ).subquery()
+
+    # `updated` is set by the database, so is compared against its clock.
+    archive_before = func.now() - state_machine.archive_labels_after
+
+    return [
+        x for x, in app.session.query(
+            states_by_rank.c.label_name,
+        ).join(Label, and_(
+            Label.name == states_by_rank.c.label_name,
+            Label.state_machine == state_machine.name,
+        )).filter(
+            states_by_rank.c.rank == 1,
+            Label.deleted | states_by_rank.c.new_state.in_(terminal_states),
+            states_by_rank.c.created <= archive_before,
+            Label.updated <= archive_before,
+        ).order_by(
+            states_by_rank.c.label_name,
+        ).limit(
+            ARCHIVE_BATCH_SIZE,
+        ).with_for_update(of=Label, skip_locked=True)
+    ]
+
+
+def archive_labels(
+    app: App,
+    state_machine: StateMachine,
+    is_terminating: Callable[[], bool] = lambda: False,
+) -> int:
+    """
+    Move labels which will no longer change state into the archive.
+
+    Labels are archived once they have been deleted, or in a state with no
+    next states, for the state machine's `archive_labels_after`. They are
+    moved along with their history, in batches of `ARCHIVE_BATCH_SIZE`.
+
+    Returns the number of labels archived.
+    """
+    archived = 0
+
+    while not is_terminating():
+        with app.new_session():
+            lock_history_partitions(app, shared=True)
+            names = _labels_to_archive(app, state_machine)
+            if names:
+                app.session.query(QueuedTransition).filter(
+                    QueuedTransition.label_state_machine == state_machine.name,
+                    QueuedTransition.label_name.in_(names),
+                ).delete(synchronize_session=False)
+                _move_labels(
+                    app,
+                    state_machine,
+                    names,
+                    from_tables=(Label.__table__, History.__table__),
+                    to_tables=(
+                        ArchivedLabel.__table__,
+                        ArchivedHistory.__table__,
+                    ),
+                )
+
+        archived += len(names)
+        if len(names) < ARCHIVE_BATCH_SIZE:
+            break
+
+    return archived
+
+
+def restore_archived_labels(
+    app: App,
+    state_machine: StateMachine,
+    label_names: Collection[str],
+) -> List[str]:
+    """
+    Move labels back out of the archive, so that they may be changed again.
+
+    Deleted labels are left in the archive, as they cannot be changed. Returns
+    the names of the labels restored.
+    """
+    if not label_names:
+        return []
+
+    names = [
+        x for x, in app.session.query(ArchivedLabel.name).filter(
+            ArchivedLabel.state_machine == state_machine.name,
+            ArchivedLabel.name.in_(label_names),
+            ~ArchivedLabel.deleted,
+        ).order_by(ArchivedLabel.name).with_for_update()
+    ]
+    if names:
+        lock_history_partitions(app, shared=True)
+        _move_labels(
+            app,
+            state_machine,
+            names,
+            from_tables=(ArchivedLabel.__table__, ArchivedHistory.__table__),
+            to_tables=(Label.__table__, History.__table__),
+        )
+    return names
+
+
+def get_archived_label_metadata(
+    app: App,
+    label: LabelRef,
+) -> Optional[Tuple[Metadata, bool]]:
+    """Get the metadata of an archived label, and whether it was deleted."""
+    return app.session.query(
+        ArchivedLabel.metadata,
+        ArchivedLabel.deleted,
+    ).filter_by(
+        name=label.name,
+        state_machine=label.state_machine,
+    ).first()
+
+
+def get_archived_state(
+    app: App,
+    label: LabelRef,
+    state_machine: StateMachine,
+) -> Optional[State]:
+    """Get the state an archived label was in, or None if it was deleted."""
+    history_entry = app.session.query(ArchivedHistory.new_state).filter_by(
+        label_name=label.name,
+        label_state_machine=label.state_machine,
+    ).order_by(
+        ArchivedHistory.id.desc(),  # type: ignore
+    ).first()
+
+    if history_entry is None:
+        raise UnknownLabel(label)
+    if history_entry.new_state is None:
+        return None
+    return state_machine.get_state(history_entry.new_state)
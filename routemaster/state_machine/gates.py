@@ -1,14 +1,21 @@
 """Processing for gate states."""
+from typing import Any
+
+from sqlalchemy import or_, and_
+
 from routemaster.db import Label, History
 from routemaster.app import App
 from routemaster.config import Gate, State, StateMachine
+from routemaster.context import Context
 from routemaster.state_machine.types import LabelRef
 from routemaster.state_machine.utils import (
+    expire_label,
     choose_next_state,
     context_for_label,
     get_state_machine,
     get_label_metadata,
     get_current_history,
+    next_evaluation_key,
 )
 from routemaster.state_machine.exceptions import DeletedLabel
 
@@ -19,6 +26,7 @@ def process_gate(
     state: State,
     state_machine: StateMachine,
     label: LabelRef,
+    record_next_evaluation: bool = True,
 ) -> bool:
     """
     Process a label in a gate, continuing if necessary.
@@ -26,6 +34,10 @@ def process_gate(
     Assumes that `gate` is the current state of the label, and that the label
     has been locked.
 
+    If the label cannot exit and `record_next_evaluation` is set, the time at
+    which it next needs evaluating is stored so that sweeps of the gate can
+    skip it until then.
+
     Returns whether the label progressed in the state machine, for which `True`
     implies further progression should be attempted.
     """
@@ -54,22 +66,61 @@ def process_gate(
     can_exit = gate.exit_condition.run(context)
 
     if not can_exit:
+        if record_next_evaluation and gate.exit_condition.can_run_batch():
+            _record_next_evaluation(app, label, gate, history_entry, context)
         return False
 
     destination = choose_next_state(state_machine, gate, context)
+    _exit_gate(app, label, gate, destination)
+    return True
 
-    app.session.add(History(
-        label_state_machine=state_machine.name,
+
+def _exit_gate(
+    app: App,
+    label: LabelRef,
+    gate: Gate,
+    destination: State,
+) -> None:
+    # The history entry is inserted and the label updated in one statement.
+    # The label is only updated if its metadata triggers were not already
+    # processed, to avoid a needless write and firing its update triggers.
+    history_entry = History.__table__.insert().values(
+        label_state_machine=label.state_machine,
         label_name=label.name,
         old_state=gate.name,
         new_state=destination.name,
-    ))
+    ).returning(
+        History.__table__.c.label_name,
+        History.__table__.c.label_state_machine,
+    ).cte('history_entry')
+
+    labels = Label.__table__
+    app.session.execute(labels.update().where(and_(
+        labels.c.name == history_entry.c.label_name,
+        labels.c.state_machine == history_entry.c.label_state_machine,
+        ~labels.c.metadata_triggers_processed,
+    )).values(metadata_triggers_processed=True))
+
+    expire_label(app, label)
+
+
+def _record_next_evaluation(
+    app: App,
+    label: LabelRef,
+    gate: Gate,
+    history_entry: Any,
+    context: Context,
+) -> None:
+    key = next_evaluation_key(history_entry.id, gate)
+    next_evaluation_at = gate.exit_condition.next_evaluation_time(context)
 
     app.session.query(Label).filter_by(
         name=label.name,
         state_machine=label.state_machine,
-    ).update({
-        'metadata_triggers_processed': True,
-    })
-
-    return True
+    ).filter(or_(
+        Label.next_evaluation_key.is_distinct_from(key),
+        Label.next_evaluation_at.is_distinct_from(next_evaluation_at),
+    )).update({
+        'next_evaluation_key': key,
+        'next_evaluation_at': next_evaluation_at,
+    }, synchronize_session=False)
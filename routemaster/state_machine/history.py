@@ -0,0 +1,183 @@
+"""Maintenance of the partitions of label history."""
+
+import weakref
+import datetime
+import itertools
+from typing import Dict, Optional
+
+import dateutil.tz
+from sqlalchemy import func, table, column, exists, select
+
+from routemaster.db import (
+    HISTORY_DEFAULT_PARTITION,
+    HistoryPartition,
+    drop_history_partition,
+    history_default_bounds,
+    history_partitions_from,
+    create_history_partition,
+    add_history_default_bound,
+    existing_history_partitions,
+    validate_history_default_bound,
+)
+from routemaster.app import App
+
+# Number of months ahead of the current one to create history partitions for,
+# so that they exist before anything is written to them.
+HISTORY_PARTITIONS_AHEAD = 2
+
+# Advisory lock held while changing partitions, so that servers maintaining
+# history at the same time do not conflict.
+HISTORY_MAINTENANCE_LOCK = 0x686973746f7279
+
+# How long a partition with history of state machines without retention is
+# left before checking it again, in case that history has since been archived.
+HISTORY_RECHECK_INTERVAL = datetime.timedelta(days=1)
+
+# When each partition checked by an app may next be dropped, so that only
+# partitions which may be due are scanned.
+_PartitionsDue = Dict[HistoryPartition, datetime.datetime]
+_partitions_due: 'weakref.WeakKeyDictionary[App, _PartitionsDue]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def lock_history_partitions(app: App, *, shared: bool = False) -> None:
+    """
+    Lock the partitions of history until the end of the transaction.
+
+    The lock is shared by anything adding or removing entries in past months,
+    such as archiving labels, which must not happen while partitions are
+    changed.
+    """
+    if shared:
+        lock = func.pg_advisory_xact_lock_shared(HISTORY_MAINTENANCE_LOCK)
+    else:
+        lock = func.pg_advisory_xact_lock(HISTORY_MAINTENANCE_LOCK)
+    app.session.execute(select([lock]))
+
+
+def _bound_default_partition(app: App, bound: HistoryPartition) -> None:
+    # Entries are only added to the default partition for months without a
+    # partition of their own, so it can be bounded to before the first month
+    # yet to have one. Its partition is then attached without scanning the
+    # default partition for entries in that month.
+    with app.new_session():
+        lock_history_partitions(app)
+        bounds = history_default_bounds(app.session)
+        if bounds == {bound: True}:
+            return
+
+        if bound not in bounds:
+            default_partition = table(
+                HISTORY_DEFAULT_PARTITION,
+                column('created'),
+            )
+            is_unbounded = app.session.query(exists().where(
+                default_partition.c.created >= bound.start,
+            )).scalar()
+            if is_unbounded:
+                return
+            add_history_default_bound(app.session, bound)
+
+    with app.new_session():
+        lock_history_partitions(app)
+        if bound in history_default_bounds(app.session):
+            validate_history_default_bound(app.session, bound)
+
+
+def _past_retention_from(
+    app: App,
+    partition: HistoryPartition,
+) -> Optional[datetime.datetime]:
+    # When the partition's entries are all past the history retention of
+    # their state machine, or None if some have no retention.
+    state_machine_names = app.session.execute(
+        select([column('label_state_machine')]).select_from(
+            table(partition.name),
+        ).distinct(),
+    )
+    past_retention_from = partition.end
+    for name, in state_machine_names:
+        state_machine = app.config.state_machines.get(name)
+        if state_machine is None or state_machine.history_retention is None:
+            return None
+        past_retention_from = max(
+            past_retention_from,
+            partition.end + state_machine.history_retention,
+        )
+    return past_retention_from
+
+
+def _is_past_retention(
+    app: App,
+    partition: HistoryPartition,
+    now: datetime.datetime,
+) -> bool:
+    # Entries may have been restored from the archive since the partition
+    # was last checked, so it is scanned again before being dropped.
+    partitions_due = _partitions_due.setdefault(app, {})
+    past_retention_from = _past_retention_from(app, partition)
+    if past_retention_from is None:
+        partitions_due[partition] = now + HISTORY_RECHECK_INTERVAL
+        return False
+    if past_retention_from > now:
+        partitions_due[partition] = past_retention_from
+        return False
+    partitions_due.pop(partition, None)
+    return True
+
+
+def maintain_history(app: App) -> None:
+    """
+    Create upcoming partitions of history, and drop those past retention.
+
+    The default partition is bounded to entries created before the months of
+    the upcoming partitions, so that entries can not be added for later
+    months until their partitions are created.
+
+    A partition is dropped once all its entries are older than the history
+    retention of the state machine they belong to. The latest entry of each
+    label is never dropped, but kept in the default partition instead. A
+    partition which cannot yet be dropped is not checked again until it may
+    be, or for `HISTORY_RECHECK_INTERVAL` if some of its entries have no
+    retention.
+    """
+    now = datetime.datetime.now(dateutil.tz.tzutc())
+
+    with app.new_session():
+        lock_history_partitions(app)
+        existing = existing_history_partitions(app.session)
+        upcoming = list(itertools.islice(
+            history_partitions_from(now),
+            HISTORY_PARTITIONS_AHEAD + 1,
+        ))
+        for partition in upcoming:
+            if partition not in existing:
+                create_history_partition(app.session, partition)
+
+    _bound_default_partition(app, upcoming[-1].next())
+
+    retentions = [
+        x.history_retention
+        for x in app.config.state_machines.values()
+        if x.history_retention is not None
+    ]
+    if not retentions:
+        return
+
+    # Each partition is dropped in its own transaction, as the history table
+    # is locked until it commits.
+    latest_end = now - min(retentions)
+    partitions_due = _partitions_due.get(app, {})
+    for partition in existing:
+        if partition.end > latest_end:
+            continue
+        if partitions_due.get(partition, now) > now:
+            continue
+        with app.new_session():
+            lock_history_partitions(app)
+            if (
+                partition in existing_history_partitions(app.session) and
+                _is_past_retention(app, partition, now)
+            ):
+                drop_history_partition(app.session, partition)
@@ -0,0 +1,59 @@
+"""Checkpointing of cron sweeps, so that interrupted sweeps can be resumed."""
+
+import uuid
+
+from sqlalchemy.dialects.postgresql import insert
+
+from routemaster.db import CronCheckpoint
+from routemaster.app import App
+from routemaster.state_machine.types import Sweep
+
+
+def start_sweep(app: App, job: str) -> Sweep:
+    """
+    Start a sweep of labels for a cron job.
+
+    If a previous run of the job did not finish its sweep, that sweep is
+    resumed instead.
+    """
+    table = CronCheckpoint.__table__
+    statement = insert(table).values(
+        job=job,
+        run_id=uuid.uuid4().hex,
+    )
+    # Updating the existing row, rather than doing nothing, returns it.
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.job],
+        set_={'job': statement.excluded.job},
+    ).returning(table.c.run_id, table.c.cursor)
+
+    with app.new_session():
+        run_id, cursor = app.session.execute(statement).fetchone()
+
+    return Sweep(job=job, run_id=run_id, cursor=cursor)
+
+
+def record_sweep_progress(app: App, sweep: Sweep, cursor: str) -> None:
+    """
+    Record that a sweep has processed all labels up to `cursor`.
+
+    If there is a current session, the progress is committed along with it.
+    """
+    with app.ensure_session():
+        app.session.query(CronCheckpoint).filter_by(
+            job=sweep.job,
+            run_id=sweep.run_id,
+        ).update({'cursor': cursor}, synchronize_session=False)
+
+
+def finish_sweep(app: App, sweep: Sweep) -> None:
+    """
+    Forget a completed sweep, so that the next starts afresh.
+
+    If there is a current session, this is committed along with it.
+    """
+    with app.ensure_session():
+        app.session.query(CronCheckpoint).filter_by(
+            job=sweep.job,
+            run_id=sweep.run_id,
+        ).delete(synchronize_session=False)
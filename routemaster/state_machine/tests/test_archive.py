@@ -0,0 +1,193 @@
+import datetime
+from unittest import mock
+
+import pytest
+
+from routemaster import state_machine
+from routemaster.db import Label, History, ArchivedLabel, ArchivedHistory
+from routemaster.state_machine import (
+    LabelRef,
+    DeletedLabel,
+    LabelAlreadyExists,
+    archive_labels,
+)
+
+
+@pytest.fixture()
+def archiving(app):
+    def _archiving(archive_labels_after=datetime.timedelta(0)):
+        test_machine = app.config.state_machines['test_machine']._replace(
+            archive_labels_after=archive_labels_after,
+        )
+        return mock.patch.dict(
+            app.config.state_machines,
+            {'test_machine': test_machine},
+        )
+    return _archiving
+
+
+@pytest.fixture()
+def finish_label(app):
+    def _finish(label):
+        with app.new_session():
+            app.session.add(History(
+                label_name=label.name,
+                label_state_machine=label.state_machine,
+                old_state='start',
+                new_state='end',
+            ))
+    return _finish
+
+
+@pytest.fixture()
+def archived_label(app, archiving, create_label, finish_label):
+    label = create_label('foo', 'test_machine', {'foo': 'bar'})
+    finish_label(label)
+    with archiving():
+        archive_labels(app, app.config.state_machines['test_machine'])
+    return label
+
+
+def _label_names(app, model):
+    with app.new_session():
+        return sorted(x for x, in app.session.query(model.name))
+
+
+def _history_names(app, model):
+    with app.new_session():
+        return [
+            (x.label_name, x.new_state)
+            for x in app.session.query(model).order_by(model.id)
+        ]
+
+
+def test_archives_terminal_and_deleted_labels(app, archiving, create_label, finish_label):
+    finish_label(create_label('foo', 'test_machine', {}))
+    bar = create_label('bar', 'test_machine', {})
+    create_label('baz', 'test_machine', {})
+    with app.new_session():
+        state_machine.delete_label(app, bar)
+
+    with archiving():
+        archived = archive_labels(app, app.config.state_machines['test_machine'])
+
+    assert archived == 2
+    assert _label_names(app, Label) == ['baz']
+    assert _label_names(app, ArchivedLabel) == ['bar', 'foo']
+    assert _history_names(app, History) == [('baz', 'start')]
+    assert _history_names(app, ArchivedHistory) == [
+        ('foo', 'start'),
+        ('foo', 'end'),
+        ('bar', 'start'),
+        ('bar', None),
+    ]
+
+
+@pytest.mark.parametrize('archive_labels_after', [
+    datetime.timedelta(days=1),
+    None,
+])
+def test_does_not_archive_labels_before_they_are_due(app, archiving, create_label, finish_label, archive_labels_after):
+    finish_label(create_label('foo', 'test_machine', {}))
+
+    with archiving(archive_labels_after):
+        archived = archive_labels(app, app.config.state_machines['test_machine'])
+
+    assert archived == 0
+    assert _label_names(app, Label) == ['foo']
+
+
+def test_archives_labels_in_batches(app, archiving, create_label, finish_label):
+    for name in ('a', 'b', 'c'):
+        finish_label(create_label(name, 'test_machine', {}))
+
+    with archiving(), mock.patch(
+        'routemaster.state_machine.archive.ARCHIVE_BATCH_SIZE',
+        2,
+    ), mock.patch.object(
+        app,
+        'new_session',
+        wraps=app.new_session,
+    ) as new_session:
+        archived = archive_labels(app, app.config.state_machines['test_machine'])
+
+    assert archived == 3
+    assert new_session.call_count == 2
+    assert _label_names(app, ArchivedLabel) == ['a', 'b', 'c']
+
+
+def test_archived_labels_can_be_read(app, archived_label):
+    with app.new_session():
+        assert state_machine.get_label_metadata(
+            app,
+            archived_label,
+        ) == {'foo': 'bar'}
+        assert state_machine.get_label_state(app, archived_label).name == 'end'
+        assert list(state_machine.list_labels(
+            app,
+            app.config.state_machines['test_machine'],
+        )) == [archived_label]
+
+
+def test_archived_labels_are_listed_in_order(app, archived_label, create_label):
+    for name in ('goo', 'bar'):
+        create_label(name, 'test_machine', {})
+
+    with app.new_session():
+        assert [
+            x.name
+            for x in state_machine.list_labels(
+                app,
+                app.config.state_machines['test_machine'],
+            )
+        ] == ['bar', 'foo', 'goo']
+
+
+def test_archived_deleted_labels_are_deleted(app, archiving, create_label):
+    label = create_label('foo', 'test_machine', {})
+    with app.new_session():
+        state_machine.delete_label(app, label)
+    with archiving():
+        archive_labels(app, app.config.state_machines['test_machine'])
+
+    with app.new_session():
+        with pytest.raises(DeletedLabel):
+            state_machine.get_label_metadata(app, label)
+        assert state_machine.get_label_state(app, label) is None
+        with pytest.raises(DeletedLabel):
+            state_machine.update_metadata_for_label(app, label, {})
+
+
+def test_updating_archived_label_restores_it(app, archived_label):
+    with app.new_session():
+        metadata = state_machine.update_metadata_for_label(
+            app,
+            archived_label,
+            {'baz': 'qux'},
+        )
+
+    assert metadata == {'foo': 'bar', 'baz': 'qux'}
+    assert _label_names(app, Label) == ['foo']
+    assert _label_names(app, ArchivedLabel) == []
+    assert _history_names(app, History) == [('foo', 'start'), ('foo', 'end')]
+
+
+def test_deleting_archived_label_restores_it(app, archived_label):
+    with app.new_session():
+        state_machine.delete_label(app, archived_label)
+
+    assert _label_names(app, ArchivedLabel) == []
+    assert _history_names(app, History) == [
+        ('foo', 'start'),
+        ('foo', 'end'),
+        ('foo', None),
+    ]
+
+
+def test_cannot_create_archived_label(app, archived_label):
+    with app.new_session(), pytest.raises(LabelAlreadyExists):
+        state_machine.create_label(
+            app,
+            LabelRef('foo', 'test_machine'),
+            {},
+        )
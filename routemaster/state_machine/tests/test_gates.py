@@ -1,8 +1,15 @@
+import datetime
+
 import pytest
+from sqlalchemy import column
 
 from routemaster import state_machine
+from routemaster.db import Label
+from routemaster.config import NoNextStates
+from routemaster.exit_conditions import ExitConditionProgram
 from routemaster.state_machine.gates import process_gate
 from routemaster.state_machine.types import LabelRef
+from routemaster.state_machine.utils import get_current_history
 from routemaster.state_machine.exceptions import DeletedLabel
 
 
@@ -51,3 +58,175 @@ def test_process_gate_not_eligible(app, mock_test_feed, assert_history):
     assert_history([
         (None, 'start'),
     ])
+
+
+def _next_evaluation(app, label):
+    return app.session.query(
+        Label.next_evaluation_key,
+        Label.next_evaluation_at,
+        Label.updated,
+    ).filter_by(
+        name=label.name,
+        state_machine=label.state_machine,
+    ).one()
+
+
+def _row_version(app, label):
+    # `xmin` changes whenever the row is written.
+    return app.session.query(column('xmin')).select_from(Label).filter_by(
+        name=label.name,
+        state_machine=label.state_machine,
+    ).scalar()
+
+
+def _gate_with_exit_condition(app, exit_condition):
+    return app.config.state_machines['test_machine'].states[0]._replace(
+        exit_condition=ExitConditionProgram(exit_condition),
+        next_states=NoNextStates(),
+    )
+
+
+def test_process_gate_records_next_evaluation(app, create_label):
+    label = create_label('foo', 'test_machine', {})
+    test_machine = app.config.state_machines['test_machine']
+    gate = _gate_with_exit_condition(
+        app,
+        'metadata.should_progress or 1h has passed since '
+        'history.entered_state',
+    )
+
+    with app.new_session():
+        # Processing on creation leaves this to sweeps
+        key, next_evaluation_at, created_updated = _next_evaluation(
+            app,
+            label,
+        )
+        assert key is None
+        assert next_evaluation_at is None
+
+        assert not process_gate(
+            app=app,
+            state=gate,
+            state_machine=test_machine,
+            label=label,
+        )
+
+    with app.new_session():
+        history_entry = get_current_history(app, label)
+        key, next_evaluation_at, updated = _next_evaluation(app, label)
+        version = _row_version(app, label)
+
+        # Recording the evaluation time does not count as an update
+        assert updated == created_updated
+
+        assert key == f'{history_entry.id}:{gate.exit_condition.fingerprint}'
+        assert next_evaluation_at == (
+            history_entry.created + datetime.timedelta(hours=1)
+        )
+
+        assert not process_gate(
+            app=app,
+            state=gate,
+            state_machine=test_machine,
+            label=label,
+        )
+
+    with app.new_session():
+        # An unchanged evaluation time is not written again
+        assert _next_evaluation(app, label) == (
+            key,
+            next_evaluation_at,
+            updated,
+        )
+        assert _row_version(app, label) == version
+
+
+def test_process_gate_records_no_time_for_untimed_conditions(app, create_label):
+    label = create_label('foo', 'test_machine', {})
+    test_machine = app.config.state_machines['test_machine']
+    gate = _gate_with_exit_condition(app, 'metadata.should_progress')
+
+    with app.new_session():
+        assert not process_gate(
+            app=app,
+            state=gate,
+            state_machine=test_machine,
+            label=label,
+        )
+
+    with app.new_session():
+        key, next_evaluation_at, _ = _next_evaluation(app, label)
+        assert key is not None
+        assert next_evaluation_at is None
+
+
+def test_process_gate_does_not_record_next_evaluation_for_feeds(app, create_label, mock_test_feed):
+    label = create_label('foo', 'test_machine', {})
+    test_machine = app.config.state_machines['test_machine']
+    gate = _gate_with_exit_condition(app, 'feeds.tests.should_progress')
+
+    with mock_test_feed(), app.new_session():
+        assert not process_gate(
+            app=app,
+            state=gate,
+            state_machine=test_machine,
+            label=label,
+        )
+
+    with app.new_session():
+        key, next_evaluation_at, _ = _next_evaluation(app, label)
+        assert key is None
+        assert next_evaluation_at is None
+
+
+def test_process_gate_can_skip_recording_next_evaluation(app, create_label):
+    label = create_label('foo', 'test_machine', {})
+    test_machine = app.config.state_machines['test_machine']
+    gate = _gate_with_exit_condition(app, 'metadata.should_progress')
+
+    with app.new_session():
+        assert not process_gate(
+            app=app,
+            state=gate,
+            state_machine=test_machine,
+            label=label,
+            record_next_evaluation=False,
+        )
+
+    with app.new_session():
+        key, next_evaluation_at, _ = _next_evaluation(app, label)
+        assert key is None
+        assert next_evaluation_at is None
+
+
+@pytest.mark.parametrize('triggers_processed', [True, False])
+def test_process_gate_exit_only_updates_label_if_needed(app, create_label, mock_test_feed, assert_history, triggers_processed):
+    label = create_label('foo', 'test_machine', {})
+    state_machine = app.config.state_machines['test_machine']
+    gate = state_machine.states[0]._replace(
+        exit_condition=ExitConditionProgram('true'),
+    )
+
+    with app.new_session():
+        app.session.query(Label).filter_by(name=label.name).update({
+            'metadata_triggers_processed': triggers_processed,
+        })
+
+    with app.new_session():
+        version = _row_version(app, label)
+
+    with mock_test_feed(), app.new_session():
+        assert process_gate(
+            app=app,
+            state=gate,
+            state_machine=state_machine,
+            label=label,
+        )
+        row = app.session.query(Label).filter_by(name=label.name).one()
+        assert row.metadata_triggers_processed is True
+        assert (_row_version(app, label) == version) is triggers_processed
+
+    assert_history([
+        (None, 'start'),
+        ('start', 'perform_action'),
+    ])
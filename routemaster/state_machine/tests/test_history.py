@@ -0,0 +1,199 @@
+import datetime
+from unittest import mock
+
+import pytest
+import dateutil.tz
+from freezegun import freeze_time
+
+from routemaster.db import (
+    History,
+    HistoryPartition,
+    history_default_bounds,
+    create_history_partition,
+    existing_history_partitions,
+)
+from routemaster.state_machine import maintain_history
+from routemaster.state_machine.history import (
+    HISTORY_MAINTENANCE_LOCK,
+    _past_retention_from,
+    lock_history_partitions,
+)
+
+UTC = dateutil.tz.tzutc()
+
+
+@pytest.fixture()
+def history_retention(app):
+    test_machine = app.config.state_machines['test_machine']
+    with mock.patch.dict(app.config.state_machines, {
+        'test_machine': test_machine._replace(
+            history_retention=datetime.timedelta(days=30),
+        ),
+    }):
+        yield
+
+
+@pytest.fixture()
+def january_history(app, create_label):
+    def _add(*labels):
+        with app.new_session():
+            app.session.query(History).delete()
+            create_history_partition(app.session, HistoryPartition(2018, 1))
+            create_history_partition(app.session, HistoryPartition(2018, 2))
+            for label in labels:
+                app.session.add(History(
+                    label_name=label.name,
+                    label_state_machine=label.state_machine,
+                    created=datetime.datetime(2018, 1, 5, tzinfo=UTC),
+                    old_state=None,
+                    new_state='start',
+                ))
+    return _add
+
+
+def _history_partitions(app):
+    with app.new_session():
+        return existing_history_partitions(app.session)
+
+
+def _checks_of(past_retention_from, partition):
+    return past_retention_from.call_args_list.count(
+        mock.call(mock.ANY, partition),
+    )
+
+
+@freeze_time('2018-03-15')
+def test_creates_upcoming_history_partitions(app):
+    maintain_history(app)
+    maintain_history(app)
+
+    assert _history_partitions(app) == [
+        HistoryPartition(2018, 3),
+        HistoryPartition(2018, 4),
+        HistoryPartition(2018, 5),
+    ]
+
+
+@freeze_time('2018-03-15')
+def test_bounds_default_history_partition_before_upcoming_partitions(app):
+    maintain_history(app)
+
+    with app.new_session():
+        assert history_default_bounds(app.session) == {
+            HistoryPartition(2018, 6): True,
+        }
+
+    with freeze_time('2018-04-15'):
+        maintain_history(app)
+
+    with app.new_session():
+        assert history_default_bounds(app.session) == {
+            HistoryPartition(2018, 7): True,
+        }
+
+
+@freeze_time('2018-03-15')
+def test_does_not_bound_default_history_partition_holding_later_entries(app, create_label):
+    with freeze_time('2018-07-01'):
+        create_label('foo', 'test_machine', {})
+
+    maintain_history(app)
+
+    with app.new_session():
+        assert history_default_bounds(app.session) == {}
+
+
+@freeze_time('2018-03-15')
+def test_drops_history_partitions_past_retention(app, create_label, january_history, history_retention):
+    january_history(create_label('foo', 'test_machine', {}))
+
+    maintain_history(app)
+
+    assert _history_partitions(app) == [
+        HistoryPartition(2018, 2),
+        HistoryPartition(2018, 3),
+        HistoryPartition(2018, 4),
+        HistoryPartition(2018, 5),
+    ]
+    with app.new_session():
+        assert app.session.query(History.label_name).all() == [('foo',)]
+
+
+@freeze_time('2018-03-15')
+def test_keeps_history_partitions_of_state_machines_without_retention(app, create_label, january_history, history_retention):
+    january_history(
+        create_label('foo', 'test_machine', {}),
+        create_label('bar', 'test_machine_2', {}),
+    )
+
+    maintain_history(app)
+
+    assert HistoryPartition(2018, 1) in _history_partitions(app)
+
+
+def test_rechecks_history_partitions_of_state_machines_without_retention_daily(app, create_label, january_history, history_retention):
+    january_history(create_label('bar', 'test_machine_2', {}))
+
+    with mock.patch(
+        'routemaster.state_machine.history._past_retention_from',
+        wraps=_past_retention_from,
+    ) as past_retention_from:
+        with freeze_time('2018-03-15 12:00'):
+            maintain_history(app)
+            maintain_history(app)
+        with freeze_time('2018-03-16 11:00'):
+            maintain_history(app)
+
+        assert past_retention_from.call_count == 1
+
+        with freeze_time('2018-03-16 12:00'):
+            maintain_history(app)
+
+        assert past_retention_from.call_count == 2
+
+
+def test_checks_history_partitions_again_once_past_retention(app, create_label, january_history, history_retention):
+    january_history(
+        create_label('foo', 'test_machine', {}),
+        create_label('bar', 'test_machine_2', {}),
+    )
+    test_machine_2 = app.config.state_machines['test_machine_2']
+
+    with mock.patch.dict(app.config.state_machines, {
+        'test_machine_2': test_machine_2._replace(
+            history_retention=datetime.timedelta(days=60),
+        ),
+    }), mock.patch(
+        'routemaster.state_machine.history._past_retention_from',
+        wraps=_past_retention_from,
+    ) as past_retention_from:
+        with freeze_time('2018-03-15'):
+            maintain_history(app)
+        with freeze_time('2018-04-01'):
+            maintain_history(app)
+
+        assert _checks_of(past_retention_from, HistoryPartition(2018, 1)) == 1
+        assert HistoryPartition(2018, 1) in _history_partitions(app)
+
+        with freeze_time('2018-04-02'):
+            maintain_history(app)
+
+        assert _checks_of(past_retention_from, HistoryPartition(2018, 1)) == 2
+        assert HistoryPartition(2018, 1) not in _history_partitions(app)
+
+
+def _try_lock(app, lock):
+    with app.new_session():
+        return app.session.execute(
+            f'SELECT {lock}({HISTORY_MAINTENANCE_LOCK})',
+        ).scalar()
+
+
+def test_shared_lock_of_history_partitions_excludes_maintenance(app, custom_app):
+    other_app = custom_app()
+
+    with app.new_session():
+        lock_history_partitions(app, shared=True)
+
+        assert _try_lock(other_app, 'pg_try_advisory_xact_lock_shared')
+        assert not _try_lock(other_app, 'pg_try_advisory_xact_lock')
@@ -1,11 +1,14 @@
+import json
+import datetime
 from unittest import mock
 
 import pytest
+import sqlalchemy
 from freezegun import freeze_time
 from requests.exceptions import RequestException
 
 from routemaster import state_machine
-from routemaster.db import Label
+from routemaster.db import Label, History, QueuedTransition
 from routemaster.state_machine import (
     LabelRef,
     DeletedLabel,
@@ -69,6 +72,29 @@ def test_state_machine_simple(app, mock_test_feed):
         assert state_machine.get_label_metadata(app, label) == {'foo': 'bar'}
 
 
+def test_update_metadata_for_label_merges_deeply(app, mock_test_feed):
+    label = LabelRef('foo', 'test_machine')
+
+    with mock_test_feed(), app.new_session():
+        state_machine.create_label(
+            app,
+            label,
+            {'foo': {'bar': 1, 'baz': 2}},
+        )
+        row = app.session.query(Label).get((label.name, label.state_machine))
+
+        new_metadata = state_machine.update_metadata_for_label(
+            app,
+            label,
+            {'foo': {'bar': 3}},
+        )
+
+        expected = {'foo': {'bar': 3, 'baz': 2}}
+        assert new_metadata == expected
+        # Rows already loaded in the session see the update
+        assert row.metadata == expected
+
+
 def test_update_metadata_for_label_raises_for_unknown_state_machine(app):
     label = LabelRef('foo', 'nonexistent_machine')
     with pytest.raises(UnknownStateMachine), app.new_session():
@@ -240,6 +266,270 @@ def test_metadata_update_gate_evaluations_dont_race_processing_subsequent_metada
     ])
 
 
+@pytest.mark.parametrize('update, evaluated', [
+    ({'should_progress': False}, False),
+    ({'should_progress': False, 'other': 1}, False),
+    ({'should_progress': None}, True),
+    ({'should_progress': True}, True),
+])
+def test_metadata_update_only_evaluates_gate_if_watched_value_changes(create_label, app, update, evaluated):
+    label = create_label('foo', 'test_machine_2', {'should_progress': False})
+
+    with mock.patch(
+        'routemaster.state_machine.api._process_transitions_for_metadata_update',
+    ) as mock_process, mock.patch.object(
+        app.logger,
+        'gate_evaluation_skipped',
+    ) as mock_skipped, app.new_session():
+        state_machine.update_metadata_for_label(app, label, update)
+
+    assert mock_process.called == evaluated
+    assert mock_skipped.called == (not evaluated)
+    assert metadata_triggers_processed(app, label) == (not evaluated)
+
+
+def test_metadata_update_keeps_pending_gate_evaluation(create_label, app):
+    label = create_label('foo', 'test_machine_2', {'should_progress': False})
+
+    with app.new_session():
+        app.session.query(Label).filter_by(
+            name=label.name,
+            state_machine=label.state_machine,
+        ).update({'metadata_triggers_processed': False})
+
+    with mock.patch(
+        'routemaster.state_machine.api._process_transitions_for_metadata_update',
+    ) as mock_process, app.new_session():
+        state_machine.update_metadata_for_label(
+            app,
+            label,
+            {'should_progress': False},
+        )
+
+    mock_process.assert_called_once()
+    assert metadata_triggers_processed(app, label) is False
+
+
+def test_metadata_update_defers_debounced_gate_evaluation(create_label, app, current_state):
+    label = create_label('foo', 'test_machine_2', {'should_progress': False})
+
+    test_machine_2 = app.config.state_machines['test_machine_2']
+    debounced = test_machine_2._replace(states=[
+        x._replace(debounce=datetime.timedelta(minutes=1))
+        for x in test_machine_2.states
+    ])
+
+    with mock.patch.dict(
+        app.config.state_machines,
+        {'test_machine_2': debounced},
+    ), app.new_session():
+        state_machine.update_metadata_for_label(
+            app,
+            label,
+            {'should_progress': True},
+        )
+
+    assert current_state(label) == 'gate_1'
+    assert metadata_triggers_processed(app, label) is False
+
+
+@pytest.fixture()
+def asynchronous(app):
+    test_machine = app.config.state_machines['test_machine']
+    with mock.patch.dict(
+        app.config.state_machines,
+        {'test_machine': test_machine._replace(asynchronous=True)},
+    ):
+        yield
+
+
+def queued_transitions(app):
+    with app.new_session():
+        return [
+            (x.label_name, x.gate)
+            for x in app.session.query(QueuedTransition).order_by(
+                QueuedTransition.id,
+            )
+        ]
+
+
+def test_create_label_asynchronously_queues_transitions(app, asynchronous, create_label, mock_webhook, mock_test_feed, current_state):
+    with mock_webhook() as webhook:
+        label = create_label('foo', 'test_machine', {'should_progress': True})
+
+    webhook.assert_not_called()
+    assert current_state(label) == 'start'
+    assert queued_transitions(app) == [('foo', None)]
+
+    with mock_webhook() as webhook, mock_test_feed():
+        assert state_machine.process_transition_queue(app) == 1
+
+    webhook.assert_called_once()
+    assert current_state(label) == 'end'
+    assert queued_transitions(app) == []
+
+
+def test_metadata_update_asynchronously_queues_gate_evaluation(app, asynchronous, create_label, mock_webhook, mock_test_feed, current_state):
+    label = create_label('foo', 'test_machine', {})
+    with mock_test_feed():
+        state_machine.process_transition_queue(app)
+
+    with mock_webhook() as webhook, app.new_session():
+        state_machine.update_metadata_for_label(
+            app,
+            label,
+            {'should_progress': True},
+        )
+
+    webhook.assert_not_called()
+    assert current_state(label) == 'start'
+    assert metadata_triggers_processed(app, label) is False
+    assert queued_transitions(app) == [('foo', 'start')]
+
+    with mock_webhook() as webhook, mock_test_feed():
+        assert state_machine.process_transition_queue(app) == 1
+
+    webhook.assert_called_once()
+    assert current_state(label) == 'end'
+    assert metadata_triggers_processed(app, label) is True
+
+
+def test_transition_queue_skips_entries_being_processed(app, asynchronous, create_label, custom_app, mock_test_feed):
+    create_label('foo', 'test_machine', {})
+    other_app = custom_app()
+
+    with other_app.new_session():
+        other_app.session.query(QueuedTransition).with_for_update().all()
+        assert state_machine.process_transition_queue(app) == 0
+
+    with mock_test_feed():
+        assert state_machine.process_transition_queue(app) == 1
+
+
+def test_transition_queue_removes_entries_which_fail(app, asynchronous, create_label, current_state):
+    label = create_label('foo', 'test_machine', {'should_progress': True})
+
+    with mock.patch(
+        'routemaster.state_machine.api.process_transitions',
+        side_effect=RuntimeError,
+    ):
+        assert state_machine.process_transition_queue(app) == 1
+
+    assert current_state(label) == 'start'
+    assert queued_transitions(app) == []
+
+
+def test_transition_queue_stops_when_terminating(app, asynchronous, create_label):
+    create_label('foo', 'test_machine', {})
+
+    assert state_machine.process_transition_queue(app, lambda: True) == 0
+    assert queued_transitions(app) == [('foo', None)]
+
+
+def test_failed_metadata_update_notifies_listeners(app, create_label):
+    label = create_label('foo', 'test_machine_2', {})
+
+    with app.listen(state_machine.METADATA_TRIGGERS_CHANNEL) as connection:
+        with mock.patch(
+            'routemaster.state_machine.api._process_transitions_for_metadata_update',
+            side_effect=RuntimeError,
+        ), app.new_session():
+            state_machine.update_metadata_for_label(
+                app,
+                label,
+                {'should_progress': True},
+            )
+
+        connection.poll()
+        payloads = [json.loads(x.payload) for x in connection.notifies]
+
+    assert payloads == [{
+        'state_machine': 'test_machine_2',
+        'label': 'foo',
+        'gate': 'gate_1',
+    }]
+
+
+def test_failed_queued_gate_evaluation_notifies_listeners(app, asynchronous, create_label, mock_test_feed):
+    label = create_label('foo', 'test_machine', {})
+    with mock_test_feed():
+        state_machine.process_transition_queue(app)
+    with app.new_session():
+        state_machine.update_metadata_for_label(
+            app,
+            label,
+            {'should_progress': True},
+        )
+
+    with app.listen(state_machine.METADATA_TRIGGERS_CHANNEL) as connection:
+        with mock.patch(
+            'routemaster.state_machine.api.process_gate',
+            side_effect=RuntimeError,
+        ):
+            assert state_machine.process_transition_queue(app) == 1
+
+        connection.poll()
+        payloads = [json.loads(x.payload) for x in connection.notifies]
+
+    assert payloads == [{
+        'state_machine': 'test_machine',
+        'label': 'foo',
+        'gate': 'start',
+    }]
+    assert metadata_triggers_processed(app, label) is False
+
+
+def test_metadata_triggers_notification_evaluates_gate(app, create_label, current_state):
+    label = create_label('foo', 'test_machine_2', {})
+
+    with mock.patch(
+        'routemaster.state_machine.api._process_transitions_for_metadata_update',
+        side_effect=RuntimeError,
+    ), app.new_session():
+        state_machine.update_metadata_for_label(
+            app,
+            label,
+            {'should_progress': True},
+        )
+
+    state_machine.process_metadata_triggers_notification(app, json.dumps({
+        'state_machine': 'test_machine_2',
+        'label': 'foo',
+        'gate': 'gate_1',
+    }))
+
+    assert current_state(label) == 'gate_2'
+    assert metadata_triggers_processed(app, label) is True
+
+
+def test_metadata_triggers_notification_ignores_processed_labels(app, create_label):
+    create_label('foo', 'test_machine_2', {})
+
+    with mock.patch(
+        'routemaster.state_machine.api.process_gate',
+    ) as mock_process_gate:
+        state_machine.process_metadata_triggers_notification(app, json.dumps({
+            'state_machine': 'test_machine_2',
+            'label': 'foo',
+            'gate': 'gate_1',
+        }))
+
+    mock_process_gate.assert_not_called()
+
+
+@pytest.mark.parametrize('payload', [
+    '',
+    '[]',
+    '{"state_machine": "unknown", "label": "foo", "gate": "gate_1"}',
+    '{"state_machine": "test_machine_2", "label": "foo", "gate": "unknown"}',
+])
+def test_metadata_triggers_notification_ignores_invalid_payloads(app, payload):
+    with mock.patch.object(app.logger, 'warning') as mock_warning:
+        state_machine.process_metadata_triggers_notification(app, payload)
+
+    mock_warning.assert_called_once()
+
+
 def test_maintains_updated_field_on_label(app, mock_test_feed):
     label = LabelRef('foo', 'test_machine')
 
@@ -371,6 +661,58 @@ def test_delete_label_only_deletes_target_label(app, assert_history, mock_test_f
         )
 
 
+def test_delete_label_does_not_load_history(app, mock_test_feed):
+    label_foo = LabelRef('foo', 'test_machine')
+
+    with mock_test_feed(), app.new_session():
+        state_machine.create_label(app, label_foo, {})
+
+    with app.new_session():
+        state_machine.delete_label(app, label_foo)
+        row = app.session.query(Label).one()
+        assert 'history' in sqlalchemy.inspect(row).unloaded
+
+    with app.new_session():
+        assert state_machine.get_label_state(app, label_foo) is None
+
+
+def test_delete_labels(app, create_label, create_deleted_label, mock_webhook):
+    test_machine = app.config.state_machines['test_machine']
+    create_label('foo', 'test_machine', {'bar': 'baz'})
+    with mock_webhook():
+        create_label('bar', 'test_machine', {'should_progress': True})
+    create_label('quox', 'test_machine', {})
+    create_deleted_label('spam', 'test_machine')
+
+    with app.new_session():
+        state_machine.delete_labels(
+            app,
+            test_machine,
+            ['foo', 'bar', 'spam', 'unknown'],
+        )
+
+    with app.new_session():
+        assert {
+            x.name: (x.deleted, x.metadata)
+            for x in app.session.query(Label)
+        } == {
+            'foo': (True, {}),
+            'bar': (True, {}),
+            'quox': (False, {}),
+            'spam': (True, {}),
+        }
+        assert [
+            (x.label_name, x.old_state, x.new_state)
+            for x in app.session.query(History).filter_by(
+                new_state=None,
+            ).order_by(History.id)
+        ] == [
+            ('spam', 'start', None),
+            ('bar', 'end', None),
+            ('foo', 'start', None),
+        ]
+
+
 def test_handles_label_state_change_race_condition(app, create_deleted_label):
     test_machine = app.config.state_machines['test_machine']
     state = test_machine.states[1]
@@ -397,3 +739,99 @@ def test_handles_label_state_change_race_condition(app, create_deleted_label):
 
     # Assert no attempt to process the label
     mock_processor.assert_not_called()
+
+
+def test_process_cron_commits_labels_in_batches(app, create_label):
+    test_machine = app.config.state_machines['test_machine']._replace(
+        cron_labels_per_commit=3,
+    )
+    state = test_machine.states[0]
+    labels = [create_label(x, 'test_machine', {}).name for x in 'abcdefg']
+
+    processed = []
+
+    def processor(*, label, **kwargs):
+        processed.append(label.name)
+        return False
+
+    with mock.patch.object(
+        app,
+        'new_session',
+        wraps=app.new_session,
+    ) as new_session:
+        state_machine.process_cron(
+            processor,
+            mock.Mock(return_value=labels),
+            app,
+            test_machine,
+            state,
+        )
+
+    assert processed == labels
+    assert new_session.call_count == 3
+
+
+def test_process_cron_chunks_commits_batches_within_chunks(app, create_label):
+    test_machine = app.config.state_machines['test_machine']._replace(
+        cron_labels_per_commit=3,
+    )
+    state = test_machine.states[0]
+    labels = [create_label(x, 'test_machine', {}).name for x in 'abcde']
+
+    processed = []
+
+    def processor(*, label, **kwargs):
+        processed.append(label.name)
+        return False
+
+    with mock.patch.object(
+        app,
+        'new_session',
+        wraps=app.new_session,
+    ) as new_session:
+        state_machine.process_cron_chunks(
+            processor,
+            mock.Mock(return_value=[labels[:4], labels[4:]]),
+            app,
+            test_machine,
+            state,
+        )
+
+    assert processed == labels
+    assert new_session.call_count == 3
+
+
+def test_process_cron_failures_do_not_affect_other_labels_in_batch(app, create_label):
+    test_machine = app.config.state_machines['test_machine']._replace(
+        cron_labels_per_commit=3,
+    )
+    state = test_machine.states[0]
+    labels = [create_label(x, 'test_machine', {}).name for x in 'abc']
+
+    def processor(*, app, label, **kwargs):
+        app.session.query(Label).filter_by(
+            name=label.name,
+            state_machine=label.state_machine,
+        ).update({'metadata': {'processed': True}})
+
+        if label.name == 'b':
+            raise ValueError()
+
+        return False
+
+    state_machine.process_cron(
+        processor,
+        mock.Mock(return_value=labels),
+        app,
+        test_machine,
+        state,
+    )
+
+    with app.new_session():
+        assert {
+            x.name: x.metadata for x in app.session.query(Label)
+        } == {
+            'a': {'processed': True},
+            'b': {},
+            'c': {'processed': True},
+        }
@@ -7,9 +7,11 @@ import freezegun
 from requests.exceptions import RequestException
 
 from routemaster import state_machine
+from routemaster.db import Label, History
 from routemaster.feeds import Feed
 from routemaster.config import (
     Gate,
+    FeedConfig,
     NoNextStates,
     StateMachine,
     ConstantNextState,
@@ -17,7 +19,7 @@ from routemaster.config import (
 from routemaster.webhooks import WebhookResult
 from routemaster.state_machine import utils
 from routemaster.exit_conditions import ExitConditionProgram
-from routemaster.state_machine.types import LabelRef
+from routemaster.state_machine.types import LabelRef, SpreadSlot
 from routemaster.state_machine.exceptions import UnknownStateMachine
 
 
@@ -243,11 +245,35 @@ def test_labels_needing_metadata_update_retry_in_gate(app, mock_test_feed, creat
 
     # But only label_unprocessed should be pending a metadata update
     with app.new_session():
-        assert utils.labels_needing_metadata_update_retry_in_gate(
+        assert list(utils.labels_needing_metadata_update_retry_in_gate(
             app,
             test_machine,
             gate,
-        ) == [label_unprocessed.name]
+        )) == [label_unprocessed.name]
+
+
+@pytest.mark.parametrize('debounce, pending', [
+    (datetime.timedelta(0), True),
+    (datetime.timedelta(hours=1), False),
+])
+def test_labels_needing_metadata_update_retry_in_gate_respects_debounce(app, create_label, debounce, pending):
+    label = create_label('foo', 'test_machine_2', {})
+
+    with app.new_session():
+        app.session.query(Label).filter_by(
+            name=label.name,
+            state_machine=label.state_machine,
+        ).update({'metadata_triggers_processed': False})
+
+    test_machine_2 = app.config.state_machines['test_machine_2']
+    gate = test_machine_2.states[0]._replace(debounce=debounce)
+
+    with app.new_session():
+        assert list(utils.labels_needing_metadata_update_retry_in_gate(
+            app,
+            test_machine_2,
+            gate,
+        )) == ([label.name] if pending else [])
 
 
 def test_labels_in_state(app, mock_test_feed, mock_webhook, create_label, create_deleted_label, current_state):
@@ -270,11 +296,334 @@ def test_labels_in_state(app, mock_test_feed, mock_webhook, create_label, create
 
     # But only label_unprocessed should be pending a metadata update
     with app.new_session():
-        assert utils.labels_in_state(
+        assert list(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+        )) == [label_in_state.name]
+
+
+def test_labels_in_state_oldest_first_after_cursor(app, create_label):
+    for name in ('c', 'a', 'd', 'b'):
+        create_label(name, 'test_machine', {})
+
+    test_machine = app.config.state_machines['test_machine']
+    gate = test_machine.states[0]
+
+    with app.new_session():
+        assert list(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+        )) == ['c', 'a', 'd', 'b']
+        assert list(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+            after='a',
+        )) == ['d', 'b']
+
+
+@freezegun.freeze_time('2018-01-07 00:00:01')
+def test_labels_in_state_entering_together_in_name_order(app, create_label):
+    for name in ('c', 'a', 'd', 'b'):
+        create_label(name, 'test_machine', {})
+
+    test_machine = app.config.state_machines['test_machine']
+    gate = test_machine.states[0]
+
+    with app.new_session():
+        assert list(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+            after='b',
+        )) == ['c', 'd']
+
+
+def test_labels_in_state_from_start_for_unknown_cursor(app, create_label):
+    create_label('a', 'test_machine', {})
+
+    test_machine = app.config.state_machines['test_machine']
+    gate = test_machine.states[0]
+
+    with app.new_session():
+        assert list(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+            after='unknown',
+        )) == ['a']
+
+
+def test_labels_in_state_counts_remaining_labels(app, create_label):
+    for name in ('a', 'b', 'c', 'd'):
+        create_label(name, 'test_machine', {})
+
+    test_machine = app.config.state_machines['test_machine']
+    gate = test_machine.states[0]
+
+    with app.new_session():
+        labels = utils.labels_in_state(app, test_machine, gate)
+        assert labels.count_remaining() == 4
+        assert next(labels) == 'a'
+        assert labels.count_remaining() == 3
+
+        # Labels which could not exit the gate are counted, but not read.
+        labels = utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+            only_exitable=True,
+            after='b',
+        )
+        assert labels.count_remaining() == 2
+        assert list(labels) == []
+
+
+def test_labels_in_state_in_spread_slot(app, create_label):
+    names = [f'label_{x}' for x in range(20)]
+    for name in names:
+        create_label(name, 'test_machine', {})
+
+    test_machine = app.config.state_machines['test_machine']
+    gate = test_machine.states[0]
+
+    with app.new_session():
+        for index in range(3):
+            assert list(utils.labels_in_state(
+                app,
+                test_machine,
+                gate,
+                slot=SpreadSlot(index, 3),
+            )) == [x for x in names if utils.spread_slot(x, 3) == index]
+
+
+def test_labels_in_state_only_exitable(app, mock_test_feed, mock_webhook, create_label, set_metadata, current_state):
+    label_blocked = create_label('label_blocked', 'test_machine', {})
+    label_exitable = create_label('label_exitable', 'test_machine', {})
+    set_metadata(label_exitable, {'should_progress': True})
+
+    test_machine = app.config.state_machines['test_machine']
+    gate = test_machine.states[0]
+
+    assert current_state(label_blocked) == 'start'
+    assert current_state(label_exitable) == 'start'
+
+    with app.new_session():
+        assert sorted(utils.labels_in_state(
             app,
             test_machine,
             gate,
-        ) == [label_in_state.name]
+        )) == [label_blocked.name, label_exitable.name]
+
+        assert list(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+            only_exitable=True,
+        )) == [label_exitable.name]
+
+
+def test_labels_in_state_only_exitable_evaluates_in_chunks(app, mock_test_feed, create_label):
+    with mock_test_feed():
+        for index in range(5):
+            create_label(str(index), 'test_machine', {
+                'value': index % 2,
+                'expected': 1,
+            })
+
+    test_machine = app.config.state_machines['test_machine']
+    # Comparing two looked-up values cannot be translated into SQL
+    exit_condition = ExitConditionProgram('metadata.value = metadata.expected')
+    gate = test_machine.states[0]._replace(exit_condition=exit_condition)
+
+    with app.new_session(), mock.patch(
+        'routemaster.state_machine.utils.EXIT_EVALUATION_CHUNK_SIZE',
+        2,
+    ):
+        assert sorted(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+            only_exitable=True,
+        )) == ['1', '3']
+
+
+def test_labels_in_state_only_exitable_skips_until_next_evaluation(app, create_label, set_metadata):
+    label = create_label('foo', 'test_machine', {})
+    test_machine = app.config.state_machines['test_machine']
+    gate = test_machine.states[0]._replace(
+        exit_condition=ExitConditionProgram('true'),
+    )
+    other_gate = test_machine.states[0]._replace(
+        exit_condition=ExitConditionProgram('true or false'),
+    )
+    now = datetime.datetime.now(dateutil.tz.tzutc())
+
+    def record_next_evaluation(gate, next_evaluation_at):
+        with app.new_session():
+            history_entry = utils.get_current_history(app, label)
+            app.session.query(Label).filter_by(name=label.name).update({
+                'next_evaluation_key': (
+                    f'{history_entry.id}:{gate.exit_condition.fingerprint}'
+                ),
+                'next_evaluation_at': next_evaluation_at,
+            })
+
+    def exitable_labels():
+        with app.new_session():
+            return list(utils.labels_in_state(
+                app,
+                test_machine,
+                gate,
+                only_exitable=True,
+            ))
+
+    assert exitable_labels() == ['foo']
+
+    record_next_evaluation(gate, now + datetime.timedelta(hours=1))
+    assert exitable_labels() == []
+
+    record_next_evaluation(gate, None)
+    assert exitable_labels() == []
+
+    record_next_evaluation(gate, now - datetime.timedelta(hours=1))
+    assert exitable_labels() == ['foo']
+
+    # Times recorded under a different exit condition are ignored
+    record_next_evaluation(other_gate, now + datetime.timedelta(hours=1))
+    assert exitable_labels() == ['foo']
+
+    # As are those recorded before a change to the label's metadata
+    record_next_evaluation(gate, now + datetime.timedelta(hours=1))
+    set_metadata(label, {'foo': 'bar'})
+    assert exitable_labels() == ['foo']
+
+
+def test_labels_in_state_only_exitable_with_feeds(custom_app):
+    gate = Gate(
+        name='start',
+        triggers=[],
+        next_states=NoNextStates(),
+        exit_condition=ExitConditionProgram('feeds.tests.should_progress'),
+    )
+    app = custom_app(state_machines={
+        'test_machine': StateMachine(
+            name='test_machine',
+            states=[gate],
+            feeds=[FeedConfig(name='tests', url='http://localhost/tests')],
+            webhooks=[],
+        ),
+    })
+    test_machine = app.config.state_machines['test_machine']
+
+    with app.new_session():
+        state_machine.create_label(app, LabelRef('foo', 'test_machine'), {})
+
+    # Feeds cannot be evaluated in bulk, so all labels are candidates
+    with app.new_session():
+        assert list(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+            only_exitable=True,
+        )) == ['foo']
+
+
+SQL_PARITY_METADATA = [
+    {},
+    {'a': None},
+    {'a': True},
+    {'a': False},
+    {'a': 0},
+    {'a': 1},
+    {'a': 1.0},
+    {'a': 2.5},
+    {'a': 'x'},
+    {'a': ''},
+    {'a': []},
+    {'a': [1]},
+    {'a': {}},
+    {'a': {'b': 1}},
+    {'a': {'b': None}},
+]
+
+
+@pytest.mark.parametrize('program', [
+    'metadata.a',
+    'not metadata.a',
+    'metadata',
+    'metadata.a = 1',
+    'metadata.a = true',
+    'metadata.a = false',
+    'metadata.a = null',
+    'metadata.a /= 0',
+    'metadata.a > 1',
+    'metadata.a <= 1.5',
+    '(metadata.a = 1) = true',
+    '(metadata.a = 1) < 1',
+    'metadata.a is defined',
+    'metadata.a is not defined',
+    'metadata.a.b = 1',
+    'metadata.a.b is defined',
+    'metadata.a = 1 or metadata.a = 2.5',
+    'metadata.a and not metadata.a = 1',
+    '1h has passed since history.entered_state',
+    '1h has not passed since history.entered_state',
+    'history.previous_state = null',
+    'history.previous_state',
+    'history.entered_state is defined',
+    'history.other is defined',
+    'unknown.variable = null',
+])
+def test_labels_in_state_only_exitable_sql_parity(program, app, mock_test_feed, create_label):
+    with mock_test_feed():
+        for index, metadata in enumerate(SQL_PARITY_METADATA):
+            create_label(str(index), 'test_machine', metadata)
+
+    test_machine = app.config.state_machines['test_machine']
+    exit_condition = ExitConditionProgram(program)
+    gate = test_machine.states[0]._replace(
+        exit_condition=exit_condition,
+        next_states=NoNextStates(),
+    )
+
+    expected = set()
+    failing = set()
+    with app.new_session():
+        for index, metadata in enumerate(SQL_PARITY_METADATA):
+            label = LabelRef(str(index), 'test_machine')
+            context = utils.context_for_label(
+                label,
+                metadata,
+                test_machine,
+                gate,
+                utils.get_current_history(app, label),
+                app.logger,
+            )
+            try:
+                if exit_condition.run(context):
+                    expected.add(label.name)
+            except Exception:  # noqa: B902
+                failing.add(label.name)
+
+        assert exit_condition.sql_filter(
+            metadata=Label.metadata,
+            entered_state=History.created,
+            previous_state=History.old_state,
+            now=datetime.datetime.now(dateutil.tz.tzutc()),
+        ) is not None
+
+        exitable = set(utils.labels_in_state(
+            app,
+            test_machine,
+            gate,
+            only_exitable=True,
+        ))
+
+    # Labels which fail evaluation may or may not be matched
+    assert expected <= exitable <= expected | failing
 
 
 def test_labels_in_state_with_metadata(app, mock_test_feed, mock_webhook, create_label, create_deleted_label, current_state):
@@ -301,13 +650,13 @@ def test_labels_in_state_with_metadata(app, mock_test_feed, mock_webhook, create
 
     # But only label_unprocessed should be pending a metadata update
     with app.new_session():
-        assert utils.labels_in_state_with_metadata(
+        assert list(utils.labels_in_state_with_metadata(
             app,
             test_machine,
             gate,
             path=['foo'],
             values=['bar', 'quox'],
-        ) == [label_matching_metadata.name]
+        )) == [label_matching_metadata.name]
 
 
 def test_labels_in_state_with_metadata_nested(app, mock_test_feed, mock_webhook, create_label, create_deleted_label, current_state):
@@ -338,10 +687,10 @@ def test_labels_in_state_with_metadata_nested(app, mock_test_feed, mock_webhook,
 
     # But only label_unprocessed should be pending a metadata update
     with app.new_session():
-        assert utils.labels_in_state_with_metadata(
+        assert list(utils.labels_in_state_with_metadata(
             app,
             test_machine,
             gate,
             path=['foo', 'bar'],
             values=['quox'],
-        ) == [label_matching_metadata.name]
+        )) == [label_matching_metadata.name]
@@ -0,0 +1,69 @@
+from routemaster.db import CronCheckpoint
+from routemaster.state_machine import (
+    start_sweep,
+    finish_sweep,
+    record_sweep_progress,
+)
+
+
+def _checkpoints(app):
+    with app.new_session():
+        return [
+            (x.job, x.run_id, x.cursor)
+            for x in app.session.query(CronCheckpoint)
+        ]
+
+
+def test_starts_new_sweep(app):
+    sweep = start_sweep(app, 'job')
+
+    assert sweep.job == 'job'
+    assert sweep.cursor is None
+    assert _checkpoints(app) == [('job', sweep.run_id, None)]
+
+
+def test_resumes_unfinished_sweep(app):
+    sweep = start_sweep(app, 'job')
+    record_sweep_progress(app, sweep, 'label')
+
+    assert start_sweep(app, 'job') == sweep._replace(cursor='label')
+
+
+def test_starts_afresh_after_finishing_sweep(app):
+    sweep = start_sweep(app, 'job')
+    record_sweep_progress(app, sweep, 'label')
+    finish_sweep(app, sweep)
+
+    assert _checkpoints(app) == []
+
+    new_sweep = start_sweep(app, 'job')
+    assert new_sweep.cursor is None
+    assert new_sweep.run_id != sweep.run_id
+
+
+def test_sweeps_are_per_job(app):
+    sweep = start_sweep(app, 'job')
+    record_sweep_progress(app, sweep, 'label')
+
+    assert start_sweep(app, 'other_job').cursor is None
+
+
+def test_ignores_progress_of_superseded_sweep(app):
+    stale_sweep = start_sweep(app, 'job')
+    finish_sweep(app, stale_sweep)
+    sweep = start_sweep(app, 'job')
+
+    record_sweep_progress(app, stale_sweep, 'label')
+    finish_sweep(app, stale_sweep)
+
+    assert _checkpoints(app) == [('job', sweep.run_id, None)]
+
+
+def test_progress_is_committed_with_current_session(app):
+    sweep = start_sweep(app, 'job')
+
+    with app.new_session():
+        record_sweep_progress(app, sweep, 'label')
+        app.set_rollback()
+
+    assert _checkpoints(app) == [('job', sweep.run_id, None)]
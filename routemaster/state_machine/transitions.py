@@ -54,6 +54,8 @@ def process_transitions(app: App, label: LabelRef) -> None:
                     state=current_state,
                     state_machine=state_machine,
                     label=label,
+                    # Left to sweeps of the gate, to avoid an extra write.
+                    record_next_evaluation=False,
                 )
 
             else:
@@ -1,6 +1,6 @@
 """Shared types for state machine execution."""
 
-from typing import Any, Dict, NamedTuple
+from typing import Any, Dict, Optional, NamedTuple
 
 Metadata = Dict[str, Any]
 
@@ -9,3 +9,16 @@ class LabelRef(NamedTuple):
     """API representation of a label for the state machine."""
     name: str
     state_machine: str
+
+
+class Sweep(NamedTuple):
+    """A cron job's sweep of labels, and the last label it processed."""
+    job: str
+    run_id: str
+    cursor: Optional[str]
+
+
+class SpreadSlot(NamedTuple):
+    """One of the slots across which a spread trigger evaluates labels."""
+    index: int
+    count: int
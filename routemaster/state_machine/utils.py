@@ -1,20 +1,35 @@
 """Utilities for state machine execution."""
 
+import hashlib
 import datetime
 import functools
+import itertools
 import contextlib
-from typing import Any, Dict, List, Tuple, Optional, Sequence, Collection
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Callable,
+    Iterator,
+    Optional,
+    Sequence,
+    Collection,
+    NamedTuple,
+)
 
 import dateutil.tz
-from sqlalchemy import func
+from sqlalchemy import BigInteger, or_, cast, func, tuple_, literal
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.dialects.postgresql import BIT
 
-from routemaster.db import Label, History
+from routemaster.db import Label, History, metadata_text
 from routemaster.app import App
 from routemaster.feeds import feeds_for_state_machine
 from routemaster.config import Gate, State, StateMachine, ContextNextStates
 from routemaster.context import Context
 from routemaster.logging import BaseLogger
-from routemaster.state_machine.types import LabelRef, Metadata
+from routemaster.state_machine.types import LabelRef, Metadata, SpreadSlot
 from routemaster.state_machine.exceptions import (
     UnknownLabel,
     UnknownStateMachine,
@@ -114,6 +129,17 @@ def needs_gate_evaluation_for_metadata_change(
     return False, current_state
 
 
+def next_evaluation_key(history_id: Any, gate: Gate) -> Any:
+    """
+    Key identifying when a label's next evaluation time was recorded.
+
+    Recorded times only apply while the label remains in the same history
+    entry, and its gate's exit condition is unchanged. `history_id` may be
+    either a value or a SQL expression.
+    """
+    return func.concat(history_id, f':{gate.exit_condition.fingerprint}')
+
+
 def lock_label(app: App, label: LabelRef) -> Label:
     """Lock a label in the current transaction."""
     row = app.session.query(Label).filter_by(
@@ -127,13 +153,96 @@ def lock_label(app: App, label: LabelRef) -> Label:
     return row
 
 
+def expire_label(app: App, label: LabelRef) -> None:
+    """Expire a label loaded in the session, once updated outside the ORM."""
+    row = app.session.identity_map.get(
+        identity_key(Label, (label.name, label.state_machine)),
+    )
+    if row is not None:
+        app.session.expire(row)
+
+
+class LabelStream(Iterator[str]):
+    """
+    Label names streamed from the database, as by `labels_in_state`.
+
+    Those not yet read can be counted without reading them, by the database.
+    """
+
+    def __init__(
+        self,
+        names: Iterator[str],
+        count_after: Callable[[Optional[str]], int],
+        *,
+        after: Optional[str] = None,
+    ) -> None:
+        self._names = names
+        self._count_after = count_after
+        self._last = after
+
+    def __next__(self) -> str:
+        """The next label name."""
+        self._last = next(self._names)
+        return self._last
+
+    def count_remaining(self) -> int:
+        """
+        Count the labels following those read so far.
+
+        Labels are counted whether or not they could exit a gate, so where
+        only exitable labels are streamed this may be more than are left.
+        """
+        return self._count_after(self._last)
+
+
 def labels_in_state(
     app: App,
     state_machine: StateMachine,
     state: State,
-) -> List[str]:
-    """Util to get all the labels in an action state that need retrying."""
-    return _labels_in_state(app, state_machine, state, True)
+    *,
+    only_exitable: bool = False,
+    after: Optional[str] = None,
+    slot: Optional[SpreadSlot] = None,
+) -> LabelStream:
+    """
+    Util to get all the labels in an action state that need retrying.
+
+    If `only_exitable` is set and the state is a gate, labels are filtered to
+    those which could currently exit the gate. Labels are ordered by when they
+    entered the state, oldest first, and if `after` is given start from the
+    label following that one. If a spread trigger's `slot` is given, only the
+    labels in that slot are included.
+
+    The query is run immediately, but its results are streamed as they are
+    iterated over, so must be read before the session ends.
+    """
+    return _labels_in_state(
+        app,
+        state_machine,
+        state,
+        True if slot is None else _in_spread_slot(Label.name, slot),
+        only_exitable=only_exitable,
+        after=after,
+    )
+
+
+# The number of leading hex digits of a label name's MD5 hash which determine
+# its spread slot.
+_SPREAD_SLOT_HASH_DIGITS = 8
+
+
+def spread_slot(label: str, slots: int) -> int:
+    """The slot of a spread trigger in which a label is always evaluated."""
+    digest = hashlib.md5(label.encode('utf-8')).hexdigest()
+    return int(digest[:_SPREAD_SLOT_HASH_DIGITS], 16) % slots
+
+
+def _in_spread_slot(name: Any, slot: SpreadSlot) -> Any:
+    # The same as `spread_slot`, so that labels can be filtered to a slot
+    # before they are evaluated.
+    digest = func.substr(func.md5(name), 1, _SPREAD_SLOT_HASH_DIGITS)
+    bits = cast(literal('x') + digest, BIT(_SPREAD_SLOT_HASH_DIGITS * 4))
+    return cast(bits, BigInteger) % slot.count == slot.index
 
 
 def labels_in_state_with_metadata(
@@ -142,25 +251,25 @@ def labels_in_state_with_metadata(
     state: State,
     path: Sequence[str],
     values: Collection[str],
-) -> List[str]:
+    *,
+    only_exitable: bool = False,
+) -> LabelStream:
     """
     Util to get all the labels in a given state with some metadata value.
 
     The metadata lookup happens at the given path, allowing for any of the
-    possible values given.
+    possible values given, and may use the path's `MetadataIndex`.
+    `only_exitable` and streaming behave as for `labels_in_state`.
     """
     if not values:
         raise ValueError("Must specify at least one possible value")
 
-    metadata_lookup = Label.metadata
-    for part in path:
-        metadata_lookup = metadata_lookup[part]  # type: ignore
-
     return _labels_in_state(
         app,
         state_machine,
         state,
-        metadata_lookup.astext.in_(values),  # type: ignore
+        metadata_text(path).in_(values),
+        only_exitable=only_exitable,
     )
 
 
@@ -168,19 +277,36 @@ def labels_needing_metadata_update_retry_in_gate(
     app: App,
     state_machine: StateMachine,
     state: State,
-) -> List[str]:
-    """Util to get all the labels in a gate state that need retrying."""
+    *,
+    only_exitable: bool = False,
+    after: Optional[str] = None,
+) -> LabelStream:
+    """
+    Util to get all the labels in a gate state that need retrying.
+
+    For gates with a debounce, labels updated within the debounce period are
+    excluded. `only_exitable`, `after` and streaming behave as for
+    `labels_in_state`.
+    """
     if not isinstance(state, Gate):  # pragma: no branch
         raise ValueError(  # pragma: no cover
             f"labels_needing_metadata_update_retry_in_gate called with "
             f"{state.name} which is not a Gate",
         )
 
+    filter_ = ~Label.metadata_triggers_processed
+    if state.debounce is not None:
+        # Wait until the label's metadata has settled. `updated` is set by the
+        # database, so is compared against its clock.
+        filter_ &= Label.updated <= func.now() - state.debounce
+
     return _labels_in_state(
         app,
         state_machine,
         state,
-        ~Label.metadata_triggers_processed,
+        filter_,
+        only_exitable=only_exitable,
+        after=after,
     )
 
 
@@ -189,12 +315,18 @@ def _labels_in_state(
     state_machine: StateMachine,
     state: State,
     filter_: Any,
-) -> List[str]:
+    *,
+    only_exitable: bool = False,
+    after: Optional[str] = None,
+) -> LabelStream:
     """Util to get all the labels in an action state that need retrying."""
 
     states_by_rank = app.session.query(
+        History.id,
         History.label_name,
         History.new_state,
+        History.old_state,
+        History.created,
         func.row_number().over(
             # Our model type stubs define the `id` attribute as `int`, yet
             # sqlalchemy actually allows the attribute to be used for ordering
@@ -214,9 +346,194 @@ def _labels_in_state(
         states_by_rank.c.new_state == state.name,
     ).join(Label).filter(
         filter_,
+    ).order_by(
+        states_by_rank.c.created,
+        states_by_rank.c.label_name,
     )
 
-    return [x for x, in ranked_transitions]
+    return LabelStream(
+        _names_in_state(
+            state,
+            states_by_rank,
+            _after_label(
+                ranked_transitions,
+                states_by_rank,
+                state_machine,
+                state,
+                after,
+            ),
+            only_exitable=only_exitable,
+        ),
+        functools.partial(
+            _count_after_label,
+            ranked_transitions,
+            states_by_rank,
+            state_machine,
+            state,
+        ),
+        after=after,
+    )
+
+
+def _after_label(
+    ranked_transitions: Any,
+    states_by_rank: Any,
+    state_machine: StateMachine,
+    state: State,
+    after: Optional[str],
+) -> Any:
+    if after is None:
+        return ranked_transitions
+
+    # Resume from after when the `after` label entered this state. If it has
+    # no record of doing so, there is nowhere to resume from.
+    after_entered = ranked_transitions.session.query(
+        History.created,
+    ).filter_by(
+        label_name=after,
+        label_state_machine=state_machine.name,
+        new_state=state.name,
+    ).order_by(
+        History.id.desc(),  # type: ignore
+    ).limit(1).scalar()
+
+    if after_entered is None:
+        return ranked_transitions
+
+    return ranked_transitions.filter(tuple_(
+        states_by_rank.c.created,
+        states_by_rank.c.label_name,
+    ) > tuple_(after_entered, after))
+
+
+def _count_after_label(
+    ranked_transitions: Any,
+    states_by_rank: Any,
+    state_machine: StateMachine,
+    state: State,
+    after: Optional[str],
+) -> int:
+    return _after_label(
+        ranked_transitions,
+        states_by_rank,
+        state_machine,
+        state,
+        after,
+    ).order_by(None).count()
+
+
+def _names_in_state(
+    state: State,
+    states_by_rank: Any,
+    ranked_transitions: Any,
+    *,
+    only_exitable: bool,
+) -> Iterator[str]:
+    if not only_exitable or not isinstance(state, Gate):
+        return _stream_names(ranked_transitions)
+
+    now = datetime.datetime.now(dateutil.tz.tzutc())
+
+    # Labels which were evaluated in this state, under this exit condition,
+    # are skipped until their recorded next evaluation time.
+    ranked_transitions = ranked_transitions.filter(or_(
+        Label.next_evaluation_key.is_distinct_from(
+            next_evaluation_key(states_by_rank.c.id, state),
+        ),
+        Label.next_evaluation_at <= now,
+    ))
+
+    # Where possible, filter in the database to the labels which could exit
+    # the gate. As with the batch evaluation below this is only a pre-filter;
+    # labels are evaluated exactly once locked.
+    exit_filter = state.exit_condition.sql_filter(
+        metadata=Label.metadata,
+        entered_state=states_by_rank.c.created,
+        previous_state=states_by_rank.c.old_state,
+        now=now,
+    )
+    if exit_filter is not None:
+        return _stream_names(ranked_transitions.filter(exit_filter))
+
+    if state.exit_condition.can_run_batch():
+        return _labels_able_to_exit(
+            state,
+            ranked_transitions.add_columns(
+                Label.metadata,
+                states_by_rank.c.created,
+                states_by_rank.c.old_state,
+            ),
+            now,
+        )
+
+    return _stream_names(ranked_transitions)
+
+
+# The number of label names fetched at once when streaming them from the
+# database.
+LABEL_STREAM_CHUNK_SIZE = 1000
+
+
+def _stream_names(names: Any) -> Iterator[str]:
+    # The query is run now, in the current session, rather than when the
+    # returned iterator is first advanced.
+    return (x for x, in names.yield_per(LABEL_STREAM_CHUNK_SIZE))
+
+
+# The number of labels loaded and evaluated at once when pre-filtering the
+# labels in a gate, which bounds the metadata held in memory.
+EXIT_EVALUATION_CHUNK_SIZE = 1000
+
+
+class _HistoryEntry(NamedTuple):
+    """The parts of a `History` entry accessible from exit conditions."""
+    created: datetime.datetime
+    old_state: Optional[str]
+
+
+def _labels_able_to_exit(
+    gate: Gate,
+    labels_with_history: Any,
+    now: datetime.datetime,
+) -> Iterator[str]:
+    """
+    Filter labels in a gate to those which may be able to exit it.
+
+    The gate's exit condition is evaluated over chunks of labels at once,
+    using just each label's metadata and current history entry, so that we can
+    avoid locking and fully processing labels which would stay in the gate.
+    This is only a pre-filter: labels must still be processed individually to
+    transition them.
+    """
+    rows = iter(labels_with_history.yield_per(EXIT_EVALUATION_CHUNK_SIZE))
+    chunks = iter(
+        lambda: list(itertools.islice(rows, EXIT_EVALUATION_CHUNK_SIZE)),
+        [],
+    )
+    return itertools.chain.from_iterable(
+        _exitable_in_chunk(gate, chunk, now)
+        for chunk in chunks
+    )
+
+
+def _exitable_in_chunk(
+    gate: Gate,
+    chunk: List[Any],
+    now: datetime.datetime,
+) -> Iterator[str]:
+    mask = gate.exit_condition.run_batch(
+        [label_metadata for _, label_metadata, _, _ in chunk],
+        [
+            _HistoryEntry(created, old_state)
+            for _, _, created, old_state in chunk
+        ],
+        now,
+    )
+    return (
+        name
+        for (name, _, _, _), can_exit in zip(chunk, mask)
+        if can_exit
+    )
 
 
 def context_for_label(
@@ -1,4 +1,5 @@
 import pytest
+import sqlalchemy
 
 from routemaster.db import Label
 
@@ -54,3 +55,52 @@ def test_cannot_nest_sessions(app):
         with pytest.raises(RuntimeError):
             with app.new_session():
                 pass
+
+
+def test_read_only_session_cannot_write(app):
+    with app.read_only_session() as session:
+        session.add(Label(
+            name='foo',
+            state_machine='test_machine',
+            metadata={},
+        ))
+        with pytest.raises(sqlalchemy.exc.InternalError):
+            session.flush()
+
+
+def test_sessions_run_while_streaming_from_read_only_session(app):
+    with app.new_session():
+        for name in ('foo', 'bar'):
+            app.session.add(Label(
+                name=name,
+                state_machine='test_machine',
+                metadata={},
+            ))
+
+    with app.read_only_session() as session:
+        with app.using_session(session):
+            names = (
+                x for x, in app.session.query(Label.name).order_by(
+                    Label.name,
+                ).yield_per(1)
+            )
+
+        for name in names:
+            with app.new_session():
+                app.session.query(Label).filter_by(name=name).update({
+                    'metadata': {'seen': True},
+                })
+
+    with app.new_session():
+        assert [x.metadata for x in app.session.query(Label)] == [
+            {'seen': True},
+            {'seen': True},
+        ]
+
+
+def test_cannot_use_session_within_session(app):
+    with app.read_only_session() as session:
+        with app.new_session():
+            with pytest.raises(RuntimeError):
+                with app.using_session(session):
+                    pass
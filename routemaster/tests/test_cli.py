@@ -26,3 +26,62 @@ def test_cli_with_unloadable_config_fails(app_env):
 def test_cli_with_invalid_config_cannot_serve(app_env):
     result = CliRunner(env=app_env).invoke(main, ['-c', 'test_data/disconnected.yaml', 'serve'])
     assert result.exit_code == 1, result.output
+
+
+def test_cli_saves_exit_condition_cache(app_env, tmp_path):
+    cache_path = tmp_path / 'exit_conditions.json'
+    result = CliRunner(env=app_env).invoke(main, [
+        '-c',
+        'test_data/trivial.yaml',
+        '--exit-condition-cache',
+        str(cache_path),
+        'validate',
+    ])
+    assert result.exit_code == 0, result.output
+    assert cache_path.exists()
+
+
+def test_cli_ignores_unwritable_exit_condition_cache(app_env, tmp_path):
+    cache_path = tmp_path / 'missing' / 'exit_conditions.json'
+    result = CliRunner(env=app_env).invoke(main, [
+        '-c',
+        'test_data/trivial.yaml',
+        '--exit-condition-cache',
+        str(cache_path),
+        'validate',
+    ])
+    assert result.exit_code == 0, result.output
+    assert not cache_path.exists()
+
+
+def test_cli_manages_metadata_indexes(app_env):
+    def invoke(config, *args):
+        return CliRunner(env=app_env).invoke(main, [
+            '-c',
+            config,
+            'metadata-indexes',
+            *args,
+        ])
+
+    config = 'test_data/metadata_timezone_trigger.yaml'
+    index_name = 'ix_labels_metadata_user__timezone'
+
+    result = invoke(config)
+    assert result.exit_code == 1, result.output
+    assert f"Missing: CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name}" in result.output
+
+    result = invoke(config, '--create')
+    assert result.exit_code == 0, result.output
+    assert f"Created: {index_name}" in result.output
+
+    result = invoke(config)
+    assert result.exit_code == 0, result.output
+    assert f"Present: {index_name}" in result.output
+
+    result = invoke('test_data/trivial.yaml')
+    assert result.exit_code == 1, result.output
+    assert f"Unused: {index_name}" in result.output
+
+    result = invoke('test_data/trivial.yaml', '--drop-unused')
+    assert result.exit_code == 0, result.output
+    assert f"Dropped: {index_name}" in result.output
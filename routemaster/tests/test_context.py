@@ -5,6 +5,7 @@ import pytest
 import httpretty
 
 from routemaster.feeds import Feed
+from routemaster.context import accessor_for
 
 
 def test_context_does_not_accept_naive_datetimes(make_context):
@@ -107,3 +108,26 @@ def test_accessing_prefix_directly_does_not_error(make_context):
         accessed_variables=['metadata'],
     )
     assert context.lookup(['metadata']) == {}
+
+
+def test_accessors_are_shared():
+    assert accessor_for(('metadata', 'foo')) is accessor_for(('metadata', 'foo'))
+    assert accessor_for('metadata.foo').path == ('metadata', 'foo')
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('metadata.foo.bar', 'baz'),
+    ('metadata.foo.unknown', None),
+    ('history.previous_state', 'start'),
+    ('history.entered_state.foo', None),
+    ('feeds', None),
+    ('feeds.unknown.foo', None),
+    ('unknown.foo', None),
+])
+def test_accessor_lookups(make_context, path, expected):
+    context = make_context(
+        label='label1',
+        metadata={'foo': {'bar': 'baz'}},
+        current_history_entry=mock.Mock(old_state='start'),
+    )
+    assert accessor_for(path)(context) == expected
@@ -1,13 +1,18 @@
 import datetime
 from unittest import mock
 
-import schedule
+import pytest
 import freezegun
 
-from routemaster.cron import process_job, configure_schedule
+from routemaster.cron import (
+    process_job,
+    configure_schedule,
+    configure_maintenance,
+)
 from routemaster.config import (
     Gate,
     Action,
+    SweepBudget,
     NoNextStates,
     StateMachine,
     IntervalTrigger,
@@ -16,9 +21,22 @@ from routemaster.config import (
     TimezoneAwareTrigger,
     MetadataTimezoneAwareTrigger,
 )
+from routemaster.scheduler import FairShare, Scheduler
+from routemaster.state_machine import LabelStream, spread_slot
 from routemaster.exit_conditions import ExitConditionProgram
 
 
+def labels_in_state_of(labels):
+    # Stands in for `labels_in_state`, including its filtering to a slot.
+    def _labels_in_state(app, state_machine, state, *, slot=None, **kwargs):
+        return [
+            x
+            for x in labels
+            if slot is None or spread_slot(x, slot.count) == slot.index
+        ]
+    return _labels_in_state
+
+
 def create_app(custom_app, states):
     return custom_app(state_machines={
         'test_machine': StateMachine(
@@ -41,7 +59,7 @@ def test_action_once_per_minute(custom_app):
 
     processor.called = False
 
-    scheduler = schedule.Scheduler()
+    scheduler = Scheduler()
     configure_schedule(app, scheduler, processor)
 
     assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
@@ -73,7 +91,7 @@ def test_gate_at_fixed_time(custom_app):
 
     processor.called = False
 
-    scheduler = schedule.Scheduler()
+    scheduler = Scheduler()
     configure_schedule(app, scheduler, processor)
 
     assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
@@ -108,7 +126,7 @@ def test_gate_at_fixed_time_with_specific_timezone(custom_app):
 
     processor.called = False
 
-    scheduler = schedule.Scheduler()
+    scheduler = Scheduler()
     configure_schedule(app, scheduler, processor)
 
     assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
@@ -143,7 +161,7 @@ def test_gate_at_fixed_time_with_specific_timezone_other_time(custom_app):
 
     processor.called = False
 
-    scheduler = schedule.Scheduler()
+    scheduler = Scheduler()
     configure_schedule(app, scheduler, processor)
 
     assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
@@ -178,7 +196,7 @@ def test_gate_at_fixed_time_with_metadata_timezone(custom_app):
 
     processor.called = False
 
-    scheduler = schedule.Scheduler()
+    scheduler = Scheduler()
     configure_schedule(app, scheduler, processor)
 
     assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
@@ -213,7 +231,7 @@ def test_gate_at_fixed_time_with_metadata_timezone_other_time(custom_app):
 
     processor.called = False
 
-    scheduler = schedule.Scheduler()
+    scheduler = Scheduler()
     configure_schedule(app, scheduler, processor)
 
     assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
@@ -245,7 +263,7 @@ def test_gate_at_interval(custom_app):
 
     processor.called = False
 
-    scheduler = schedule.Scheduler()
+    scheduler = Scheduler()
     configure_schedule(app, scheduler, processor)
 
     assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
@@ -277,7 +295,7 @@ def test_gate_metadata_retry(custom_app):
 
     processor.called = False
 
-    scheduler = schedule.Scheduler()
+    scheduler = Scheduler()
     configure_schedule(app, scheduler, processor)
 
     assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
@@ -293,6 +311,39 @@ def test_gate_metadata_retry(custom_app):
     assert job.next_run == datetime.datetime(2018, 1, 1, 12, 2)
 
 
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_gate_metadata_retry_within_debounce(custom_app):
+    gate = Gate(
+        'fixed_time_gate',
+        next_states=NoNextStates(),
+        exit_condition=ExitConditionProgram('false'),
+        triggers=[MetadataTrigger(metadata_path='foo.bar')],
+        debounce=datetime.timedelta(seconds=10),
+    )
+    app = create_app(custom_app, [gate])
+
+    def processor(*, state, **kwargs):
+        assert state == gate
+        processor.called = True
+
+    processor.called = False
+
+    scheduler = Scheduler()
+    configure_schedule(app, scheduler, processor)
+
+    assert len(scheduler.jobs) == 1, "Should have scheduled a single job"
+    job, = scheduler.jobs
+
+    assert job.next_run == datetime.datetime(2018, 1, 1, 12, 0, 10)
+    assert processor.called is False
+
+    with freezegun.freeze_time(job.next_run):
+        job.run()
+
+    assert processor.called is True
+    assert job.next_run == datetime.datetime(2018, 1, 1, 12, 0, 20)
+
+
 @freezegun.freeze_time('2018-01-01 12:00')
 def test_cron_job_gracefully_exit_signalling(custom_app):
     gate = Gate(
@@ -320,6 +371,7 @@ def test_cron_job_gracefully_exit_signalling(custom_app):
         process_job(
             app=app,
             is_terminating=is_terminating,
+            fair_share=FairShare(slots=1),
             fn=processor,
             label_provider=lambda x, y, z: items_to_process,
             state=gate,
@@ -358,6 +410,7 @@ def test_cron_job_does_not_forward_exceptions(custom_app):
         process_job(
             app=app,
             is_terminating=raise_value_error,
+            fair_share=FairShare(slots=1),
             fn=processor,
             label_provider=lambda x, y, z: [1],
             state=gate,
@@ -366,3 +419,448 @@ def test_cron_job_does_not_forward_exceptions(custom_app):
 
     assert raised['raised'], \
         "Test did not trigger exception correctly in cron system"
+
+
+def test_cron_job_takes_turns_in_chunks(custom_app):
+    gate = Gate(
+        'gate',
+        next_states=NoNextStates(),
+        exit_condition=ExitConditionProgram('false'),
+        triggers=[SystemTimeTrigger(datetime.time(12, 0))],
+    )
+    app = create_app(custom_app, [gate])
+    state_machine = app.config.state_machines['test_machine']._replace(
+        cron_weight=3,
+        cron_max_in_flight_labels=2,
+    )
+
+    processed = []
+
+    def processor(*, label, **kwargs):
+        processed.append(label.name)
+
+    fair_share = mock.Mock()
+    fair_share.turn.return_value = mock.MagicMock()
+
+    with mock.patch(
+        'routemaster.state_machine.api.get_current_state',
+        return_value=gate,
+    ), mock.patch('routemaster.state_machine.api.lock_label'):
+        process_job(
+            app=app,
+            is_terminating=lambda: False,
+            fair_share=fair_share,
+            fn=processor,
+            label_provider=lambda x, y, z: ['a', 'b', 'c', 'd', 'e'],
+            state=gate,
+            state_machine=state_machine,
+        )
+
+    assert processed == ['a', 'b', 'c', 'd', 'e']
+    assert fair_share.turn.call_args_list == [
+        mock.call('test_machine', size, weight=3, max_in_flight=2)
+        for size in (2, 2, 1)
+    ]
+
+
+def test_cron_job_reads_labels_a_chunk_at_a_time(app):
+    state_machine = app.config.state_machines['test_machine']
+    gate = state_machine.states[0]
+
+    read = []
+
+    def label_provider(app, state_machine, state):
+        for x in range(250):
+            read.append(x)
+            yield f'label_{x:03d}'
+
+    read_when_processed = []
+
+    def processor(*, label, **kwargs):
+        read_when_processed.append(len(read))
+
+    with mock.patch(
+        'routemaster.state_machine.api.get_current_state',
+        return_value=gate,
+    ), mock.patch('routemaster.state_machine.api.lock_label'):
+        process_job(
+            app=app,
+            is_terminating=lambda: False,
+            fair_share=FairShare(slots=1),
+            fn=processor,
+            label_provider=label_provider,
+            budget=SweepBudget(max_labels=150),
+            state=gate,
+            state_machine=state_machine,
+        )
+
+    assert read_when_processed == [100] * 100 + [200] * 50
+    assert len(read) == 250
+
+
+def test_cron_job_resumes_interrupted_sweep(app):
+    gate = app.config.state_machines['test_machine'].states[0]
+    state_machine = app.config.state_machines['test_machine']
+
+    labels = [f'label_{x:03d}' for x in range(250)]
+    processed = []
+    terminate_after = [150]
+
+    def processor(*, label, **kwargs):
+        processed.append(label.name)
+
+    def label_provider(app, state_machine, state, after=None):
+        return [x for x in labels if after is None or x > after]
+
+    def run_job():
+        process_job(
+            app=app,
+            is_terminating=lambda: len(processed) >= terminate_after[0],
+            fair_share=FairShare(slots=1),
+            fn=processor,
+            label_provider=label_provider,
+            checkpoint='test_machine:start:interval',
+            state=gate,
+            state_machine=state_machine,
+        )
+
+    with mock.patch(
+        'routemaster.state_machine.api.get_current_state',
+        return_value=gate,
+    ), mock.patch('routemaster.state_machine.api.lock_label'):
+        run_job()
+        assert processed == labels[:150]
+
+        terminate_after[0] = 1000
+        run_job()
+        assert processed == labels
+
+        # Having finished, the next run sweeps from the start.
+        run_job()
+        assert processed == labels + labels
+
+
+@pytest.mark.parametrize('budget, expected_processed', [
+    (SweepBudget(), 250),
+    (SweepBudget(max_labels=120), 120),
+    (SweepBudget(max_duration=datetime.timedelta(0)), 0),
+])
+def test_cron_job_stops_once_budget_spent(app, budget, expected_processed):
+    gate = app.config.state_machines['test_machine'].states[0]
+    state_machine = app.config.state_machines['test_machine']
+
+    labels = [f'label_{x:03d}' for x in range(250)]
+    processed = []
+
+    def processor(*, label, **kwargs):
+        processed.append(label.name)
+
+    with mock.patch(
+        'routemaster.state_machine.api.get_current_state',
+        return_value=gate,
+    ), mock.patch(
+        'routemaster.state_machine.api.lock_label',
+    ), mock.patch.object(app.logger, 'cron_sweep_backlog') as log_backlog:
+        process_job(
+            app=app,
+            is_terminating=lambda: False,
+            fair_share=FairShare(slots=1),
+            fn=processor,
+            label_provider=lambda x, y, z: labels,
+            budget=budget,
+            state=gate,
+            state_machine=state_machine,
+        )
+
+    assert processed == labels[:expected_processed]
+    log_backlog.assert_called_once_with(
+        state_machine,
+        gate,
+        'processor',
+        250 - expected_processed,
+    )
+
+
+def test_cron_job_commits_batches_within_chunks(app):
+    state_machine = app.config.state_machines['test_machine']._replace(
+        cron_labels_per_commit=3,
+        cron_max_in_flight_labels=5,
+    )
+    gate = state_machine.states[0]
+
+    labels = [f'label_{x}' for x in range(10)]
+    batches = []
+
+    def processor(*, app, label, **kwargs):
+        if not batches or batches[-1][0] is not app.session:
+            batches.append((app.session, []))
+        batches[-1][1].append(label.name)
+
+    with mock.patch(
+        'routemaster.state_machine.api.get_current_state',
+        return_value=gate,
+    ), mock.patch('routemaster.state_machine.api.lock_label'):
+        process_job(
+            app=app,
+            is_terminating=lambda: False,
+            fair_share=FairShare(slots=1),
+            fn=processor,
+            label_provider=lambda x, y, z: labels,
+            state=gate,
+            state_machine=state_machine,
+        )
+
+    # Labels are taken in chunks of 5, and no batch waits for the next chunk.
+    assert [x for _, x in batches] == [
+        labels[:3],
+        labels[3:5],
+        labels[5:8],
+        labels[8:],
+    ]
+
+
+def test_cron_job_counts_backlog_of_streamed_labels_without_reading_them(app):
+    gate = app.config.state_machines['test_machine'].states[0]
+    state_machine = app.config.state_machines['test_machine']
+
+    labels = [f'label_{x:03d}' for x in range(250)]
+    names = iter(labels)
+    count_after = mock.Mock(return_value=50)
+    processed = []
+
+    def processor(*, label, **kwargs):
+        processed.append(label.name)
+
+    with mock.patch(
+        'routemaster.state_machine.api.get_current_state',
+        return_value=gate,
+    ), mock.patch(
+        'routemaster.state_machine.api.lock_label',
+    ), mock.patch.object(app.logger, 'cron_sweep_backlog') as log_backlog:
+        process_job(
+            app=app,
+            is_terminating=lambda: False,
+            fair_share=FairShare(slots=1),
+            fn=processor,
+            label_provider=lambda x, y, z: LabelStream(names, count_after),
+            budget=SweepBudget(max_labels=120),
+            state=gate,
+            state_machine=state_machine,
+        )
+
+    assert processed == labels[:120]
+    # The rest of the second chunk, and those counted after it.
+    count_after.assert_called_once_with('label_199')
+    log_backlog.assert_called_once_with(state_machine, gate, 'processor', 130)
+    assert list(names) == labels[200:]
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_gate_at_fixed_time_spread_across_slots(custom_app):
+    gate = Gate(
+        'fixed_time_gate',
+        next_states=NoNextStates(),
+        exit_condition=ExitConditionProgram('false'),
+        triggers=[SystemTimeTrigger(
+            datetime.time(23, 59),
+            spread=datetime.timedelta(minutes=3),
+        )],
+    )
+    app = create_app(custom_app, [gate])
+    state_machine = app.config.state_machines['test_machine']
+    labels = [f'label_{x}' for x in range(100)]
+
+    providers = []
+
+    def processor(*, label_provider, checkpoint, **kwargs):
+        providers.append((checkpoint, label_provider))
+
+    scheduler = Scheduler()
+    with mock.patch(
+        'routemaster.cron.labels_in_state',
+        labels_in_state_of(labels),
+    ):
+        configure_schedule(app, scheduler, processor)
+
+    job, = scheduler.jobs
+    for now in (
+        datetime.datetime(2018, 1, 1, 23, 59),
+        datetime.datetime(2018, 1, 2, 0, 0),
+        datetime.datetime(2018, 1, 2, 0, 1),
+    ):
+        assert job.next_run == now
+        with freezegun.freeze_time(now):
+            job.run()
+
+    assert job.next_run == datetime.datetime(2018, 1, 2, 23, 59)
+
+    slot_labels = [
+        list(label_provider(app, state_machine, gate))
+        for _, label_provider in providers
+    ]
+    assert [x for x, _ in providers] == [
+        'test_machine:fixed_time_gate:time:0',
+        'test_machine:fixed_time_gate:time:1',
+        'test_machine:fixed_time_gate:time:2',
+    ]
+    assert sorted(sum(slot_labels, [])) == sorted(labels)
+    for slot, names in enumerate(slot_labels):
+        assert names
+        assert all(spread_slot(x, 3) == slot for x in names)
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_gate_at_fixed_time_with_specific_timezone_spread(custom_app):
+    gate = Gate(
+        'fixed_time_gate',
+        next_states=NoNextStates(),
+        exit_condition=ExitConditionProgram('false'),
+        triggers=[TimezoneAwareTrigger(
+            datetime.time(12, 1),
+            timezone='Europe/London',
+            spread=datetime.timedelta(minutes=2),
+        )],
+    )
+    app = create_app(custom_app, [gate])
+
+    called = []
+
+    def processor(*, checkpoint, **kwargs):
+        called.append(checkpoint)
+
+    scheduler = Scheduler()
+    configure_schedule(app, scheduler, processor)
+
+    job, = scheduler.jobs
+    for minute in (1, 2, 3):
+        with freezegun.freeze_time(datetime.datetime(2018, 1, 1, 12, minute)):
+            job.run()
+
+    assert called == [
+        'test_machine:fixed_time_gate:timezone:0',
+        'test_machine:fixed_time_gate:timezone:1',
+    ]
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_gate_triggers_due_together_are_swept_once(custom_app):
+    gate = Gate(
+        'gate',
+        next_states=NoNextStates(),
+        exit_condition=ExitConditionProgram('false'),
+        triggers=[
+            IntervalTrigger(
+                datetime.timedelta(minutes=10),
+                budget=SweepBudget(max_labels=10),
+            ),
+            IntervalTrigger(
+                datetime.timedelta(minutes=15),
+                budget=SweepBudget(max_labels=20),
+            ),
+        ],
+    )
+    app = create_app(custom_app, [gate])
+
+    called = []
+
+    def processor(*, checkpoint, budget, **kwargs):
+        called.append((checkpoint, budget))
+
+    scheduler = Scheduler()
+    configure_schedule(app, scheduler, processor)
+
+    job, = scheduler.jobs
+    runs = []
+    while job.next_run <= datetime.datetime(2018, 1, 1, 12, 30):
+        runs.append(job.next_run.time())
+        with freezegun.freeze_time(job.next_run):
+            job.run()
+
+    # Both interval triggers are due at 12:30, and are swept once.
+    assert runs == [
+        datetime.time(12, 10),
+        datetime.time(12, 15),
+        datetime.time(12, 20),
+        datetime.time(12, 30),
+    ]
+    assert called == [
+        ('test_machine:gate:sweep', SweepBudget(max_labels=10)),
+        ('test_machine:gate:sweep', SweepBudget(max_labels=20)),
+        ('test_machine:gate:sweep', SweepBudget(max_labels=10)),
+        ('test_machine:gate:sweep', SweepBudget(max_labels=20)),
+    ]
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_gate_selections_due_together_are_swept_as_a_union(custom_app):
+    gate = Gate(
+        'gate',
+        next_states=NoNextStates(),
+        exit_condition=ExitConditionProgram('false'),
+        triggers=[
+            SystemTimeTrigger(
+                datetime.time(12, 10),
+                spread=datetime.timedelta(minutes=2),
+            ),
+            MetadataTrigger(metadata_path='foo'),
+        ],
+    )
+    app = create_app(custom_app, [gate])
+    state_machine = app.config.state_machines['test_machine']
+    labels = [f'label_{x}' for x in range(20)]
+    retries = ['label_0', 'label_1']
+
+    called = []
+
+    def processor(*, label_provider, checkpoint=None, **kwargs):
+        called.append((checkpoint, label_provider))
+
+    scheduler = Scheduler()
+    with mock.patch(
+        'routemaster.cron.labels_in_state',
+        labels_in_state_of(labels),
+    ), mock.patch(
+        'routemaster.cron.labels_needing_metadata_update_retry_in_gate',
+        return_value=retries,
+    ):
+        configure_schedule(app, scheduler, processor)
+
+    job, = scheduler.jobs
+    with freezegun.freeze_time('2018-01-01 12:10'):
+        job.run()
+
+    (checkpoint, label_provider), = called
+    swept = label_provider(app, state_machine, gate)
+
+    assert checkpoint is None
+    assert sorted(swept) == sorted(set(retries) | {
+        x for x in labels if spread_slot(x, 2) == 0
+    })
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_maintenance_archives_labels_of_state_machines_archiving_them(app):
+    test_machine = app.config.state_machines['test_machine']
+    is_terminating = mock.Mock(return_value=False)
+
+    archiving = test_machine._replace(
+        archive_labels_after=datetime.timedelta(days=30),
+    )
+
+    scheduler = Scheduler()
+    with mock.patch.dict(app.config.state_machines, {
+        'test_machine': archiving,
+    }), mock.patch('routemaster.cron.archive_labels') as archive_labels:
+        configure_maintenance(app, scheduler, is_terminating)
+
+        assert [x.name for x in scheduler.jobs] == [
+            'history_maintenance',
+            'test_machine:archive',
+        ]
+
+        archive_job = scheduler.jobs[1]
+        assert archive_job.next_run == datetime.datetime(2018, 1, 1, 13, 0)
+        with freezegun.freeze_time(archive_job.next_run):
+            archive_job.run()
+
+    archive_labels.assert_called_once_with(app, archiving, is_terminating)
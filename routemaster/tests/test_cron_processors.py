@@ -208,6 +208,7 @@ def test_metadata_timezone_aware_processor_runs_on_time() -> None:
             labels_in_state_with_metadata,
             path=['tz'],
             values=mock.ANY,
+            only_exitable=True,
         )
 
     timezones = mock_partial.call_args[1]['values']
@@ -233,6 +234,7 @@ def test_metadata_timezone_aware_processor_runs_on_time_other_timezone() -> None
             labels_in_state_with_metadata,
             path=['tz'],
             values=mock.ANY,
+            only_exitable=True,
         )
 
     timezones = mock_partial.call_args[1]['values']
@@ -273,6 +275,7 @@ def test_metadata_timezone_processor_runs_if_delayed_since_construction() -> Non
             labels_in_state_with_metadata,
             path=['tz'],
             values=mock.ANY,
+            only_exitable=True,
         )
 
     timezones = mock_partial.call_args[1]['values']
@@ -304,6 +307,7 @@ def test_metadata_timezone_processor_runs_if_delayed_since_last_run() -> None:
             labels_in_state_with_metadata,
             path=['tz'],
             values=mock.ANY,
+            only_exitable=True,
         )
 
     timezones = mock_partial.call_args[1]['values']
@@ -331,6 +335,7 @@ def test_metadata_timezone_processor_doesnt_run_multiply() -> None:
                 labels_in_state_with_metadata,
                 path=['tz'],
                 values=mock.ANY,
+                only_exitable=True,
             )
 
     timezones = mock_partial.call_args[1]['values']
@@ -22,6 +22,8 @@ DEPENDENCIES = (
     ('cli', 'gunicorn_application'),
     ('cli', 'validation'),
     ('cli', 'middleware'),
+    ('cli', 'exit_conditions'),
+    ('cli', 'db'),
 
     ('exit_conditions', 'context'),
     ('exit_conditions', 'utils'),
@@ -39,6 +41,7 @@ DEPENDENCIES = (
     ('cron', 'app'),
     ('cron', 'cron_processors'),
     ('cron', 'state_machine'),
+    ('cron', 'scheduler'),
 
     ('cron_processors', 'app'),
     ('cron_processors', 'state_machine'),
@@ -0,0 +1,234 @@
+import time
+import datetime
+import threading
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import freezegun
+
+from routemaster.scheduler import Job, FairShare, Scheduler
+
+
+def _run_submitted(executor):
+    for (fn, *args), _ in executor.submit.call_args_list:
+        fn(*args)
+    executor.submit.reset_mock()
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_dispatches_due_jobs_and_reports_lateness():
+    fn = mock.Mock()
+    logger = mock.Mock()
+    executor = mock.Mock()
+
+    scheduler = Scheduler()
+    job = scheduler.every(datetime.timedelta(minutes=1), fn, name='job')
+
+    assert scheduler.run_pending(executor, logger) == 60
+    executor.submit.assert_not_called()
+
+    with freezegun.freeze_time('2018-01-01 12:01:05'):
+        delay = scheduler.run_pending(executor, logger)
+        _run_submitted(executor)
+
+    fn.assert_called_once_with()
+    logger.cron_job_lateness.assert_called_once_with(
+        'job',
+        datetime.timedelta(seconds=5),
+    )
+    assert job.next_run == datetime.datetime(2018, 1, 1, 12, 2)
+    assert delay == 55
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_dispatches_jobs_in_order_of_next_run():
+    logger = mock.Mock()
+    executor = mock.Mock()
+    calls = []
+
+    scheduler = Scheduler()
+    scheduler.daily_at(
+        datetime.time(12, 30),
+        lambda: calls.append('daily'),
+        name='daily',
+    )
+    scheduler.every(
+        datetime.timedelta(minutes=20),
+        lambda: calls.append('interval'),
+        name='interval',
+    )
+
+    with freezegun.freeze_time('2018-01-01 12:45'):
+        scheduler.run_pending(executor, logger)
+        _run_submitted(executor)
+
+    assert calls == ['interval', 'daily']
+    assert [x.next_run for x in scheduler.jobs] == [
+        datetime.datetime(2018, 1, 2, 12, 30),
+        datetime.datetime(2018, 1, 1, 13, 0),
+    ]
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_finds_first_run_after_without_scheduling():
+    job = Job.every(datetime.timedelta(minutes=20), mock.Mock(), name='job')
+
+    assert job.first_run_after(
+        datetime.datetime(2018, 1, 1, 12, 45),
+    ) == datetime.datetime(2018, 1, 1, 13, 0)
+    assert job.next_run == datetime.datetime(2018, 1, 1, 12, 20)
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_skips_jobs_whose_previous_run_is_in_progress():
+    fn = mock.Mock()
+    logger = mock.Mock()
+    executor = mock.Mock()
+
+    scheduler = Scheduler()
+    job = scheduler.every(datetime.timedelta(minutes=1), fn, name='job')
+
+    with freezegun.freeze_time('2018-01-01 12:01'):
+        scheduler.run_pending(executor, logger)
+    assert executor.submit.call_count == 1
+    assert job.running
+
+    with freezegun.freeze_time('2018-01-01 12:02'):
+        scheduler.run_pending(executor, logger)
+    assert executor.submit.call_count == 1
+    logger.warning.assert_called_once()
+    assert job.next_run == datetime.datetime(2018, 1, 1, 12, 3)
+
+    _run_submitted(executor)
+    assert not job.running
+
+    with freezegun.freeze_time('2018-01-01 12:03'):
+        scheduler.run_pending(executor, logger)
+    assert executor.submit.call_count == 1
+
+
+@freezegun.freeze_time('2018-01-01 12:00')
+def test_logs_exceptions_from_jobs():
+    logger = mock.Mock()
+    executor = mock.Mock()
+
+    scheduler = Scheduler()
+    job = scheduler.every(
+        datetime.timedelta(minutes=1),
+        mock.Mock(side_effect=ValueError()),
+        name='job',
+    )
+
+    with freezegun.freeze_time('2018-01-01 12:01'):
+        scheduler.run_pending(executor, logger)
+        _run_submitted(executor)
+
+    logger.exception.assert_called_once()
+    assert not job.running
+
+
+def test_runs_jobs_until_terminating():
+    ran = threading.Event()
+    terminating = threading.Event()
+
+    scheduler = Scheduler()
+    scheduler.every(datetime.timedelta(milliseconds=10), ran.set, name='job')
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        thread = threading.Thread(
+            target=scheduler.run,
+            args=(executor, mock.Mock(), terminating.is_set),
+        )
+        thread.start()
+
+        assert ran.wait(timeout=5)
+
+        terminating.set()
+        scheduler.wake()
+        thread.join(timeout=5)
+
+    assert not thread.is_alive()
+
+
+def _start_turn(fair_share, started, key, **kwargs):
+    def take_turn():
+        with fair_share.turn(key, 100, **kwargs):
+            started.append(key)
+
+    thread = threading.Thread(target=take_turn)
+    thread.start()
+    return thread
+
+
+def _wait_for_waiting(fair_share, count):
+    for _ in range(500):
+        with fair_share._condition:
+            if len(fair_share._waiting) == count:
+                return
+        time.sleep(0.01)
+    raise AssertionError("Turns were not waiting")
+
+
+@pytest.mark.parametrize('big_weight, expected', [
+    (1, ['small', 'big']),
+    (4, ['big', 'small']),
+])
+def test_fair_share_serves_least_charged_source_first(big_weight, expected):
+    weights = {'big': big_weight, 'small': 1}
+    fair_share = FairShare(slots=1)
+    for key in ('big', 'small', 'big', 'small', 'big'):
+        with fair_share.turn(key, 100, weight=weights[key]):
+            pass
+
+    started = []
+    with fair_share.turn('blocker', 1):
+        threads = [
+            _start_turn(fair_share, started, 'big', weight=big_weight),
+            _start_turn(fair_share, started, 'small'),
+        ]
+        _wait_for_waiting(fair_share, 2)
+
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert started == expected
+
+
+def test_fair_share_does_not_bank_credit_for_idle_sources():
+    fair_share = FairShare(slots=1)
+    for _ in range(3):
+        with fair_share.turn('busy', 100):
+            pass
+
+    started = []
+    with fair_share.turn('blocker', 1):
+        threads = [
+            _start_turn(fair_share, started, 'busy'),
+            _start_turn(fair_share, started, 'idle'),
+        ]
+        _wait_for_waiting(fair_share, 2)
+
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # Having done no work, `idle` is charged as of the last chunk started,
+    # which is less than `busy` has been charged, but not by three chunks.
+    assert started == ['idle', 'busy']
+    assert fair_share._charged['busy'] - fair_share._charged['idle'] == 100
+
+
+def test_fair_share_limits_work_in_flight_per_source():
+    fair_share = FairShare(slots=2)
+
+    started = []
+    with fair_share.turn('limited', 100, max_in_flight=100):
+        threads = [
+            _start_turn(fair_share, started, 'limited', max_in_flight=100),
+            _start_turn(fair_share, started, 'other'),
+        ]
+        threads[1].join(timeout=5)
+        assert started == ['other']
+
+    threads[0].join(timeout=5)
+    assert started == ['other', 'limited']
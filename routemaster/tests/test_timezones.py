@@ -1,5 +1,90 @@
-from routemaster.timezones import get_known_timezones
+import random
+import datetime
+from unittest import mock
+
+import pytest
+import dateutil.tz
+
+from routemaster.timezones import LocalTimeSchedule, get_known_timezones
+
+UTC = dateutil.tz.tzutc()
 
 
 def test_smoke_get_known_timezones():
     get_known_timezones()
+
+
+def _timezones_between(time, start, end):
+    # Reference implementation, checking each timezone in turn.
+    timezones = set()
+    for name in get_known_timezones():
+        timezone = dateutil.tz.gettz(name)
+        first_date = start.astimezone(timezone).date()
+        last_date = end.astimezone(timezone).date()
+        date = first_date
+        while date <= last_date:
+            instant = datetime.datetime.combine(date, time, tzinfo=timezone)
+            if start < instant <= end:
+                timezones.add(name)
+            date += datetime.timedelta(days=1)
+    return frozenset(timezones)
+
+
+@pytest.mark.parametrize('time', [datetime.time(12, 0), datetime.time(13, 45)])
+def test_local_time_schedule_matches_checking_each_timezone(time):
+    rng = random.Random(0)
+    schedule = LocalTimeSchedule(time)
+    start = datetime.datetime(2019, 3, 1, tzinfo=UTC)
+
+    for _ in range(10):
+        start += datetime.timedelta(minutes=rng.randrange(1, 60 * 24 * 40))
+        end = start + datetime.timedelta(minutes=rng.randrange(1, 60 * 30))
+
+        assert schedule.timezones_between(start, end) == \
+            _timezones_between(time, start, end)
+
+
+def test_local_time_schedule_groups_timezones_by_offset():
+    schedule = LocalTimeSchedule(datetime.time(12, 0))
+
+    timezones = schedule.timezones_between(
+        datetime.datetime(2019, 8, 1, 10, 59, tzinfo=UTC),
+        datetime.datetime(2019, 8, 1, 11, 0, tzinfo=UTC),
+    )
+
+    assert 'Europe/London' in timezones
+    assert 'Africa/Lagos' in timezones
+    assert 'Etc/UTC' not in timezones
+
+
+def test_local_time_schedule_is_rebuilt_at_offset_changes():
+    schedule = LocalTimeSchedule(datetime.time(12, 0))
+    start = datetime.datetime(2019, 3, 31, 0, 0, tzinfo=UTC)
+
+    with mock.patch(
+        'routemaster.timezones.get_known_timezones',
+        return_value=frozenset(['Europe/London']),
+    ):
+        assert schedule.timezones_between(
+            start,
+            start + datetime.timedelta(minutes=30),
+        ) == frozenset()
+        # London changes offset at 01:00 UTC.
+        assert schedule._table.valid_until == \
+            datetime.datetime(2019, 3, 31, 1, 0, tzinfo=UTC)
+
+        assert schedule.timezones_between(
+            start + datetime.timedelta(minutes=30),
+            datetime.datetime(2019, 3, 31, 11, 0, tzinfo=UTC),
+        ) == frozenset(['Europe/London'])
+
+    assert schedule._table.valid_until == \
+        datetime.datetime(2019, 4, 1, 1, 0, tzinfo=UTC)
+
+
+def test_local_time_schedule_requires_valid_range():
+    schedule = LocalTimeSchedule(datetime.time(12, 0))
+    now = datetime.datetime(2019, 8, 1, tzinfo=UTC)
+
+    with pytest.raises(ValueError):
+        schedule.timezones_between(now, now)
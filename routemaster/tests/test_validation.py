@@ -1,8 +1,11 @@
+import datetime
 from pathlib import Path
 
 import pytest
+import dateutil.tz
 import layer_loader
 
+from routemaster.db import ArchivedLabel, ArchivedHistory
 from routemaster.config import (
     Gate,
     NoNextStates,
@@ -179,6 +182,45 @@ def test_label_in_deleted_state_invalid(app, create_label):
         _validate_state_machine(app, state_machine)
 
 
+def test_archived_label_in_deleted_state_invalid(app):
+    now = datetime.datetime.now(dateutil.tz.tzutc())
+    with app.new_session():
+        app.session.add(ArchivedLabel(
+            name='foo',
+            state_machine='test_machine',
+            metadata={},
+            deleted=False,
+            updated=now,
+        ))
+        app.session.flush()
+        app.session.add(ArchivedHistory(
+            id=1,
+            label_name='foo',
+            label_state_machine='test_machine',
+            created=now,
+            forced=False,
+            old_state=None,
+            new_state='start',
+        ))
+
+    state_machine = StateMachine(
+        name='test_machine',
+        feeds=[],
+        webhooks=[],
+        states=[
+            # Note: state "start" from "test_machine" is gone.
+            Gate(
+                name='end',
+                triggers=[],
+                next_states=NoNextStates(),
+                exit_condition=ExitConditionProgram('false'),
+            ),
+        ],
+    )
+    with pytest.raises(ValidationError):
+        _validate_state_machine(app, state_machine)
+
+
 def test_label_in_deleted_state_on_per_state_machine_basis(
     app,
     create_label,
@@ -1,8 +1,10 @@
 """Helpers for working with timezones."""
 
 
+import bisect
+import datetime
 import functools
-from typing import FrozenSet
+from typing import Set, Dict, List, Iterable, Optional, FrozenSet, NamedTuple
 
 import dateutil.tz
 import dateutil.zoneinfo
@@ -30,3 +32,153 @@ def get_known_timezones() -> FrozenSet[str]:
     )
 
     return frozenset(info.zones.keys())
+
+
+# How far ahead a `LocalTimeSchedule` looks for changes in offset. Tables are
+# rebuilt at least this often.
+_SCHEDULE_HORIZON = datetime.timedelta(days=1)
+
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class _OffsetTable(NamedTuple):
+    # UTC seconds since midnight at which the time occurs in `zones`, sorted.
+    instants: List[float]
+    zones: List[FrozenSet[str]]
+    valid_until: datetime.datetime
+
+
+class LocalTimeSchedule:
+    """
+    The instants at which a local time of day occurs in each known timezone.
+
+    Timezones which share an offset from UTC also share the instant at which
+    the time occurs, so are grouped together. This gives a daily table of at
+    most a few dozen instants, which holds until any timezone changes offset
+    (typically at DST boundaries) and is only rebuilt then.
+    """
+
+    def __init__(self, time: datetime.time) -> None:
+        self.time = time
+        self._table: Optional[_OffsetTable] = None
+
+    def timezones_between(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+    ) -> FrozenSet[str]:
+        """
+        Return the timezones in which the time appears within a range.
+
+        As for `time_appears_in_range`, the range excludes `start` but
+        includes `end`, and ranges of a day or more match all timezones.
+        """
+        if start >= end:
+            raise ValueError(
+                f"Must be passed a valid range to check (got {start} until "
+                f"{end})",
+            )
+
+        if end - start >= datetime.timedelta(days=1):
+            return get_known_timezones()
+
+        timezones: Set[str] = set()
+        while start < end:
+            table = self._table_at(start)
+            segment_end = min(end, table.valid_until)
+            for zones in _zones_between(table, start, segment_end):
+                timezones.update(zones)
+            start = segment_end
+
+        return frozenset(timezones)
+
+    def _table_at(self, when: datetime.datetime) -> _OffsetTable:
+        # Tables are built at the start of the ranges they're used for, and
+        # ranges only move forwards, so are only checked for having expired.
+        table = self._table
+        if table is None or when >= table.valid_until:
+            table = self._table = self._build_table(when)
+        return table
+
+    def _build_table(self, when: datetime.datetime) -> _OffsetTable:
+        horizon = when + _SCHEDULE_HORIZON
+        valid_until = horizon
+        zones_by_offset: Dict[datetime.timedelta, Set[str]] = {}
+
+        for name in get_known_timezones():
+            timezone = dateutil.tz.gettz(name)
+            offset = _utcoffset(when, timezone)
+            zones_by_offset.setdefault(offset, set()).add(name)
+
+            if _utcoffset(horizon, timezone) != offset:
+                valid_until = min(
+                    valid_until,
+                    _next_offset_change(when, horizon, timezone),
+                )
+
+        local_seconds = (
+            self.time.hour * 3600 +
+            self.time.minute * 60 +
+            self.time.second
+        )
+        entries = sorted(
+            (
+                (local_seconds - offset.total_seconds()) % _SECONDS_PER_DAY,
+                frozenset(zones),
+            )
+            for offset, zones in zones_by_offset.items()
+        )
+        return _OffsetTable(
+            instants=[x for x, _ in entries],
+            zones=[x for _, x in entries],
+            valid_until=valid_until,
+        )
+
+
+def _utcoffset(
+    when: datetime.datetime,
+    timezone: datetime.tzinfo,
+) -> datetime.timedelta:
+    offset = when.astimezone(timezone).utcoffset()
+    if offset is None:  # pragma: no cover
+        raise ValueError(f"No offset for {timezone} at {when}")
+    return offset
+
+
+def _next_offset_change(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    timezone: datetime.tzinfo,
+) -> datetime.datetime:
+    # Bisect to the second at which the offset changes, assuming it changes
+    # only once between `start` and `end`. Changes happen on whole seconds.
+    offset = _utcoffset(start, timezone)
+    start = start.replace(microsecond=0)
+    while end - start > datetime.timedelta(seconds=1):
+        middle = start + datetime.timedelta(
+            seconds=(end - start).total_seconds() // 2,
+        )
+        if _utcoffset(middle, timezone) == offset:
+            start = middle
+        else:
+            end = middle
+    return start + datetime.timedelta(seconds=1)
+
+
+def _zones_between(
+    table: _OffsetTable,
+    start: datetime.datetime,
+    end: datetime.datetime,
+) -> Iterable[FrozenSet[str]]:
+    start_utc = start.astimezone(dateutil.tz.tzutc())
+    midnight = start_utc.replace(hour=0, minute=0, second=0, microsecond=0)
+    lower = (start_utc - midnight).total_seconds()
+    upper = lower + (end - start).total_seconds()
+
+    first = bisect.bisect_right(table.instants, lower)
+    if upper <= _SECONDS_PER_DAY:
+        return table.zones[first:bisect.bisect_right(table.instants, upper)]
+
+    # The range passes midnight, so wraps around to the start of the table.
+    wrapped = bisect.bisect_right(table.instants, upper - _SECONDS_PER_DAY)
+    return table.zones[first:] + table.zones[:wrapped]
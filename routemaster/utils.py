@@ -29,10 +29,9 @@ def get_path(path: Sequence[str], d: Dict[str, Any]) -> Any:
         # Empty path returns the whole dict, i.e. no _filter_ on the dict
         return d
 
-    component, rest = path[0], path[1:]
-    if rest:
-        return get_path(rest, d.get(component, {}))
-    return d.get(component)
+    for component in path[:-1]:
+        d = d.get(component, {})
+    return d.get(path[-1])
 
 
 @contextlib.contextmanager
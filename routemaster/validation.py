@@ -4,7 +4,7 @@ import collections
 import networkx
 from sqlalchemy import func
 
-from routemaster.db import History
+from routemaster.db import History, ArchivedHistory
 from routemaster.app import App
 from routemaster.config import Config, StateMachine
 
@@ -69,27 +69,30 @@ def _validate_all_states_exist(state_machine):
 def _validate_no_labels_in_nonexistent_states(state_machine, app):
     states = [x.name for x in state_machine.states]
 
-    states_by_rank = app.session.query(
-        History.label_name,
-        History.new_state,
-        func.row_number().over(
-            order_by=History.id.desc(),
-            partition_by=History.label_name,
-        ).label('rank'),
-    ).filter_by(
-        label_state_machine=state_machine.name,
-    ).subquery()
-
-    invalid_labels_and_states = app.session.query(
-        states_by_rank.c.label_name,
-        states_by_rank.c.new_state,
-    ).filter(
-        states_by_rank.c.rank == 1,
-        ~(
-            states_by_rank.c.new_state.in_(states) |
-            states_by_rank.c.new_state.is_(None)
-        ),
-    ).all()
+    # Archived labels are checked too, as they may still be read.
+    invalid_labels_and_states = []
+    for history in (History, ArchivedHistory):
+        states_by_rank = app.session.query(
+            history.label_name,
+            history.new_state,
+            func.row_number().over(
+                order_by=history.id.desc(),
+                partition_by=history.label_name,
+            ).label('rank'),
+        ).filter_by(
+            label_state_machine=state_machine.name,
+        ).subquery()
+
+        invalid_labels_and_states += app.session.query(
+            states_by_rank.c.label_name,
+            states_by_rank.c.new_state,
+        ).filter(
+            states_by_rank.c.rank == 1,
+            ~(
+                states_by_rank.c.new_state.in_(states) |
+                states_by_rank.c.new_state.is_(None)
+            ),
+        ).all()
 
     state_counts = collections.Counter(
         x.new_state for x in invalid_labels_and_states
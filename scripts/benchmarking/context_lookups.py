@@ -0,0 +1,83 @@
+"""
+Context lookup benchmarks.
+
+Use with `python scripts/benchmarking/context_lookups.py` to compare
+resolving paths on every lookup, as `Context.lookup` used to, against the
+precompiled accessors it now uses.
+"""
+import timeit
+import datetime
+
+import dateutil.tz
+
+from routemaster.context import Context, lookup_history
+
+PATHS = (
+    ('metadata', 'foo'),
+    ('metadata', 'nested', 'deeply', 'value'),
+    ('metadata', 'unknown', 'value'),
+    ('history', 'entered_state'),
+)
+
+
+def _get_path(path, d):
+    if not len(path):
+        return d
+
+    component, rest = path[0], path[1:]
+    if rest:
+        return _get_path(rest, d.get(component, {}))
+    return d.get(component)
+
+
+def legacy_lookup(context, path):
+    """Look up a path in `context`, resolving it on each call."""
+    location, *rest = path
+
+    try:
+        return {
+            'metadata': lambda x: _get_path(x, context.metadata),
+            'feeds': lambda x: context.feeds[x[0]].lookup(x[1:]),
+            'history': lambda x: lookup_history(
+                x,
+                context.current_history_entry,
+            ),
+        }[location](rest)
+    except (KeyError, ValueError):
+        return None
+
+
+def main():
+    """Print timings of each kind of lookup of each path."""
+    now = datetime.datetime.now(dateutil.tz.tzutc())
+    context = Context(
+        label='benchmark',
+        metadata={'foo': 1, 'nested': {'deeply': {'value': 2}}},
+        now=now,
+        feeds={},
+        accessed_variables=[],
+        current_history_entry=None,
+        feed_logging_context=None,
+    )
+    number = 200000
+
+    for path in PATHS:
+        legacy_time = timeit.timeit(
+            lambda: legacy_lookup(context, path),
+            number=number,
+        )
+        lookup_time = timeit.timeit(
+            lambda: context.lookup(path),
+            number=number,
+        )
+        print(  # noqa: T001
+            '{path:<40} legacy {legacy:7.3f}us, accessor {new:7.3f}us'.format(
+                path='.'.join(path),
+                legacy=legacy_time / number * 1e6,
+                new=lookup_time / number * 1e6,
+            ),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Exit condition benchmarks.
+
+Use with `python scripts/benchmarking/exit_conditions.py` to time compiling
+and running large generated programs.
+"""
+import random
+import timeit
+import datetime
+from typing import NamedTuple
+
+import dateutil.tz
+
+from routemaster.context import Context
+from routemaster.exit_conditions import ExitConditionProgram
+from routemaster.exit_conditions.parser import parse
+from routemaster.exit_conditions.peephole import peephole_optimise
+
+SIZES = (100, 1000, 10000)
+
+CLAUSES = (
+    'metadata.{key} = {value}',
+    'metadata.{key} > {value} and true',
+    'false or metadata.{key} < {value}',
+    '{value} = {value} and not metadata.{key}',
+    '{value}h has passed since history.entered_state',
+    'metadata.{key} is defined',
+)
+
+
+def generate_program(size, seed=0):
+    """Generate the source of a program with `size` random clauses."""
+    rng = random.Random(seed)
+    clauses = [
+        '({0})'.format(rng.choice(CLAUSES).format(
+            key=rng.choice('abcdefgh'),
+            value=rng.randrange(10),
+        ))
+        for _ in range(size)
+    ]
+    return ' or '.join(clauses)
+
+
+class _HistoryEntry(NamedTuple):
+    created: datetime.datetime
+    old_state: str
+    new_state: str
+
+
+def _context(now):
+    return Context(
+        label='benchmark',
+        metadata={key: index for index, key in enumerate('abcdefgh')},
+        now=now,
+        feeds={},
+        accessed_variables=[],
+        current_history_entry=_HistoryEntry(
+            created=now - datetime.timedelta(hours=5),
+            old_state='start',
+            new_state='benchmark',
+        ),
+        feed_logging_context=None,
+    )
+
+
+def main():
+    """Print timings of compiling, optimising and running each program."""
+    now = datetime.datetime.now(dateutil.tz.tzutc())
+
+    for size in SIZES:
+        source = generate_program(size)
+        program = ExitConditionProgram(source)
+        instructions = list(parse(source))
+        context = _context(now)
+
+        repeats = max(1, 10000 // size)
+        compile_time = timeit.timeit(
+            lambda: ExitConditionProgram(source),
+            number=repeats,
+        ) / repeats
+        optimise_time = timeit.timeit(
+            lambda: peephole_optimise(instructions),
+            number=repeats,
+        ) / repeats
+        run_time = timeit.timeit(
+            lambda: program.run(context),
+            number=repeats,
+        ) / repeats
+
+        print(  # noqa: T001
+            '{size:>6} clauses: compile {compile:9.3f}ms, '
+            'optimise {optimise:9.3f}ms, run {run:9.3f}ms'.format(
+                size=size,
+                compile=compile_time * 1000,
+                optimise=optimise_time * 1000,
+                run=run_time * 1000,
+            ),
+        )
+
+
+if __name__ == '__main__':
+    main()
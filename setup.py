@@ -55,7 +55,6 @@ setup(
         'alembic >=0.9.6',
         'gunicorn >=19.7',
         'werkzeug>=2,<2.1',
-        'schedule',
         'freezegun',
         'requests',
         'networkx',